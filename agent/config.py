@@ -30,9 +30,38 @@ class RuntimeCfg:
     rlm_environment_kwargs: dict = field(default_factory=dict)
     rlm_max_depth: int = 1
     rlm_max_iterations: int = 30
+    rlm_negative_ttl_s: int = 60  # skip RLM for this long after the backend fails
+    rlm_health_interval_s: int = 30
     multi_step_edits: bool = True
     multi_step_max_files: int = 5
     multi_step_max_passes: int = 2
+    index_workers: int = 0  # tree-sitter parse processes; 0 = one per CPU core
+    index_content_hash: bool = True  # hash same-size files before reparsing them
+    index_respect_gitignore: bool = True
+    index_watch_mode: str = "auto"  # auto | inotify | poll
+    index_debounce_ms: int = 200
+    index_poll_interval_s: float = 2.0  # polling fallback only
+    repo_map_tokens: int = 1024  # budget for the rendered repo map
+    embeddings: bool = False  # semantic chunk retrieval; needs numpy and a GGUF embedding model
+    embedding_model_dir: str = "embedding"  # under models_dir
+    embedding_filename_hint: str = ""
+    embedding_batch_size: int = 32
+    embedding_nprobe: int = 8  # IVF lists scanned per query
+    snapshot_delta_chain: int = 8  # approvals snapshotted as deltas before a full snapshot
+    snapshot_storage: str = "blobs"  # blobs | pack (one compressed pack per snapshot; zstd if installed)
+    staging_mode: str = "overlay"  # overlay (copy only touched files) | worktree (detached git worktree, for tests)
+    parallel_remote_requests: int = 4  # concurrent per-file calls to remote/cloud backends
+    parallel_local_requests: int = 1  # >1 only helps with several llama.cpp instances
+    model_pool_max_models: int = 2
+    model_pool_max_ram_gb: float = 0.0  # 0 = no RAM cap
+    model_pool_idle_ttl_s: int = 900
+    kv_cache_mode: str = "ram"  # ram | disk | off
+    kv_cache_max_mb: int = 2048
+    kv_cache_dir: str = ""  # disk mode; defaults to <models_dir>/.kv_cache
+    http_pool_max_per_host: int = 8
+    http_connect_timeout_s: float = 10.0
+    http_read_timeout_s: float = 60.0
+    http_max_retries: int = 3
 
 @dataclass
 class InferenceRoleCfg:
@@ -59,6 +88,7 @@ class ContextIngestCfg:
     chunk_size: int = 2000
     chunk_overlap: int = 200
     top_k: int = 6
+    retrieval_chunks: int = 24  # BM25 chunks considered for the repo context bundle
 
 @dataclass
 class AppConfig:
@@ -1,7 +1,12 @@
 from __future__ import annotations
+from collections import Counter, OrderedDict
 from dataclasses import dataclass
 from typing import List, Dict, Tuple
+import hashlib
+import heapq
+import math
 import re
+import threading
 
 from rlm_wrap.store import RLMVarStore
 
@@ -11,6 +16,12 @@ STOP = {
     "into", "also", "make", "update", "change", "modify", "remove", "add", "code", "file",
 }
 
+# Term counts per chunk, keyed by content hash: the same pasted context comes
+# back on every propose/revise turn.
+_TOKEN_CACHE_MAX = 4096
+_TOKEN_CACHE: "OrderedDict[bytes, Dict[str, int]]" = OrderedDict()
+_TOKEN_LOCK = threading.Lock()
+
 
 @dataclass
 class IngestResult:
@@ -19,6 +30,21 @@ class IngestResult:
     chunks: List[str]
 
 
+@dataclass
+class TermMatrix:
+    """Sparse chunk x term counts: row i maps each term of chunk i to its count."""
+    rows: List[Dict[str, int]]
+
+    def column(self, term: str) -> List[Tuple[int, int]]:
+        return [(i, row[term]) for i, row in enumerate(self.rows) if term in row]
+
+    def totals(self) -> Counter:
+        total: Counter = Counter()
+        for row in self.rows:
+            total.update(row)
+        return total
+
+
 def ingest_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
     if not text:
         return []
@@ -34,35 +60,64 @@ def ingest_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
     return chunks
 
 
-def summarize_chunks(chunks: List[str]) -> str:
+def _terms(text: str) -> Dict[str, int]:
+    counts = Counter(WORD_RE.findall(text.lower()))
+    for w in STOP.intersection(counts):
+        del counts[w]
+    return counts
+
+
+def _chunk_terms(chunk: str) -> Dict[str, int]:
+    key = hashlib.blake2b(chunk.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+    with _TOKEN_LOCK:
+        hit = _TOKEN_CACHE.get(key)
+        if hit is not None:
+            _TOKEN_CACHE.move_to_end(key)
+            return hit
+    counts = _terms(chunk)
+    with _TOKEN_LOCK:
+        _TOKEN_CACHE[key] = counts
+        if len(_TOKEN_CACHE) > _TOKEN_CACHE_MAX:
+            _TOKEN_CACHE.popitem(last=False)
+    return counts
+
+
+def term_matrix(chunks: List[str]) -> TermMatrix:
+    """Tokenizes each chunk once (cached by content) for both summary and ranking."""
+    return TermMatrix(rows=[_chunk_terms(ch) for ch in chunks])
+
+
+def summarize_chunks(chunks: List[str], matrix: TermMatrix | None = None) -> str:
     # Simple heuristic summary: keyword list + chunk count
-    words: Dict[str, int] = {}
-    for ch in chunks:
-        for w in WORD_RE.findall(ch.lower()):
-            if w in STOP:
-                continue
-            words[w] = words.get(w, 0) + 1
-    top = sorted(words.items(), key=lambda x: (-x[1], x[0]))[:12]
+    matrix = matrix or term_matrix(chunks)
+    top = heapq.nsmallest(12, matrix.totals().items(), key=lambda x: (-x[1], x[0]))
     kws = ", ".join([w for w, _ in top])
     return f"Context ingested: {len(chunks)} chunks. Keywords: {kws}"
 
 
-def rank_chunks(query: str, chunks: List[str], top_k: int) -> List[str]:
-    qwords = set([w for w in WORD_RE.findall(query.lower()) if w not in STOP])
-    if not qwords:
+def rank_chunks(query: str, chunks: List[str], top_k: int, matrix: TermMatrix | None = None) -> List[str]:
+    """Top chunks by TF-IDF against the query terms; ties keep document order."""
+    qterms = list(_terms(query))
+    if not qterms:
         return chunks[:top_k]
-    scored = []
-    for ch in chunks:
-        cwords = set([w for w in WORD_RE.findall(ch.lower()) if w not in STOP])
-        score = len(qwords.intersection(cwords))
-        scored.append((score, ch))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [c for s, c in scored[:top_k]]
+    matrix = matrix or term_matrix(chunks)
+    n = len(matrix.rows)
+    scores = [0.0] * n
+    for term in qterms:
+        col = matrix.column(term)
+        if not col:
+            continue
+        idf = math.log(1.0 + n / len(col))
+        for i, tf in col:
+            scores[i] += idf * (1.0 + math.log(tf))
+    best = heapq.nlargest(top_k, range(n), key=lambda i: (scores[i], -i))
+    return [chunks[i] for i in best]
 
 
 def ingest_and_store(text: str, query: str, store: RLMVarStore, chunk_size: int, chunk_overlap: int, top_k: int) -> IngestResult:
     chunks = ingest_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     store.set("context_chunks", chunks)
-    summary = summarize_chunks(chunks)
-    top = rank_chunks(query, chunks, top_k=top_k)
+    matrix = term_matrix(chunks)
+    summary = summarize_chunks(chunks, matrix)
+    top = rank_chunks(query, chunks, top_k=top_k, matrix=matrix)
     return IngestResult(summary=summary, top_chunks=top, chunks=chunks)
@@ -0,0 +1,346 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from urllib.parse import urlsplit
+import http.client
+import json
+import random
+import ssl
+import threading
+import time
+
+# Statuses worth retrying: the request never reached the model or the server
+# asked us to come back later. Chat completions have no side effects.
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+HostKey = Tuple[str, str, int]
+
+
+class _NotSent(Exception):
+    """A connect or write failure: the server never saw the whole request."""
+
+
+class HTTPStatusError(RuntimeError):
+    def __init__(self, status: int, reason: str, body: str = "", retry_after: float | None = None) -> None:
+        super().__init__(f"HTTP {status} {reason}: {body[:500]}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+def iter_sse_data(lines: Iterable[bytes]) -> Iterator[str]:
+    # Yields the joined `data:` payload of each server-sent event.
+    data: List[str] = []
+    for raw in lines:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+            continue
+        if line.startswith(":") or not line.startswith("data:"):
+            continue
+        value = line[5:]
+        if value.startswith(" "):
+            value = value[1:]
+        data.append(value)
+    if data:
+        yield "\n".join(data)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+@dataclass
+class _HostPool:
+    slots: threading.BoundedSemaphore
+    idle: List[http.client.HTTPConnection] = field(default_factory=list)
+    requests: int = 0
+    opened: int = 0
+    reused: int = 0
+    retries: int = 0
+    errors: int = 0
+    in_use: int = 0
+
+
+class HTTPPool:
+    """Keep-alive HTTP/1.1 connections shared by all remote inference calls.
+
+    Each host gets at most max_per_host concurrent connections; idle ones are
+    kept and reused so repeated calls skip the TCP/TLS handshake.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 8,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ) -> None:
+        self.max_per_host = max_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._hosts: Dict[HostKey, _HostPool] = {}
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context()
+
+    def configure(
+        self,
+        max_per_host: int | None = None,
+        connect_timeout: float | None = None,
+        read_timeout: float | None = None,
+        max_retries: int | None = None,
+    ) -> None:
+        with self._lock:
+            if max_per_host is not None and int(max_per_host) != self.max_per_host:
+                self.max_per_host = max(1, int(max_per_host))
+                # Host pools are rebuilt with the new limit; connections in use
+                # are released to (and closed with) their old pool.
+                for pool in self._hosts.values():
+                    for conn in pool.idle:
+                        conn.close()
+                self._hosts = {}
+            if connect_timeout is not None:
+                self.connect_timeout = max(0.1, float(connect_timeout))
+            if read_timeout is not None:
+                self.read_timeout = max(0.1, float(read_timeout))
+            if max_retries is not None:
+                self.max_retries = max(1, int(max_retries))
+
+    def post_json(self, url: str, payload: Dict[str, Any], headers: Dict[str, str], label: str = "HTTP", read_timeout: float | None = None) -> Dict[str, Any]:
+        body = json.dumps(payload).encode("utf-8")
+        host, path = _split_url(url)
+        last_err: Exception | None = None
+        for attempt in range(self.max_retries):
+            pool = self._pool(host)
+            try:
+                conn, resp = self._send(host, pool, path, body, headers, read_timeout)
+                keep = False
+                try:
+                    raw = resp.read()
+                    keep = not resp.will_close
+                finally:
+                    self._release(pool, conn, keep)
+                if resp.status >= 400:
+                    raise _status_error(resp, raw)
+                return json.loads(raw.decode("utf-8"))
+            except Exception as exc:
+                last_err = exc
+                if not self._backoff(pool, exc, attempt):
+                    break
+        raise RuntimeError(f"{label} request failed: {last_err}")
+
+    def post_sse(self, url: str, payload: Dict[str, Any], headers: Dict[str, str], label: str = "HTTP", read_timeout: float | None = None) -> Iterator[Dict[str, Any]]:
+        body = json.dumps(payload).encode("utf-8")
+        host, path = _split_url(url)
+        last_err: Exception | None = None
+        for attempt in range(self.max_retries):
+            pool = self._pool(host)
+            started = False
+            try:
+                conn, resp = self._send(host, pool, path, body, headers, read_timeout)
+                keep = False
+                try:
+                    if resp.status >= 400:
+                        raw = resp.read()
+                        keep = not resp.will_close
+                        raise _status_error(resp, raw)
+                    for data in iter_sse_data(resp):
+                        if data.strip() == "[DONE]":
+                            break
+                        started = True
+                        yield json.loads(data)
+                    resp.read()
+                    keep = not resp.will_close
+                finally:
+                    # A stream abandoned mid-way leaves unread bytes on the socket.
+                    self._release(pool, conn, keep)
+                return
+            except Exception as exc:
+                # Once events have been handed out a retry would duplicate them.
+                if started:
+                    raise RuntimeError(f"{label} stream failed: {exc}")
+                last_err = exc
+                if not self._backoff(pool, exc, attempt):
+                    break
+        raise RuntimeError(f"{label} request failed: {last_err}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hosts = {
+                f"{k[0]}://{k[1]}:{k[2]}": {
+                    "requests": p.requests,
+                    "opened": p.opened,
+                    "reused": p.reused,
+                    "retries": p.retries,
+                    "errors": p.errors,
+                    "idle": len(p.idle),
+                    "in_use": p.in_use,
+                }
+                for k, p in self._hosts.items()
+            }
+        return {
+            "max_per_host": self.max_per_host,
+            "connect_timeout_s": self.connect_timeout,
+            "read_timeout_s": self.read_timeout,
+            "max_retries": self.max_retries,
+            "hosts": hosts,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for pool in self._hosts.values():
+                for conn in pool.idle:
+                    conn.close()
+                pool.idle.clear()
+
+    def _pool(self, host: HostKey) -> _HostPool:
+        with self._lock:
+            pool = self._hosts.get(host)
+            if pool is None:
+                pool = _HostPool(slots=threading.BoundedSemaphore(self.max_per_host))
+                self._hosts[host] = pool
+            return pool
+
+    def _send(self, host: HostKey, pool: _HostPool, path: str, body: bytes, headers: Dict[str, str], read_timeout: float | None):
+        pool.slots.acquire()
+        send_headers = dict(headers)
+        send_headers["Content-Length"] = str(len(body))
+        while True:
+            conn, reused = self._checkout(host, pool)
+            sent = False
+            try:
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(read_timeout or self.read_timeout)
+                conn.request("POST", path, body=body, headers=send_headers)
+                sent = True
+                resp = conn.getresponse()
+                with self._lock:
+                    pool.requests += 1
+                return conn, resp
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as exc:
+                # The server may close an idle keep-alive connection at any time;
+                # that only shows up on first use, so retry on a fresh one.
+                if reused:
+                    conn.close()
+                    with self._lock:
+                        pool.in_use -= 1
+                        pool.retries += 1
+                    continue
+                self._release(pool, conn, False)
+                if not sent:
+                    raise _NotSent(exc) from exc
+                raise
+            except OSError as exc:
+                self._release(pool, conn, False)
+                if not sent:
+                    raise _NotSent(exc) from exc
+                raise
+            except BaseException:
+                self._release(pool, conn, False)
+                raise
+
+    def _checkout(self, host: HostKey, pool: _HostPool) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            pool.in_use += 1
+            if pool.idle:
+                pool.reused += 1
+                return pool.idle.pop(), True
+            pool.opened += 1
+        scheme, hostname, port = host
+        if scheme == "https":
+            return http.client.HTTPSConnection(hostname, port, timeout=self.connect_timeout, context=self._ssl), False
+        return http.client.HTTPConnection(hostname, port, timeout=self.connect_timeout), False
+
+    def _release(self, pool: _HostPool, conn: http.client.HTTPConnection, keep: bool) -> None:
+        with self._lock:
+            pool.in_use -= 1
+            if keep and self._hosts.get(_conn_key(conn)) is pool:
+                pool.idle.append(conn)
+            else:
+                conn.close()
+        pool.slots.release()
+
+    def _backoff(self, pool: _HostPool, exc: Exception, attempt: int) -> bool:
+        with self._lock:
+            pool.errors += 1
+        delay = self._retry_delay(exc, attempt)
+        if delay is None:
+            return False
+        with self._lock:
+            pool.retries += 1
+        time.sleep(delay)
+        return True
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> float | None:
+        if attempt + 1 >= self.max_retries:
+            return None
+        if isinstance(exc, HTTPStatusError):
+            if exc.status not in RETRYABLE_STATUSES:
+                return None
+            if exc.retry_after is not None:
+                return min(self.backoff_max, exc.retry_after)
+        elif not isinstance(exc, _NotSent):
+            # Once the request is on the wire (e.g. a read timeout) the server may
+            # already be generating; a resend would run the completion twice.
+            return None
+        # Full jitter keeps concurrent callers from retrying in lockstep.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def _split_url(url: str) -> Tuple[HostKey, str]:
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return (scheme, parts.hostname or "", port), path
+
+
+def _conn_key(conn: http.client.HTTPConnection) -> HostKey:
+    scheme = "https" if isinstance(conn, http.client.HTTPSConnection) else "http"
+    return (scheme, conn.host, conn.port)
+
+
+def _status_error(resp: http.client.HTTPResponse, raw: bytes) -> HTTPStatusError:
+    return HTTPStatusError(
+        resp.status,
+        resp.reason,
+        raw.decode("utf-8", errors="replace"),
+        retry_after=parse_retry_after(resp.getheader("Retry-After")),
+    )
+
+
+_POOL = HTTPPool()
+
+
+def get_http_pool() -> HTTPPool:
+    return _POOL
+
+
+def configure_http_pool(runtime_cfg) -> None:
+    _POOL.configure(
+        max_per_host=getattr(runtime_cfg, "http_pool_max_per_host", None),
+        connect_timeout=getattr(runtime_cfg, "http_connect_timeout_s", None),
+        read_timeout=getattr(runtime_cfg, "http_read_timeout_s", None),
+        max_retries=getattr(runtime_cfg, "http_max_retries", None),
+    )
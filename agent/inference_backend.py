@@ -1,9 +1,19 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Dict, Any
-import json
-import time
-import urllib.request
+from typing import List, Dict, Any, Iterator
+
+from agent.http_client import get_http_pool
+
+
+def openai_delta_text(data: Dict[str, Any]) -> str:
+    choices = data.get("choices") or []
+    if not choices:
+        return ""
+    choice = choices[0]
+    delta = choice.get("delta") or {}
+    if delta.get("content"):
+        return delta["content"]
+    return choice.get("text") or ""
 
 
 @dataclass
@@ -20,21 +30,22 @@ class RemoteOpenAIBackend:
         return headers
 
     def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        last_err: Exception | None = None
-        for attempt in range(3):
-            try:
-                req = urllib.request.Request(
-                    self.base_url,
-                    data=json.dumps(payload).encode("utf-8"),
-                    headers=self._headers(),
-                    method="POST",
-                )
-                with urllib.request.urlopen(req, timeout=self.timeout) as resp:
-                    return json.loads(resp.read().decode("utf-8"))
-            except Exception as exc:
-                last_err = exc
-                time.sleep(1 + attempt)
-        raise RuntimeError(f"Remote backend request failed: {last_err}")
+        return get_http_pool().post_json(self.base_url, payload, self._headers(), "Remote backend", read_timeout=self.timeout)
+
+    def _post_stream(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        return get_http_pool().post_sse(self.base_url, payload, self._headers(), "Remote backend", read_timeout=self.timeout)
+
+    def chat_stream(self, messages: List[Dict[str, str]], temperature: float = 0.2) -> Iterator[str]:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        }
+        for data in self._post_stream(payload):
+            text = openai_delta_text(data)
+            if text:
+                yield text
 
     def chat(self, messages: List[Dict[str, str]], temperature: float = 0.2) -> str:
         payload = {
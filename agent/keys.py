@@ -1,12 +1,20 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Tuple
+
+_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, str]]] = {}
 
 
 def load_keys(repo_root: Path) -> Dict[str, str]:
     path = repo_root / "keys.env"
-    if not path.exists():
+    try:
+        st = path.stat()
+    except OSError:
         return {}
+    stamp = (st.st_mtime_ns, st.st_size)
+    hit = _CACHE.get(str(path))
+    if hit is not None and hit[0] == stamp:
+        return dict(hit[1])
     data: Dict[str, str] = {}
     for line in path.read_text().splitlines():
         line = line.strip()
@@ -16,4 +24,5 @@ def load_keys(repo_root: Path) -> Dict[str, str]:
             continue
         key, val = line.split("=", 1)
         data[key.strip()] = val.strip()
-    return data
+    _CACHE[str(path)] = (stamp, data)
+    return dict(data)
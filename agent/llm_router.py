@@ -1,6 +1,6 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, Callable, Iterator, List, Dict, Tuple
 
 from agent.model_registry import resolve_model
 from agent.keys import load_keys
@@ -37,6 +37,21 @@ def backend_for_role(role: str, config) -> str:
     return backend
 
 
+def max_concurrency(role: str, config, repo_root: Path, config_path: Path | None = None) -> int:
+    # Remote servers (vLLM etc.) batch concurrent requests; a local llama.cpp model
+    # is a single instance behind the pool lock, so extra workers would only queue.
+    runtime = getattr(config, "runtime", None)
+    remote_n = int(getattr(runtime, "parallel_remote_requests", 4) or 1)
+    local_n = int(getattr(runtime, "parallel_local_requests", 1) or 1)
+    if backend_for_role(role, config) == "remote":
+        return max(1, remote_n)
+    try:
+        provider = resolve_model(role, config, repo_root, config_path=config_path).provider
+    except Exception:
+        provider = "local"
+    return max(1, local_n if provider == "local" else remote_n)
+
+
 def _remote_backend_for_role(role: str, config) -> RemoteOpenAIBackend:
     backend, role_cfg = _role_backend(role, config)
     if backend != "remote":
@@ -60,57 +75,110 @@ def _remote_backend_for_role(role: str, config) -> RemoteOpenAIBackend:
     return RemoteOpenAIBackend(base_url=remote_url, model=model, api_key=api_key)
 
 
+# (model_dir, filename_hint, model_dir mtime) -> whether a GGUF is present
+_LOCAL_MODEL_CACHE: Dict[Tuple[str, str, int], bool] = {}
+
+
 def _has_local_model(role: str, config, repo_root: Path, config_path: Path | None = None) -> bool:
     try:
         model = resolve_model(role, config, repo_root, config_path=config_path)
         if model.provider != "local" or not model.model_dir:
             return False
-        model_path = find_gguf_model(Path(config.paths.models_dir) / model.model_dir, model.filename_hint or "")
-        return bool(model_path and Path(model_path).exists())
+        model_dir = Path(config.paths.models_dir) / model.model_dir
+        try:
+            mtime = model_dir.stat().st_mtime_ns
+        except OSError:
+            return False
+        key = (str(model_dir), model.filename_hint or "", mtime)
+        hit = _LOCAL_MODEL_CACHE.get(key)
+        if hit is None:
+            try:
+                hit = find_gguf_model(model_dir, model.filename_hint or "").exists()
+            except FileNotFoundError:
+                hit = False
+            _LOCAL_MODEL_CACHE[key] = hit
+        return hit
     except Exception:
         return False
 
 
-def _local_chat(role: str, messages: List[Dict[str, str]], config, repo_root: Path, config_path: Path | None = None) -> str:
-    model = resolve_model(role, config, repo_root, config_path=config_path)
-    if model.provider == "local":
-        if not model.model_dir:
-            raise RuntimeError("local model_dir not configured")
-        runtime = RLMChatRuntime(
-            model_dir=Path(config.paths.models_dir) / model.model_dir,
-            filename_hint=model.filename_hint or config.coder.filename_hint,
-            n_ctx=model.context or config.coder.context,
-            var_store=RLMVarStore(repo_root=repo_root),
-            use_rlm=getattr(config.runtime, "use_rlm", False),
-            rlm_backend=getattr(config.runtime, "rlm_backend", "openai"),
-            rlm_backend_url=getattr(config.runtime, "rlm_backend_url", ""),
-            rlm_backend_model=getattr(config.runtime, "rlm_backend_model", ""),
-            rlm_backend_api_key=getattr(config.runtime, "rlm_backend_api_key", ""),
-            rlm_max_depth=getattr(config.runtime, "rlm_max_depth", 1),
-            rlm_max_iterations=getattr(config.runtime, "rlm_max_iterations", 30),
-            repo_root=repo_root,
-            rlm_environment=getattr(config.runtime, "rlm_environment", "local"),
-            rlm_environment_kwargs=getattr(config.runtime, "rlm_environment_kwargs", None),
-        )
-        return runtime.chat(messages)
+_VAR_STORES: Dict[str, RLMVarStore] = {}
+
+
+def _var_store(repo_root: Path) -> RLMVarStore:
+    store = _VAR_STORES.get(str(repo_root))
+    if store is None:
+        store = RLMVarStore(repo_root=repo_root)
+        _VAR_STORES[str(repo_root)] = store
+    return store
+
+
+def _local_runtime(model, config, repo_root: Path) -> RLMChatRuntime:
+    if not model.model_dir:
+        raise RuntimeError("local model_dir not configured")
+    return RLMChatRuntime(
+        model_dir=Path(config.paths.models_dir) / model.model_dir,
+        filename_hint=model.filename_hint or config.coder.filename_hint,
+        n_ctx=model.context or config.coder.context,
+        var_store=_var_store(repo_root),
+        use_rlm=getattr(config.runtime, "use_rlm", False),
+        rlm_backend=getattr(config.runtime, "rlm_backend", "openai"),
+        rlm_backend_url=getattr(config.runtime, "rlm_backend_url", ""),
+        rlm_backend_model=getattr(config.runtime, "rlm_backend_model", ""),
+        rlm_backend_api_key=getattr(config.runtime, "rlm_backend_api_key", ""),
+        rlm_max_depth=getattr(config.runtime, "rlm_max_depth", 1),
+        rlm_max_iterations=getattr(config.runtime, "rlm_max_iterations", 30),
+        repo_root=repo_root,
+        rlm_environment=getattr(config.runtime, "rlm_environment", "local"),
+        rlm_environment_kwargs=getattr(config.runtime, "rlm_environment_kwargs", None),
+    )
+
+
+def _cloud_provider(model, repo_root: Path) -> tuple[Any, str]:
     if model.provider == "openai":
         keys = load_keys(repo_root)
         key = keys.get("OPENAI_API_KEY", "")
         if not key:
             raise RuntimeError("OPENAI_API_KEY not set")
-        provider = OpenAIChatProvider(api_key=key)
-        return provider.chat(messages, model=model.model or "gpt-4o-mini")
+        return OpenAIChatProvider(api_key=key), model.model or "gpt-4o-mini"
     if model.provider == "gemini":
         keys = load_keys(repo_root)
         key = keys.get("GEMINI_API_KEY", "")
         if not key:
             raise RuntimeError("GEMINI_API_KEY not set")
-        provider = GeminiChatProvider(api_key=key)
-        return provider.chat(messages, model=model.model or "gemini-2.5-flash")
+        return GeminiChatProvider(api_key=key), model.model or "gemini-2.5-flash"
     raise RuntimeError(f"unknown provider: {model.provider}")
 
 
-def chat(role: str, messages: List[Dict[str, str]], config, repo_root: Path, config_path: Path | None = None) -> str:
+def _local_chat(role: str, messages: List[Dict[str, str]], config, repo_root: Path, config_path: Path | None = None) -> str:
+    model = resolve_model(role, config, repo_root, config_path=config_path)
+    if model.provider == "local":
+        return _local_runtime(model, config, repo_root).chat(messages)
+    provider, model_name = _cloud_provider(model, repo_root)
+    return provider.chat(messages, model=model_name)
+
+
+def _local_chat_stream(role: str, messages: List[Dict[str, str]], config, repo_root: Path, config_path: Path | None = None) -> Iterator[str]:
+    model = resolve_model(role, config, repo_root, config_path=config_path)
+    if model.provider == "local":
+        yield from _local_runtime(model, config, repo_root).chat_stream(messages)
+        return
+    provider, model_name = _cloud_provider(model, repo_root)
+    yield from provider.chat_stream(messages, model=model_name)
+
+
+def chat(role: str, messages: List[Dict[str, str]], config, repo_root: Path, config_path: Path | None = None, on_delta: Callable[[str], None] | None = None) -> str:
+    if on_delta is not None:
+        out: List[str] = []
+        stream = chat_stream(role, messages, config, repo_root, config_path=config_path)
+        try:
+            for delta in stream:
+                out.append(delta)
+                on_delta(delta)
+        finally:
+            # If on_delta raised (client gone), release the model now rather than at GC.
+            stream.close()
+        return "".join(out)
     backend, _ = _role_backend(role, config)
     if backend == "remote":
         remote = _remote_backend_for_role(role, config)
@@ -123,6 +191,25 @@ def chat(role: str, messages: List[Dict[str, str]], config, repo_root: Path, con
     return _local_chat(role, messages, config, repo_root, config_path=config_path)
 
 
+def chat_stream(role: str, messages: List[Dict[str, str]], config, repo_root: Path, config_path: Path | None = None) -> Iterator[str]:
+    backend, _ = _role_backend(role, config)
+    if backend == "remote":
+        remote = _remote_backend_for_role(role, config)
+        started = False
+        try:
+            for delta in remote.chat_stream(messages):
+                started = True
+                yield delta
+            return
+        except Exception as exc:
+            # Falling back after partial output would splice two different answers.
+            if started or not _has_local_model(role, config, repo_root, config_path=config_path):
+                raise RuntimeError(f"Remote inference failed for {role}: {exc}")
+        yield from _local_chat_stream(role, messages, config, repo_root, config_path=config_path)
+        return
+    yield from _local_chat_stream(role, messages, config, repo_root, config_path=config_path)
+
+
 def _local_chat_with_images(role: str, messages: List[Dict[str, str]], images: List[Dict[str, str]], config, repo_root: Path, config_path: Path | None = None) -> str:
     backend, _ = _role_backend(role, config)
     model = resolve_model(role, config, repo_root, config_path=config_path)
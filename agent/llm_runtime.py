@@ -1,7 +1,10 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
+import hashlib
+import time
+import warnings
 
 def find_gguf_model(model_dir: Path, filename_hint: str) -> Path:
     if not model_dir.exists():
@@ -18,6 +21,135 @@ def find_gguf_model(model_dir: Path, filename_hint: str) -> Path:
             return f
     return ggufs[0]
 from llama_cpp import Llama
+from llama_cpp.llama_cache import LlamaRAMCache
+
+from agent.llm_stats import record_llm_call
+from agent.model_pool import get_model_pool, model_key
+
+_KV_CACHE_CFG: Dict[str, Any] = {"mode": "ram", "max_mb": 2048, "cache_dir": ""}
+
+
+def configure_kv_cache(runtime_cfg, default_dir: Path) -> None:
+    _KV_CACHE_CFG["mode"] = (getattr(runtime_cfg, "kv_cache_mode", "ram") or "off").lower()
+    _KV_CACHE_CFG["max_mb"] = int(getattr(runtime_cfg, "kv_cache_max_mb", 2048) or 0)
+    _KV_CACHE_CFG["cache_dir"] = getattr(runtime_cfg, "kv_cache_dir", "") or str(default_dir)
+
+
+class _PrefixStateCache:
+    """Wraps a llama.cpp state cache and remembers the prefix it last served.
+
+    llama.cpp looks up the saved state with the longest token prefix of the
+    prompt, so only the remaining suffix is evaluated.
+    """
+
+    def __init__(self, inner) -> None:
+        self.inner = inner
+        self.last_hit_ids: List[int] = []
+
+    @property
+    def cache_size(self) -> int:
+        return self.inner.cache_size
+
+    def __getitem__(self, key):
+        item = self.inner[key]
+        self.last_hit_ids = item.input_ids.tolist()
+        return item
+
+    def __contains__(self, key) -> bool:
+        return key in self.inner
+
+    def __setitem__(self, key, value) -> None:
+        self.inner[key] = value
+
+
+def _attach_kv_cache(llm: Llama, key: tuple) -> None:
+    mode = _KV_CACHE_CFG["mode"]
+    capacity = _KV_CACHE_CFG["max_mb"] * 1024 * 1024
+    if mode == "off" or capacity <= 0:
+        return
+    inner = _disk_cache(key, capacity) if mode == "disk" else None
+    if inner is None:
+        inner = LlamaRAMCache(capacity_bytes=capacity)
+    llm.set_cache(_PrefixStateCache(inner))
+
+
+def _disk_cache(key: tuple, capacity: int):
+    # LlamaDiskCache needs the optional `diskcache` package; a missing one must not fail model loads.
+    try:
+        from llama_cpp.llama_cache import LlamaDiskCache
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+        cache_dir = Path(_KV_CACHE_CFG["cache_dir"]) / digest
+        return LlamaDiskCache(cache_dir=str(cache_dir), capacity_bytes=capacity)
+    except ImportError as exc:
+        warnings.warn(f"kv_cache_mode=disk unavailable ({exc}); using the RAM cache instead", RuntimeWarning)
+        return None
+
+
+def _common_prefix_len(a: List[int], b: List[int]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def _chat_completion(llm: Llama, messages: List[Dict[str, Any]], temperature: float) -> Dict[str, Any]:
+    # Run one completion and record how many prompt tokens were reused from KV state.
+    cache = getattr(llm, "cache", None)
+    if isinstance(cache, _PrefixStateCache):
+        cache.last_hit_ids = []
+    before = list(getattr(llm, "_input_ids", [])[: getattr(llm, "n_tokens", 0)])
+    start = time.perf_counter()
+    out = llm.create_chat_completion(
+        messages=messages,
+        temperature=temperature,
+    )
+    ms = (time.perf_counter() - start) * 1000.0
+    usage = out.get("usage") or {}
+    prompt_tokens = int(usage.get("prompt_tokens") or 0)
+    prompt_ids = list(getattr(llm, "_input_ids", [])[:prompt_tokens])
+    hit = _common_prefix_len(before, prompt_ids)
+    if isinstance(cache, _PrefixStateCache) and cache.last_hit_ids:
+        hit = max(hit, _common_prefix_len(cache.last_hit_ids, prompt_ids))
+    # llama.cpp always re-evaluates at least the last prompt token.
+    hit = min(hit, max(0, prompt_tokens - 1))
+    record_llm_call(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=int(usage.get("completion_tokens") or 0),
+        prefix_hit_tokens=hit,
+        ms=ms,
+    )
+    return out
+
+def _stream_chat_completion(llm: Llama, messages: List[Dict[str, Any]], temperature: float) -> Iterator[str]:
+    cache = getattr(llm, "cache", None)
+    if isinstance(cache, _PrefixStateCache):
+        cache.last_hit_ids = []
+    before = list(getattr(llm, "_input_ids", [])[: getattr(llm, "n_tokens", 0)])
+    start = time.perf_counter()
+    completion_tokens = 0
+    for chunk in llm.create_chat_completion(messages=messages, temperature=temperature, stream=True):
+        choices = chunk.get("choices") or []
+        delta = (choices[0].get("delta") or {}) if choices else {}
+        text = delta.get("content")
+        if text:
+            completion_tokens += 1
+            yield text
+    ms = (time.perf_counter() - start) * 1000.0
+    # Streamed chunks carry no usage block; derive the prompt length from the KV state.
+    prompt_tokens = max(0, int(getattr(llm, "n_tokens", 0)) - completion_tokens)
+    prompt_ids = list(getattr(llm, "_input_ids", [])[:prompt_tokens])
+    hit = _common_prefix_len(before, prompt_ids)
+    if isinstance(cache, _PrefixStateCache) and cache.last_hit_ids:
+        hit = max(hit, _common_prefix_len(cache.last_hit_ids, prompt_ids))
+    hit = min(hit, max(0, prompt_tokens - 1))
+    record_llm_call(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        prefix_hit_tokens=hit,
+        ms=ms,
+    )
 
 @dataclass
 class LlamaVLMRuntime:
@@ -37,11 +169,9 @@ class LlamaVLMRuntime:
         )
 
     def chat_with_images(self, messages: List[Dict[str, Any]]) -> str:
-        llm = self._make()
-        out = llm.create_chat_completion(
-            messages=messages,
-            temperature=self.temperature,
-        )
+        key = model_key(self.model_path, self.n_ctx, self.n_gpu_layers, "qwen2-vl")
+        with get_model_pool().acquire(key, self._make) as llm:
+            out = _chat_completion(llm, messages, self.temperature)
         return out["choices"][0]["message"]["content"]
 
 @dataclass
@@ -52,17 +182,46 @@ class LlamaRuntime:
     temperature: float = 0.2
 
     def _make(self) -> Llama:
-        return Llama(
+        llm = Llama(
             model_path=str(self.model_path),
             n_ctx=self.n_ctx,
             n_gpu_layers=self.n_gpu_layers,
             verbose=False,
         )
+        _attach_kv_cache(llm, model_key(self.model_path, self.n_ctx, self.n_gpu_layers))
+        return llm
 
     def chat(self, messages: List[Dict[str, str]]) -> str:
-        llm = self._make()
-        out = llm.create_chat_completion(
-            messages=messages,
-            temperature=self.temperature,
-        )
+        key = model_key(self.model_path, self.n_ctx, self.n_gpu_layers)
+        with get_model_pool().acquire(key, self._make) as llm:
+            out = _chat_completion(llm, messages, self.temperature)
         return out["choices"][0]["message"]["content"]
+
+    def chat_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        # The pooled model stays locked until the stream is exhausted or closed.
+        key = model_key(self.model_path, self.n_ctx, self.n_gpu_layers)
+        with get_model_pool().acquire(key, self._make) as llm:
+            yield from _stream_chat_completion(llm, messages, self.temperature)
+
+@dataclass
+class LlamaEmbeddingRuntime:
+    model_path: Path
+    n_ctx: int = 512
+    n_batch: int = 512
+    n_gpu_layers: int = 0
+
+    def _make(self) -> Llama:
+        return Llama(
+            model_path=str(self.model_path),
+            n_ctx=self.n_ctx,
+            n_batch=self.n_batch,
+            n_gpu_layers=self.n_gpu_layers,
+            embedding=True,
+            verbose=False,
+        )
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        # One llama.cpp call per batch; inputs longer than n_ctx are truncated.
+        key = model_key(self.model_path, self.n_ctx, self.n_gpu_layers, "embedding")
+        with get_model_pool().acquire(key, self._make) as llm:
+            return llm.embed(texts, normalize=True, truncate=True)
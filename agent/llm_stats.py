@@ -0,0 +1,85 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+import threading
+import time
+
+_LOCAL = threading.local()
+
+
+def _collectors() -> List[Dict[str, Any]]:
+    stack = getattr(_LOCAL, "stack", None)
+    if stack is None:
+        stack = []
+        _LOCAL.stack = stack
+    return stack
+
+
+def _empty() -> Dict[str, Any]:
+    return {
+        "llm_calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "prefix_hit_tokens": 0,
+        "llm_ms": 0.0,
+    }
+
+
+@contextmanager
+def collect_llm_stats() -> Iterator[Dict[str, Any]]:
+    # Collects per-call LLM usage recorded on this thread while the block runs.
+    stats = _empty()
+    stack = _collectors()
+    stack.append(stats)
+    try:
+        yield stats
+    finally:
+        # Remove by identity: an outer collector can hold equal values.
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] is stats:
+                del stack[i]
+                break
+
+
+def record_llm_call(prompt_tokens: int = 0, completion_tokens: int = 0, prefix_hit_tokens: int = 0, ms: float = 0.0) -> None:
+    for stats in _collectors():
+        stats["llm_calls"] += 1
+        stats["prompt_tokens"] += int(prompt_tokens or 0)
+        stats["completion_tokens"] += int(completion_tokens or 0)
+        stats["prefix_hit_tokens"] += int(prefix_hit_tokens or 0)
+        stats["llm_ms"] = round(stats["llm_ms"] + float(ms or 0.0), 2)
+
+
+def merge_llm_stats(stats: Dict[str, Any]) -> None:
+    # Folds stats collected on a worker thread into this thread's open collectors.
+    for target in _collectors():
+        for key in ("llm_calls", "prompt_tokens", "completion_tokens", "prefix_hit_tokens"):
+            target[key] += int(stats.get(key, 0) or 0)
+        target["llm_ms"] = round(target["llm_ms"] + float(stats.get("llm_ms", 0.0) or 0.0), 2)
+
+
+class StreamMeter:
+    # Time-to-first-token and throughput for one streamed generation.
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.first: float | None = None
+        self.last: float | None = None
+        self.tokens = 0
+
+    def tick(self, delta: str) -> None:
+        if not delta:
+            return
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.tokens += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        ttft_ms = (self.first - self.start) * 1000.0 if self.first is not None else 0.0
+        gen_s = (self.last - self.first) if self.first is not None and self.last is not None else 0.0
+        return {
+            "ttft_ms": round(ttft_ms, 2),
+            "stream_tokens": self.tokens,
+            "tokens_per_s": round((self.tokens - 1) / gen_s, 2) if gen_s > 0 and self.tokens > 1 else 0.0,
+        }
@@ -0,0 +1,213 @@
+from __future__ import annotations
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Tuple
+import threading
+import time
+
+# (model_path, n_ctx, n_gpu_layers, chat_format)
+ModelKey = Tuple[str, int, int, str]
+
+# Rough per-token KV cache cost for 7B-class models (f16, GQA); only used for eviction budgeting.
+_KV_BYTES_PER_TOKEN = 64 * 1024
+
+
+def model_key(model_path: Path | str, n_ctx: int, n_gpu_layers: int, chat_format: str = "") -> ModelKey:
+    return (str(model_path), int(n_ctx), int(n_gpu_layers), chat_format or "")
+
+
+def estimate_model_bytes(key: ModelKey) -> int:
+    # GGUF weights are mmapped, so resident size is roughly the file size plus the KV cache.
+    try:
+        size = Path(key[0]).stat().st_size
+    except OSError:
+        size = 0
+    return size + key[1] * _KV_BYTES_PER_TOKEN
+
+
+@dataclass
+class _PoolEntry:
+    key: ModelKey
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    model: Any = None
+    est_bytes: int = 0
+    last_used: float = 0.0
+    in_use: int = 0
+    load_ms: float = 0.0
+
+
+class ModelPool:
+    """Process-wide pool of loaded llama.cpp models.
+
+    Callers share one instance per key and serialize on its lock, so concurrent
+    requests for the same model wait instead of loading a duplicate.
+    """
+
+    def __init__(self, max_models: int = 2, max_bytes: int = 0, idle_ttl_s: float = 900.0) -> None:
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.idle_ttl_s = idle_ttl_s
+        self._entries: "OrderedDict[ModelKey, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: threading.Thread | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_ms_total = 0.0
+
+    def configure(self, max_models: int | None = None, max_bytes: int | None = None, idle_ttl_s: float | None = None) -> None:
+        with self._lock:
+            if max_models is not None:
+                self.max_models = max(1, int(max_models))
+            if max_bytes is not None:
+                self.max_bytes = max(0, int(max_bytes))
+            if idle_ttl_s is not None:
+                self.idle_ttl_s = max(0.0, float(idle_ttl_s))
+            self._evict_locked()
+
+    @contextmanager
+    def acquire(self, key: ModelKey, loader: Callable[[], Any]) -> Iterator[Any]:
+        self.sweep()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(key=key)
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            entry.in_use += 1
+        try:
+            with entry.lock:
+                if entry.model is None:
+                    start = time.perf_counter()
+                    model = loader()
+                    load_ms = (time.perf_counter() - start) * 1000.0
+                    with self._lock:
+                        entry.model = model
+                        entry.est_bytes = estimate_model_bytes(key)
+                        entry.load_ms = load_ms
+                        self.misses += 1
+                        self.load_ms_total += load_ms
+                        self._evict_locked()
+                    self._ensure_reaper()
+                else:
+                    with self._lock:
+                        self.hits += 1
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.time()
+                if entry.model is None and entry.in_use == 0 and self._entries.get(key) is entry:
+                    # Load failed; do not keep an empty slot around.
+                    del self._entries[key]
+
+    def sweep(self, now: float | None = None) -> int:
+        if self.idle_ttl_s <= 0:
+            return 0
+        now = time.time() if now is None else now
+        evicted = 0
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.model is None or entry.in_use:
+                    continue
+                if now - entry.last_used >= self.idle_ttl_s:
+                    self._drop_locked(key)
+                    evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if not entry.in_use:
+                    self._drop_locked(key)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            resident = [
+                {
+                    "model_path": e.key[0],
+                    "n_ctx": e.key[1],
+                    "n_gpu_layers": e.key[2],
+                    "chat_format": e.key[3],
+                    "est_bytes": e.est_bytes,
+                    "in_use": e.in_use,
+                    "idle_s": round(now - e.last_used, 1) if e.last_used else 0.0,
+                    "load_ms": round(e.load_ms, 2),
+                }
+                for e in self._entries.values()
+                if e.model is not None
+            ]
+            loads = self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_ms_total": round(self.load_ms_total, 2),
+                "avg_load_ms": round(self.load_ms_total / loads, 2) if loads else 0.0,
+                "resident": resident,
+                "resident_bytes": sum(r["est_bytes"] for r in resident),
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_s": self.idle_ttl_s,
+            }
+
+    def _evict_locked(self) -> None:
+        # LRU order: least recently acquired first. Models in use are never evicted.
+        while True:
+            loaded = [e for e in self._entries.values() if e.model is not None]
+            total = sum(e.est_bytes for e in loaded)
+            over_count = len(loaded) > self.max_models
+            over_bytes = bool(self.max_bytes) and total > self.max_bytes and len(loaded) > 1
+            if not over_count and not over_bytes:
+                return
+            victim = next((e for e in loaded if not e.in_use), None)
+            if victim is None:
+                return
+            self._drop_locked(victim.key)
+
+    def _drop_locked(self, key: ModelKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None or entry.model is None:
+            return
+        model = entry.model
+        entry.model = None
+        self.evictions += 1
+        close = getattr(model, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def _ensure_reaper(self) -> None:
+        if self.idle_ttl_s <= 0:
+            return
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+
+        def loop() -> None:
+            while True:
+                time.sleep(max(1.0, min(60.0, self.idle_ttl_s / 2)))
+                self.sweep()
+
+        self._reaper = threading.Thread(target=loop, daemon=True)
+        self._reaper.start()
+
+
+_POOL = ModelPool()
+
+
+def get_model_pool() -> ModelPool:
+    return _POOL
+
+
+def configure_model_pool(runtime_cfg) -> None:
+    max_ram_gb = float(getattr(runtime_cfg, "model_pool_max_ram_gb", 0) or 0)
+    _POOL.configure(
+        max_models=getattr(runtime_cfg, "model_pool_max_models", 2),
+        max_bytes=int(max_ram_gb * 1024 ** 3),
+        idle_ttl_s=getattr(runtime_cfg, "model_pool_idle_ttl_s", 900),
+    )
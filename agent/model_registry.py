@@ -1,8 +1,9 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import json
+import threading
 import yaml
 
 from agent.keys import load_keys
@@ -95,7 +96,48 @@ def save_state(repo_root: Path, state: Dict[str, str]) -> None:
     path.write_text(json.dumps(state, indent=2))
 
 
+# (role, repo_root, config_path) -> (config, file stamp, resolved option)
+_RESOLVE_CACHE: Dict[Tuple[str, str, str], Tuple[AppConfig, Tuple[int, ...], ModelOption]] = {}
+_RESOLVE_LOCK = threading.Lock()
+
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _resolve_stamp(config: AppConfig, repo_root: Path, config_path: Path | None) -> Tuple[int, ...]:
+    # Everything resolve_model reads from disk; a change to any of them is a miss.
+    selection = config_path if config_path else repo_root / ".agent" / "model_state.json"
+    models_dir = getattr(getattr(config, "paths", None), "models_dir", None)
+    return (
+        _mtime_ns(selection),
+        _mtime_ns(repo_root / "keys.env"),
+        _mtime_ns(Path(models_dir)) if models_dir else 0,
+    )
+
+
+def invalidate_model_cache() -> None:
+    with _RESOLVE_LOCK:
+        _RESOLVE_CACHE.clear()
+
+
 def resolve_model(role: str, config: AppConfig, repo_root: Path, config_path: Path | None = None) -> ModelOption:
+    key = (role, str(repo_root), str(config_path or ""))
+    stamp = _resolve_stamp(config, repo_root, config_path)
+    with _RESOLVE_LOCK:
+        hit = _RESOLVE_CACHE.get(key)
+    if hit is not None and hit[0] is config and hit[1] == stamp:
+        return hit[2]
+    opt = _resolve_model_uncached(role, config, repo_root, config_path=config_path)
+    with _RESOLVE_LOCK:
+        _RESOLVE_CACHE[key] = (config, stamp, opt)
+    return opt
+
+
+def _resolve_model_uncached(role: str, config: AppConfig, repo_root: Path, config_path: Path | None = None) -> ModelOption:
     registry = load_registry(config, repo_root)
     defaults = get_defaults(config)
     selected = "best"
@@ -150,7 +192,9 @@ def list_models(role: str, config: AppConfig, repo_root: Path, config_path: Path
 def set_selected(role: str, model_id: str, repo_root: Path, config_path: Path | None = None) -> None:
     if config_path:
         set_selected_in_config(config_path, role, model_id)
-        return
-    state = load_state(repo_root)
-    state[role] = model_id
-    save_state(repo_root, state)
+    else:
+        state = load_state(repo_root)
+        state[role] = model_id
+        save_state(repo_root, state)
+    # mtime granularity can hide a write made within the same tick.
+    invalidate_model_cache()
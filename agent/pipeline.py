@@ -1,14 +1,19 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 import json
 import re
-import sqlite3
-from typing import List, Dict, Tuple, Any
+import threading
+import time
+from typing import Callable, List, Dict, Tuple, Any
 
-from agent.llm_router import chat as llm_chat
+from agent.llm_router import chat as llm_chat, max_concurrency
+from agent.llm_stats import collect_llm_stats, merge_llm_stats
 from rlm_wrap.store import RLMVarStore
 from indexer.indexer import SymbolIndexer
+from indexer.dep_graph import DependencyGraph
+from indexer.vectors import EmbeddingIndex, hybrid_search
 from agent.config import AppConfig
 
 _PATH_RE = re.compile(r"[\w./-]+\.(?:py|js|ts|tsx|json|yml|yaml|md|html|css)\b")
@@ -26,34 +31,91 @@ class Proposal:
     diff: str
     summary: str
     risk_notes: str
-
-
+    file_spans: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class _OrderedRelay:
+    # Forwards per-file deltas in file order: the earliest unfinished file streams
+    # live, later files are buffered until every file before them is done.
+    def __init__(self, emit: Callable[[str], None], n: int) -> None:
+        self.emit = emit
+        self.buffers: List[List[str]] = [[] for _ in range(n)]
+        self.finished = [False] * n
+        self.current = 0
+        self.lock = threading.Lock()
+
+    def sink(self, i: int) -> Callable[[str], None]:
+        def push(text: str) -> None:
+            with self.lock:
+                if i == self.current:
+                    self.emit(text)
+                else:
+                    self.buffers[i].append(text)
+        return push
+
+    def done(self, i: int) -> None:
+        with self.lock:
+            self.finished[i] = True
+            while self.current < len(self.finished) and self.finished[self.current]:
+                self.current += 1
+                if self.current < len(self.buffers):
+                    for text in self.buffers[self.current]:
+                        self.emit(text)
+                    self.buffers[self.current] = []
 
 
 # --- Multi-step edit pipeline ---
 
-def propose_patch_multistep(user_text: str, indexer: SymbolIndexer, config: AppConfig, external_context: List[str] | None = None) -> Proposal:
+def propose_patch_multistep(user_text: str, indexer: SymbolIndexer, config: AppConfig, external_context: List[str] | None = None, on_delta: Callable[[str], None] | None = None, dep_graph: DependencyGraph | None = None) -> Proposal:
     _store_rlm_context(indexer)
     plan = _plan_edit_steps(user_text, indexer, config)
     files = plan.get("files", [])[: getattr(config.runtime, "multi_step_max_files", 5)]
     steps = plan.get("steps", [])
     checks = plan.get("checks", [])
 
+    jobs: List[Tuple[str, str]] = []
+    with indexer.snippet_cache():
+        for f in files:
+            file_path = f.get("path") if isinstance(f, dict) else str(f)
+            if not file_path:
+                continue
+            snippet = indexer.get_file_head(file_path, max_lines=300)
+            context_blocks = [{"file": file_path, "snippet": snippet}] if snippet else []
+            context_blocks += _dependent_blocks([file_path], indexer, dep_graph, limit=1)
+            jobs.append((file_path, _build_prompt_for_file(user_text, steps, context_blocks, external_context or [], file_path)))
+
+    config_path = Path(__file__).resolve().parents[1] / "configs" / "config.yaml"
+    workers = min(len(jobs), max_concurrency("coder", config, indexer.repo_root, config_path=config_path))
+    relay = _OrderedRelay(on_delta, len(jobs)) if on_delta else None
+
+    def run(i: int) -> Tuple[str, Dict[str, Any]]:
+        file_path, prompt = jobs[i]
+        start = time.perf_counter()
+        with collect_llm_stats() as stats:
+            try:
+                raw = llm_chat("coder", [
+                    {"role": "system", "content": "You are a coding assistant. Return a unified diff only, plus a one-line SUMMARY and RISK line."},
+                    {"role": "user", "content": prompt},
+                ], config, indexer.repo_root, config_path=config_path, on_delta=relay.sink(i) if relay else None)
+            finally:
+                if relay:
+                    relay.done(i)
+        span = {"file": file_path, "ms": round((time.perf_counter() - start) * 1000.0, 2), "workers": max(workers, 1), **stats}
+        return raw, span
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, range(len(jobs))))
+        # Worker threads have their own collectors; fold their usage into the caller's.
+        for _, span in results:
+            merge_llm_stats(span)
+    else:
+        results = [run(i) for i in range(len(jobs))]
+
     diffs: List[str] = []
     summaries: List[str] = []
     risks: List[str] = []
-
-    for f in files:
-        file_path = f.get("path") if isinstance(f, dict) else str(f)
-        if not file_path:
-            continue
-        snippet = indexer.get_file_head(file_path, max_lines=300)
-        context_blocks = [{"file": file_path, "snippet": snippet}] if snippet else []
-        prompt = _build_prompt_for_file(user_text, steps, context_blocks, external_context or [], file_path)
-        raw = llm_chat("coder", [
-            {"role": "system", "content": "You are a coding assistant. Return a unified diff only, plus a one-line SUMMARY and RISK line."},
-            {"role": "user", "content": prompt},
-        ], config, indexer.repo_root, config_path=Path(__file__).resolve().parents[1] / "configs" / "config.yaml")
+    for raw, _ in results:
         summaries.append(_extract_line(raw, "SUMMARY:"))
         risks.append(_extract_line(raw, "RISK:"))
         diff = _extract_diff(raw)
@@ -67,7 +129,7 @@ def propose_patch_multistep(user_text: str, indexer: SymbolIndexer, config: AppC
     risk = "; ".join([r for r in risks if r])
     if checks:
         risk = (risk + "\nSuggested checks: " + ", ".join(checks)).strip()
-    return Proposal(diff=combined, summary=summary, risk_notes=risk)
+    return Proposal(diff=combined, summary=summary, risk_notes=risk, file_spans=[span for _, span in results])
 
 
 def _plan_edit_steps(user_text: str, indexer: SymbolIndexer, config: AppConfig) -> Dict[str, Any]:
@@ -92,6 +154,8 @@ def _plan_edit_steps(user_text: str, indexer: SymbolIndexer, config: AppConfig)
 
 
 def _build_prompt_for_file(user_text: str, steps: List[str], context_blocks: List[Dict[str, str]], external_context: List[str], file_path: str) -> str:
+    # Everything shared between files comes first so the local runtime can reuse
+    # the KV state for that prefix; only the file-specific tail is re-evaluated.
     parts = []
     parts.append("Task:")
     parts.append(user_text.strip())
@@ -100,6 +164,11 @@ def _build_prompt_for_file(user_text: str, steps: List[str], context_blocks: Lis
     for step in steps:
         parts.append(f"- {step}")
     parts.append("")
+    if external_context:
+        parts.append("External Context:")
+        for item in external_context:
+            parts.append(item)
+            parts.append("")
     parts.append(f"File to edit: {file_path}")
     parts.append("Only modify this file.")
     parts.append("")
@@ -109,22 +178,12 @@ def _build_prompt_for_file(user_text: str, steps: List[str], context_blocks: Lis
             parts.append(f"File: {blk['file']}")
             parts.append(blk["snippet"])
             parts.append("")
-    if external_context:
-        parts.append("External Context:")
-        for item in external_context:
-            parts.append(item)
-            parts.append("")
     parts.append("Return a unified diff against the repo root. Avoid unrelated changes.")
     return "\n".join(parts)
 
 
 def _get_top_files(indexer: SymbolIndexer, limit: int = 50) -> List[str]:
-    indexer.init_db()
-    con = sqlite3.connect(indexer.db_path)
-    cur = con.cursor()
-    rows = cur.execute("SELECT path FROM files LIMIT ?", (limit,)).fetchall()
-    con.close()
-    return [r[0] for r in rows]
+    return [path for path, _ in indexer.file_rows(limit=limit)]
 
 
 def _store_rlm_context(indexer: SymbolIndexer) -> None:
@@ -136,10 +195,10 @@ def _store_rlm_context(indexer: SymbolIndexer) -> None:
         pass
 
 
-def propose_patch(user_text: str, indexer: SymbolIndexer, config: AppConfig, external_context: List[str] | None = None) -> Proposal:
+def propose_patch(user_text: str, indexer: SymbolIndexer, config: AppConfig, external_context: List[str] | None = None, on_delta: Callable[[str], None] | None = None, dep_graph: DependencyGraph | None = None, embeddings: EmbeddingIndex | None = None) -> Proposal:
     if getattr(config.runtime, "multi_step_edits", False):
-        return propose_patch_multistep(user_text, indexer, config, external_context=external_context)
-    context_blocks = _build_context(user_text, indexer)
+        return propose_patch_multistep(user_text, indexer, config, external_context=external_context, on_delta=on_delta, dep_graph=dep_graph)
+    context_blocks = _build_context(user_text, indexer, dep_graph, embeddings)
     plan = [
         "Locate relevant files and symbols",
         "Apply the requested change carefully",
@@ -149,7 +208,7 @@ def propose_patch(user_text: str, indexer: SymbolIndexer, config: AppConfig, ext
     raw = llm_chat("coder", [
         {"role": "system", "content": "You are a coding assistant. Output a unified diff only, plus a one-line SUMMARY and RISK line."},
         {"role": "user", "content": prompt},
-    ], config, indexer.repo_root, config_path=Path(__file__).resolve().parents[1] / "configs" / "config.yaml")
+    ], config, indexer.repo_root, config_path=Path(__file__).resolve().parents[1] / "configs" / "config.yaml", on_delta=on_delta)
     summary = _extract_line(raw, "SUMMARY:")
     risk = _extract_line(raw, "RISK:")
     diff = _extract_diff(raw)
@@ -158,13 +217,13 @@ def propose_patch(user_text: str, indexer: SymbolIndexer, config: AppConfig, ext
     return Proposal(diff=diff, summary=summary, risk_notes=risk)
 
 
-def revise_pending_patch(user_text: str, pending_diff: str, indexer: SymbolIndexer, config: AppConfig, external_context: List[str] | None = None) -> Proposal:
-    context_blocks = _build_context(user_text, indexer)
+def revise_pending_patch(user_text: str, pending_diff: str, indexer: SymbolIndexer, config: AppConfig, external_context: List[str] | None = None, on_delta: Callable[[str], None] | None = None, dep_graph: DependencyGraph | None = None, embeddings: EmbeddingIndex | None = None) -> Proposal:
+    context_blocks = _build_context(user_text, indexer, dep_graph, embeddings)
     prompt = _build_revise_prompt(user_text, pending_diff, context_blocks, external_context or [])
     raw = llm_chat("coder", [
         {"role": "system", "content": "You are a coding assistant. Update the diff minimally. Output a unified diff only, plus a one-line SUMMARY and RISK line."},
         {"role": "user", "content": prompt},
-    ], config, indexer.repo_root, config_path=Path(__file__).resolve().parents[1] / "configs" / "config.yaml")
+    ], config, indexer.repo_root, config_path=Path(__file__).resolve().parents[1] / "configs" / "config.yaml", on_delta=on_delta)
     summary = _extract_line(raw, "SUMMARY:")
     risk = _extract_line(raw, "RISK:")
     diff = _extract_diff(raw)
@@ -173,7 +232,31 @@ def revise_pending_patch(user_text: str, pending_diff: str, indexer: SymbolIndex
     return Proposal(diff=diff, summary=summary, risk_notes=risk)
 
 
-def _build_context(user_text: str, indexer: SymbolIndexer) -> List[Dict[str, str]]:
+def _build_context(user_text: str, indexer: SymbolIndexer, dep_graph: DependencyGraph | None = None, embeddings: EmbeddingIndex | None = None) -> List[Dict[str, str]]:
+    with indexer.snippet_cache():
+        blocks = _collect_context(user_text, indexer, embeddings)
+        # Files importing what we are about to change are the likeliest to break.
+        blocks += _dependent_blocks([b["file"] for b in blocks], indexer, dep_graph, limit=2)
+        return blocks
+
+
+def _dependent_blocks(files: List[str], indexer: SymbolIndexer, dep_graph: DependencyGraph | None, limit: int) -> List[Dict[str, str]]:
+    if dep_graph is None or not files or not dep_graph.db_path.exists():
+        return []
+    seen = set(files)
+    blocks: List[Dict[str, str]] = []
+    for rel in dep_graph.neighborhood(dict.fromkeys(files), depth=1, direction="in"):
+        if rel in seen:
+            continue
+        snippet = indexer.get_file_head(rel, max_lines=40)
+        if snippet:
+            blocks.append({"file": rel, "snippet": snippet})
+        if len(blocks) >= limit:
+            break
+    return blocks
+
+
+def _collect_context(user_text: str, indexer: SymbolIndexer, embeddings: EmbeddingIndex | None = None) -> List[Dict[str, str]]:
     blocks: List[Dict[str, str]] = []
     seen_files = set()
 
@@ -193,9 +276,23 @@ def _build_context(user_text: str, indexer: SymbolIndexer) -> List[Dict[str, str
                 blocks.append({"file": file_rel, "snippet": snippet})
                 seen_files.add(file_rel)
 
+    # Best chunks by BM25, fused with nearest neighbours when embeddings are on.
+    retrieved = 0
+    for hit in hybrid_search(indexer, embeddings, user_text, limit=4):
+        file_rel, start, end = hit["file"], hit["start_line"], hit["end_line"]
+        if file_rel in seen_files:
+            continue
+        snippet = indexer.get_snippet(file_rel, (start + end) // 2, window=(end - start) // 2 + 1)
+        if snippet:
+            blocks.append({"file": file_rel, "snippet": snippet})
+            seen_files.add(file_rel)
+            retrieved += 1
+        if retrieved >= 2:
+            break
+
     keywords = _extract_keywords(user_text)
     for kw in keywords[:3]:
-        hits = indexer.rg_search(kw, max_results=20)
+        hits = indexer.search_text(re.escape(kw), max_results=20)
         for hit in hits:
             file_rel = hit["file"]
             if file_rel in seen_files and len(blocks) >= 4:
@@ -1,42 +1,40 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Dict, Any
-import json
-import urllib.request
-import time
+from typing import List, Dict, Any, Iterator
 import base64
 
+from agent.http_client import get_http_pool
+from agent.inference_backend import openai_delta_text
+
 
 @dataclass
 class OpenAIChatProvider:
     api_key: str
     base_url: str = "https://api.openai.com/v1/chat/completions"
 
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
     def chat(self, messages: List[Dict[str, str]], model: str, temperature: float = 0.2) -> str:
         payload = {
             "model": model,
             "messages": messages,
             "temperature": temperature,
         }
-        last_err: Exception | None = None
-        for attempt in range(3):
-            try:
-                req = urllib.request.Request(
-                    self.base_url,
-                    data=json.dumps(payload).encode("utf-8"),
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    method="POST",
-                )
-                with urllib.request.urlopen(req, timeout=60) as resp:
-                    data = json.loads(resp.read().decode("utf-8"))
-                return data["choices"][0]["message"]["content"]
-            except Exception as exc:
-                last_err = exc
-                time.sleep(1 + attempt)
-        raise RuntimeError(f"OpenAI request failed: {last_err}")
+        data = get_http_pool().post_json(self.base_url, payload, self._headers(), "OpenAI")
+        return data["choices"][0]["message"]["content"]
+
+    def chat_stream(self, messages: List[Dict[str, str]], model: str, temperature: float = 0.2) -> Iterator[str]:
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        }
+        for data in get_http_pool().post_sse(self.base_url, payload, self._headers(), "OpenAI"):
+            text = openai_delta_text(data)
+            if text:
+                yield text
 
     def chat_with_images(self, messages: List[Dict[str, str]], images: List[Dict[str, str]], model: str, temperature: float = 0.2) -> str:
         content_messages: List[Dict[str, Any]] = []
@@ -56,25 +54,8 @@ class OpenAIChatProvider:
             "messages": content_messages,
             "temperature": temperature,
         }
-        last_err: Exception | None = None
-        for attempt in range(3):
-            try:
-                req = urllib.request.Request(
-                    self.base_url,
-                    data=json.dumps(payload).encode("utf-8"),
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    method="POST",
-                )
-                with urllib.request.urlopen(req, timeout=60) as resp:
-                    data = json.loads(resp.read().decode("utf-8"))
-                return data["choices"][0]["message"]["content"]
-            except Exception as exc:
-                last_err = exc
-                time.sleep(1 + attempt)
-        raise RuntimeError(f"OpenAI request failed: {last_err}")
+        data = get_http_pool().post_json(self.base_url, payload, self._headers(), "OpenAI")
+        return data["choices"][0]["message"]["content"]
 
 
 @dataclass
@@ -82,6 +63,9 @@ class GeminiChatProvider:
     api_key: str
     base_url: str = "https://generativelanguage.googleapis.com/v1beta"
 
+    def _headers(self) -> Dict[str, str]:
+        return {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
+
     def chat(self, messages: List[Dict[str, str]], model: str, temperature: float = 0.2) -> str:
         contents = _messages_to_gemini_contents(messages)
         url = f"{self.base_url}/models/{model}:generateContent"
@@ -89,25 +73,22 @@ class GeminiChatProvider:
             "contents": contents,
             "generationConfig": {"temperature": temperature},
         }
-        last_err: Exception | None = None
-        for attempt in range(3):
-            try:
-                req = urllib.request.Request(
-                    url,
-                    data=json.dumps(payload).encode("utf-8"),
-                    headers={
-                        "x-goog-api-key": self.api_key,
-                        "Content-Type": "application/json",
-                    },
-                    method="POST",
-                )
-                with urllib.request.urlopen(req, timeout=60) as resp:
-                    data = json.loads(resp.read().decode("utf-8"))
-                return data["candidates"][0]["content"]["parts"][0]["text"]
-            except Exception as exc:
-                last_err = exc
-                time.sleep(1 + attempt)
-        raise RuntimeError(f"Gemini request failed: {last_err}")
+        data = get_http_pool().post_json(url, payload, self._headers(), "Gemini")
+        return data["candidates"][0]["content"]["parts"][0]["text"]
+
+    def chat_stream(self, messages: List[Dict[str, str]], model: str, temperature: float = 0.2) -> Iterator[str]:
+        contents = _messages_to_gemini_contents(messages)
+        url = f"{self.base_url}/models/{model}:streamGenerateContent?alt=sse"
+        payload = {
+            "contents": contents,
+            "generationConfig": {"temperature": temperature},
+        }
+        for data in get_http_pool().post_sse(url, payload, self._headers(), "Gemini"):
+            for cand in (data.get("candidates") or [])[:1]:
+                for part in (cand.get("content") or {}).get("parts") or []:
+                    text = part.get("text")
+                    if text:
+                        yield text
 
     def chat_with_images(self, messages: List[Dict[str, str]], images: List[Dict[str, str]], model: str, temperature: float = 0.2) -> str:
         contents = _messages_to_gemini_contents_with_images(messages, images)
@@ -116,25 +97,8 @@ class GeminiChatProvider:
             "contents": contents,
             "generationConfig": {"temperature": temperature},
         }
-        last_err: Exception | None = None
-        for attempt in range(3):
-            try:
-                req = urllib.request.Request(
-                    url,
-                    data=json.dumps(payload).encode("utf-8"),
-                    headers={
-                        "x-goog-api-key": self.api_key,
-                        "Content-Type": "application/json",
-                    },
-                    method="POST",
-                )
-                with urllib.request.urlopen(req, timeout=60) as resp:
-                    data = json.loads(resp.read().decode("utf-8"))
-                return data["candidates"][0]["content"]["parts"][0]["text"]
-            except Exception as exc:
-                last_err = exc
-                time.sleep(1 + attempt)
-        raise RuntimeError(f"Gemini request failed: {last_err}")
+        data = get_http_pool().post_json(url, payload, self._headers(), "Gemini")
+        return data["candidates"][0]["content"]["parts"][0]["text"]
 
 
 def _messages_to_gemini_contents(messages: List[Dict[str, str]]) -> List[Dict[str, object]]:
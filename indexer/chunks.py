@@ -0,0 +1,88 @@
+from __future__ import annotations
+from typing import List, Tuple
+import re
+
+from indexer.symbol_search import split_identifier
+
+# Chunks follow symbol boundaries; anything longer is split into windows.
+MAX_CHUNK_LINES = 60
+MIN_CHUNK_LINES = 8
+
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL = re.compile(r"[a-z0-9][A-Z]|[A-Z]{2}[a-z]")
+_QUERY_WORD = re.compile(r"[A-Za-z0-9_]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "if", "in", "into", "is", "it", "its", "me", "my", "of", "on", "or",
+    "show", "so", "that", "the", "their", "them", "then", "there", "these", "this",
+    "to", "use", "used", "uses", "using", "was", "we", "what", "when", "where", "which",
+    "who", "why", "will", "with", "you", "your",
+}
+
+# (start_line, end_line, label); lines are 1-based and inclusive.
+Span = Tuple[int, int, str]
+
+
+def _windows(start: int, end: int, label: str) -> List[Span]:
+    return [(s, min(end, s + MAX_CHUNK_LINES - 1), label) for s in range(start, end + 1, MAX_CHUNK_LINES)]
+
+
+def _cover(start: int, end: int, symbols: List[Tuple[int, int, str]]) -> List[Span]:
+    """Spans covering start..end: outermost symbols within it, gaps between them."""
+    spans: List[Span] = []
+    pos = start
+    for s, e, name in symbols:
+        if s < pos or e > end:
+            continue  # nested in a symbol already placed, or outside the range
+        if s > pos:
+            spans += _windows(pos, s - 1, "")
+        if e - s + 1 <= MAX_CHUNK_LINES:
+            spans.append((s, e, name))
+        else:
+            inner = [sym for sym in symbols if s <= sym[0] and sym[1] <= e and sym != (s, e, name)]
+            # Code between nested symbols is labelled with the enclosing one.
+            spans += [(a, b, lbl or name) for a, b, lbl in (_cover(s, e, inner) if inner else _windows(s, e, name))]
+        pos = e + 1
+    if pos <= end:
+        spans += _windows(pos, end, "")
+    return spans
+
+
+def chunk_spans(symbols: List[Tuple[str, str, int, int]], n_lines: int) -> List[Span]:
+    """Splits a file of `n_lines` along (kind, name, start, end) symbol boundaries.
+
+    Small neighbouring pieces (imports, one-line helpers) are merged up to
+    MAX_CHUNK_LINES so each chunk carries enough text to score.
+    """
+    if n_lines <= 0:
+        return []
+    ordered = sorted({(s, e, name) for _kind, name, s, e in symbols if 1 <= s <= e}, key=lambda x: (x[0], -x[1]))
+    spans = _cover(1, n_lines, ordered)
+    merged: List[Span] = []
+    for s, e, label in spans:
+        if merged:
+            ps, pe, plabel = merged[-1]
+            small = (pe - ps + 1) < MIN_CHUNK_LINES or (e - s + 1) < MIN_CHUNK_LINES
+            if small and e - ps + 1 <= MAX_CHUNK_LINES:
+                merged[-1] = (ps, e, plabel or label)
+                continue
+        merged.append((s, e, label))
+    return merged
+
+
+def chunk_words(body: str) -> str:
+    """camelCase identifiers split into words; the tokenizer already splits snake_case."""
+    words = {w for ident in set(_IDENT.findall(body)) if _CAMEL.search(ident) for w in split_identifier(ident)}
+    return " ".join(sorted(words))
+
+
+def bm25_query(text: str, max_terms: int = 24) -> str:
+    """FTS5 OR-query over the non-stopword terms of a natural-language question."""
+    terms: List[str] = []
+    for raw in _QUERY_WORD.findall(text):
+        for word in [raw.lower()] + (split_identifier(raw) if _CAMEL.search(raw) else []):
+            for part in word.split("_"):
+                if len(part) >= 2 and part not in STOPWORDS and part not in terms:
+                    terms.append(part)
+    return " OR ".join('"' + t + '"' for t in terms[:max_terms])
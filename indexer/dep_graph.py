@@ -1,8 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from array import array
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterable, Iterator, List, Dict, Any, Set, Tuple
+import json
+import math
+import posixpath
+import re
 import sqlite3
+import threading
 from tree_sitter_languages import get_parser
 
 SUPPORTED = {
@@ -12,11 +20,276 @@ SUPPORTED = {
     ".tsx": "tsx",
 }
 
+_PY_FROM = re.compile(r"^\s*from\s+(\.*)([\w.]*)\s+import\s+(.+)$", re.S)
+_PY_IMPORT = re.compile(r"^\s*import\s+(.+)$", re.S)
+_JS_SPEC = re.compile(r"""(?:\bfrom\s*|\brequire\(\s*|\bimport\s*\(?\s*)['"]([^'"]+)['"]""")
+_JS_EXTS = (".ts", ".tsx", ".js")
+# Where top-level Python packages may live, relative to the repo root.
+PY_SOURCE_ROOTS = ("", "src")
+
+
+def _py_module_files(module: str, roots: Tuple[str, ...] = PY_SOURCE_ROOTS) -> List[str]:
+    base = module.replace(".", "/")
+    out = []
+    for root in roots:
+        stem = posixpath.join(root, base) if root else base
+        out += [stem + ".py", stem + "/__init__.py"]
+    return out
+
+
+def _py_relative_files(module_path: str) -> List[str]:
+    # Relative imports resolve against the importing package only.
+    return [module_path + ".py", module_path + "/__init__.py"]
+
+
+def _js_files(base: str) -> List[str]:
+    base = posixpath.normpath(base)
+    out = [base] + [base + e for e in _JS_EXTS] + [f"{base}/index{e}" for e in _JS_EXTS]
+    if base.endswith(".js"):
+        # ESM-style TypeScript imports name the emitted .js file.
+        out += [base[:-3] + ".ts", base[:-3] + ".tsx"]
+    return out
+
+
+@dataclass
+class PathAliases:
+    """compilerOptions.baseUrl / paths from tsconfig.json or jsconfig.json."""
+
+    base_url: str | None = None
+    paths: List[Tuple[str, List[str]]] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, repo_root: Path) -> "PathAliases":
+        for name in ("tsconfig.json", "jsconfig.json"):
+            path = repo_root / name
+            if not path.exists():
+                continue
+            try:
+                data = json.loads(_strip_json_comments(path.read_text(errors="ignore")))
+            except ValueError:
+                continue
+            opts = data.get("compilerOptions") or {}
+            base = opts.get("baseUrl")
+            base_url = posixpath.normpath(base) if base else None
+            root = base_url if base_url not in (None, ".") else ""
+            paths = []
+            for pattern, targets in (opts.get("paths") or {}).items():
+                resolved = [posixpath.normpath(posixpath.join(root, t)) if root else posixpath.normpath(t) for t in targets]
+                paths.append((pattern, resolved))
+            return cls(base_url=base_url, paths=paths)
+        return cls()
+
+    def candidates(self, spec: str) -> List[str]:
+        out: List[str] = []
+        for pattern, targets in self.paths:
+            if pattern.endswith("*"):
+                prefix = pattern[:-1]
+                if spec.startswith(prefix):
+                    rest = spec[len(prefix):]
+                    out += [t.replace("*", rest, 1) for t in targets]
+            elif spec == pattern:
+                out += targets
+        if self.base_url is not None:
+            out.append(posixpath.join(self.base_url, spec) if self.base_url != "." else spec)
+        return out
+
+
+def _strip_json_comments(text: str) -> str:
+    # tsconfig allows comments and trailing commas; keep string contents intact.
+    text = re.sub(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/', lambda m: m.group(1) or "", text, flags=re.S)
+    return re.sub(r",(\s*[}\]])", r"\1", text)
+
+
+def import_targets(
+    file_rel: str,
+    dep: str,
+    aliases: PathAliases | None = None,
+    py_roots: Tuple[str, ...] = PY_SOURCE_ROOTS,
+) -> List[Tuple[str, int, str]]:
+    """(group, rank, repo path) candidates for an import statement.
+
+    Each group resolves to its lowest-ranked candidate that exists: a JS
+    specifier names one file, while every Python module a statement names is
+    its own group.
+    """
+    out: List[Tuple[str, int, str]] = []
+    if file_rel.endswith(".py"):
+        paths: List[str] = []
+        m = _PY_FROM.match(dep)
+        if m:
+            dots, module, names = m.groups()
+            names = [n.strip().split(" as ")[0].strip() for n in names.strip().strip("()").split(",")]
+            names = [n for n in names if n and n != "*"]
+            if dots:
+                pkg = posixpath.dirname(file_rel)
+                for _ in range(len(dots) - 1):
+                    pkg = posixpath.dirname(pkg)
+                base = posixpath.join(pkg, module.replace(".", "/")) if module else pkg
+                if module:
+                    paths += _py_relative_files(base)
+                for name in names:
+                    paths += _py_relative_files(posixpath.join(base, name) if base else name)
+            else:
+                paths += _py_module_files(module, py_roots)
+                paths += [f for name in names for f in _py_module_files(f"{module}.{name}", py_roots)]
+        else:
+            m = _PY_IMPORT.match(dep)
+            if m:
+                for part in m.group(1).split(","):
+                    module = part.strip().split(" as ")[0].strip()
+                    if module:
+                        paths += _py_module_files(module, py_roots)
+        out = [(p, 0, p) for p in paths]
+    else:
+        for spec in _JS_SPEC.findall(dep):
+            if spec.startswith("."):
+                paths = _js_files(posixpath.join(posixpath.dirname(file_rel), spec))
+            elif aliases is not None:
+                paths = [f for base in aliases.candidates(spec) for f in _js_files(base)]
+            else:
+                continue
+            out += [(spec, rank, p) for rank, p in enumerate(paths)]
+    seen: Set[Tuple[str, str]] = set()
+    unique = []
+    for group, rank, path in out:
+        if path and path != file_rel and not path.startswith("../") and (group, path) not in seen:
+            seen.add((group, path))
+            unique.append((group, rank, path))
+    return unique
+
+
+def _first_existing(targets: Iterable[Tuple[str, int, str]], files: Set[str]) -> List[str]:
+    best: Dict[str, Tuple[int, str]] = {}
+    for group, rank, path in targets:
+        if path in files and (group not in best or rank < best[group][0]):
+            best[group] = (rank, path)
+    return list(dict.fromkeys(path for _, path in best.values()))
+
+
+def resolve_import(file_rel: str, dep: str, files: Set[str], aliases: PathAliases | None = None) -> List[str]:
+    """Repo files an import statement refers to; external modules resolve to nothing."""
+    return _first_existing(import_targets(file_rel, dep, aliases), files)
+
+
+def import_text(n, lang: str) -> str | None:
+    """Source of `n` if it is an import statement/call; checked per node during a tree walk."""
+    if lang == "python":
+        if n.type in {"import_statement", "import_from_statement"}:
+            return n.text.decode("utf-8", errors="ignore")
+    elif lang in {"javascript", "typescript", "tsx"}:
+        if n.type in {"import_statement", "import_clause", "import"}:
+            text = n.text.decode("utf-8", errors="ignore")
+            if "from" in text or "require" in text:
+                return text
+        elif n.type == "export_statement" and n.child_by_field_name("source") is not None:
+            return n.text.decode("utf-8", errors="ignore")
+        elif n.type == "call_expression":
+            fn = n.child_by_field_name("function")
+            if fn is not None and fn.type in {"identifier", "import"} and fn.text in (b"require", b"import"):
+                return n.text.decode("utf-8", errors="ignore")
+    return None
+
+
+class CSRGraph:
+    """Compressed sparse rows for forward and reverse edges over node ids."""
+
+    def __init__(self, nodes: List[str], edges: Iterable[Tuple[int, int]]) -> None:
+        self.nodes = nodes
+        self.ids = {n: i for i, n in enumerate(nodes)}
+        pairs = sorted(set(edges))
+        self.fwd_off, self.fwd = self._pack(len(nodes), pairs)
+        self.rev_off, self.rev = self._pack(len(nodes), sorted((b, a) for a, b in pairs))
+
+    @staticmethod
+    def _pack(n: int, pairs: List[Tuple[int, int]]) -> Tuple[array, array]:
+        offsets = array("i", [0] * (n + 1))
+        targets = array("i", [b for _, b in pairs])
+        for a, _ in pairs:
+            offsets[a + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        return offsets, targets
+
+    def out_degree(self, i: int) -> int:
+        return self.fwd_off[i + 1] - self.fwd_off[i]
+
+    def in_degree(self, i: int) -> int:
+        return self.rev_off[i + 1] - self.rev_off[i]
+
+    def pagerank(
+        self,
+        personalization: Dict[int, float] | None = None,
+        start: List[float] | None = None,
+        damping: float = 0.85,
+        tol: float = 1e-4,
+        max_iter: int = 100,
+    ) -> List[float]:
+        """Power iteration; imported files receive rank from their importers.
+
+        Teleports (and dangling nodes) go to `personalization` or uniformly.
+        `start` warm-starts from a previous result, which makes recomputing
+        after a small graph change take a few iterations instead of dozens.
+        """
+        n = len(self.nodes)
+        if n == 0:
+            return []
+        if personalization:
+            total = sum(personalization.values())
+            tele = [0.0] * n
+            for i, w in personalization.items():
+                tele[i] = w / total
+        else:
+            tele = [1.0 / n] * n
+        rank = list(start) if start is not None and len(start) == n else list(tele)
+        out_deg = [self.out_degree(i) for i in range(n)]
+        dangling = [i for i in range(n) if out_deg[i] == 0]
+        rev_off, rev = self.rev_off, self.rev
+        for _ in range(max_iter):
+            share = [damping * rank[i] / out_deg[i] if out_deg[i] else 0.0 for i in range(n)]
+            leak = (1.0 - damping) + damping * sum(rank[i] for i in dangling)
+            pick = share.__getitem__
+            new = [leak * tele[j] + sum(map(pick, rev[rev_off[j]:rev_off[j + 1]])) for j in range(n)]
+            delta = sum(abs(a - b) for a, b in zip(new, rank))
+            rank = new
+            if delta < tol:
+                break
+        return rank
+
+    def _adj(self, direction: str):
+        if direction == "out":
+            return ((self.fwd_off, self.fwd),)
+        if direction == "in":
+            return ((self.rev_off, self.rev),)
+        return ((self.fwd_off, self.fwd), (self.rev_off, self.rev))
+
+    def bfs(self, starts: Iterable[int], direction: str = "out", max_depth: int | None = None) -> Dict[int, int]:
+        """Node id -> hop distance for everything reachable (starts excluded)."""
+        adj = self._adj(direction)
+        dist: Dict[int, int] = {}
+        queue = deque()
+        seeds = set(starts)
+        for s in seeds:
+            queue.append((s, 0))
+        while queue:
+            node, d = queue.popleft()
+            if max_depth is not None and d >= max_depth:
+                continue
+            for off, tgt in adj:
+                for j in range(off[node], off[node + 1]):
+                    nxt = tgt[j]
+                    if nxt not in dist and nxt not in seeds:
+                        dist[nxt] = d + 1
+                        queue.append((nxt, d + 1))
+        return dist
+
 
 @dataclass
 class DependencyGraph:
     repo_root: Path
     db_path: Path
+    _csr: Tuple[int, CSRGraph] | None = field(default=None, init=False, repr=False)
+    _aliases: Tuple[Tuple[int, ...], PathAliases] | None = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
 
     def init_db(self) -> None:
         con = sqlite3.connect(self.db_path)
@@ -27,25 +300,213 @@ class DependencyGraph:
             dep TEXT
         )""")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_deps_file ON deps(file_path)")
+        # Every file seen by update_files; edges only resolve to these.
+        cur.execute("CREATE TABLE IF NOT EXISTS dep_files(path TEXT PRIMARY KEY) WITHOUT ROWID")
+        # Candidate targets per import (see import_targets); a candidate starts
+        # resolving as soon as its file appears, without reparsing importers.
+        cur.execute("""CREATE TABLE IF NOT EXISTS edges(
+            src TEXT,
+            grp TEXT,
+            rank INTEGER,
+            dst TEXT,
+            PRIMARY KEY(src, grp, dst)
+        ) WITHOUT ROWID""")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_edges_dst ON edges(dst, src)")
+        # Last global PageRank; see graph_meta.
+        cur.execute("CREATE TABLE IF NOT EXISTS file_rank(path TEXT PRIMARY KEY, score REAL) WITHOUT ROWID")
+        # 'version' is bumped by every graph write (the CSR cache key) and
+        # 'rank_version' records which version file_rank was computed for.
+        cur.execute("CREATE TABLE IF NOT EXISTS graph_meta(key TEXT PRIMARY KEY, value INTEGER) WITHOUT ROWID")
         con.commit()
         con.close()
 
+    def aliases(self) -> PathAliases:
+        stamp = tuple(
+            int(p.stat().st_mtime_ns) if p.exists() else 0
+            for p in (self.repo_root / "tsconfig.json", self.repo_root / "jsconfig.json")
+        )
+        if self._aliases is None or self._aliases[0] != stamp:
+            self._aliases = (stamp, PathAliases.load(self.repo_root))
+        return self._aliases[1]
+
     def update_file(self, file_path: Path) -> None:
-        lang = SUPPORTED.get(file_path.suffix)
-        if not lang:
+        self.update_files([file_path])
+
+    def update_files(self, file_paths: Iterable[Path]) -> None:
+        rows: List[Tuple[str, List[str]]] = []
+        for file_path in file_paths:
+            lang = SUPPORTED.get(file_path.suffix)
+            if not lang:
+                continue
+            rel = file_path.relative_to(self.repo_root).as_posix()
+            src = file_path.read_bytes()
+            tree = get_parser(lang).parse(src)
+            rows.append((rel, self._extract_deps(tree.root_node, src, lang)))
+        self.write_deps(rows)
+
+    def write_deps(self, rows: List[Tuple[str, List[str]]], con: sqlite3.Connection | None = None, schema: str = "main") -> None:
+        """Replaces the imports of each (rel path, [import statement text]).
+
+        With `con`, writes into that connection's open transaction, where this
+        database is attached as `schema`; otherwise commits on its own.
+        """
+        if not rows:
             return
-        rel = str(file_path.relative_to(self.repo_root))
-        src = file_path.read_bytes()
-        parser = get_parser(lang)
-        tree = parser.parse(src)
-        deps = self._extract_deps(tree.root_node, src, lang)
+        aliases = self.aliases()
+        py_roots = tuple(r for r in PY_SOURCE_ROOTS if (self.repo_root / r).is_dir())
+        rels = [(rel,) for rel, _ in rows]
+        with self._writer(con, schema) as cur:
+            self._delete_rows(cur, rels, schema, keep_nodes=True)
+            cur.executemany(f"INSERT OR IGNORE INTO {schema}.dep_files(path) VALUES (?)", rels)
+            cur.executemany(
+                f"INSERT INTO {schema}.deps(file_path, dep) VALUES (?, ?)",
+                [(rel, dep) for rel, deps in rows for dep in deps],
+            )
+            cur.executemany(
+                f"INSERT OR IGNORE INTO {schema}.edges(src, grp, rank, dst) VALUES (?, ?, ?, ?)",
+                [(rel, *t) for rel, deps in rows for dep in deps for t in import_targets(rel, dep, aliases, py_roots)],
+            )
+
+    def remove_file(self, rel: str) -> None:
+        self.remove_files([rel])
+
+    def remove_files(self, rels: Iterable[str], con: sqlite3.Connection | None = None, schema: str = "main") -> None:
+        rows = [(rel,) for rel in rels]
+        if rows:
+            with self._writer(con, schema) as cur:
+                self._delete_rows(cur, rows, schema, keep_nodes=False)
+
+    @staticmethod
+    def _delete_rows(cur: sqlite3.Connection, rels: List[Tuple[str]], schema: str, keep_nodes: bool) -> None:
+        cur.executemany(f"DELETE FROM {schema}.deps WHERE file_path = ?", rels)
+        cur.executemany(f"DELETE FROM {schema}.edges WHERE src = ?", rels)
+        if not keep_nodes:
+            cur.executemany(f"DELETE FROM {schema}.dep_files WHERE path = ?", rels)
+
+    @contextmanager
+    def _writer(self, con: sqlite3.Connection | None, schema: str = "main") -> Iterator[sqlite3.Connection]:
+        own = sqlite3.connect(self.db_path) if con is None else None
+        cur = own or con
+        try:
+            with (own if own is not None else nullcontext()):
+                yield cur
+                cur.execute(
+                    f"INSERT INTO {schema}.graph_meta(key, value) VALUES ('version', 1) "
+                    "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+                )
+        finally:
+            if own is not None:
+                own.close()
+
+    @staticmethod
+    def _version(con: sqlite3.Connection, key: str = "version") -> int:
+        row = con.execute("SELECT value FROM graph_meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row is not None else 0
+
+    def files(self) -> Set[str]:
         con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        cur.execute("DELETE FROM deps WHERE file_path = ?", (rel,))
-        for dep in deps:
-            cur.execute("INSERT INTO deps(file_path, dep) VALUES (?, ?)", (rel, dep))
-        con.commit()
-        con.close()
+        try:
+            return {r[0] for r in con.execute("SELECT path FROM dep_files")}
+        finally:
+            con.close()
+
+    def graph(self) -> CSRGraph:
+        """In-memory CSR of resolved edges, rebuilt when the graph version moves."""
+        with self._lock:
+            con = sqlite3.connect(self.db_path)
+            try:
+                stamp = self._version(con)
+                if self._csr is not None and self._csr[0] == stamp:
+                    return self._csr[1]
+                nodes = [r[0] for r in con.execute("SELECT path FROM dep_files ORDER BY path")]
+                ids = {n: i for i, n in enumerate(nodes)}
+                pairs = []
+                last = None
+                rows = con.execute(
+                    "SELECT e.src, e.grp, e.dst FROM edges e JOIN dep_files f ON f.path = e.dst "
+                    "ORDER BY e.src, e.grp, e.rank"
+                )
+                for src, grp, dst in rows:
+                    # Lowest-ranked existing candidate wins within a group.
+                    if (src, grp) != last and src in ids:
+                        pairs.append((ids[src], ids[dst]))
+                    last = (src, grp)
+            finally:
+                con.close()
+            csr = CSRGraph(nodes, pairs)
+            self._csr = (stamp, csr)
+            return csr
+
+    def dependencies(self, rel: str, depth: int | None = 1) -> List[str]:
+        """Files `rel` imports, within `depth` hops (None = transitive closure)."""
+        return self._reach([rel], "out", depth)
+
+    def dependents(self, rel: str, depth: int | None = 1) -> List[str]:
+        """Files importing `rel`, within `depth` hops (None = everything impacted)."""
+        return self._reach([rel], "in", depth)
+
+    def neighborhood(self, rels: Iterable[str], depth: int = 1, direction: str = "both") -> List[str]:
+        return self._reach(list(rels), direction, depth)
+
+    def _reach(self, rels: List[str], direction: str, depth: int | None) -> List[str]:
+        g = self.graph()
+        starts = [g.ids[r] for r in rels if r in g.ids]
+        dist = g.bfs(starts, direction, depth)
+        return [g.nodes[i] for i in sorted(dist, key=lambda i: (dist[i], g.nodes[i]))]
+
+    def degrees(self) -> Dict[str, Tuple[int, int]]:
+        """rel -> (resolved imports, files importing it)."""
+        g = self.graph()
+        return {n: (g.out_degree(i), g.in_degree(i)) for i, n in enumerate(g.nodes)}
+
+    def centrality(self, files: Iterable[str] | None = None) -> Dict[str, float]:
+        """0..1 score per file from how many other files import it (log-scaled)."""
+        g = self.graph()
+        keep = set(files) if files is not None else None
+        indeg = {
+            n: g.in_degree(i)
+            for i, n in enumerate(g.nodes)
+            if g.in_degree(i) and (keep is None or n in keep)
+        }
+        if not indeg:
+            return {}
+        top = math.log1p(max(indeg.values()))
+        return {f: math.log1p(n) / top for f, n in indeg.items()}
+
+    def ranks(self) -> Dict[str, float]:
+        """Global PageRank per file, persisted in deps.sqlite.
+
+        Only recomputed when the resolved graph changed, warm-started from the
+        stored scores.
+        """
+        con = sqlite3.connect(self.db_path)
+        try:
+            stored = dict(con.execute("SELECT path, score FROM file_rank").fetchall())
+            version = self._version(con)
+            if stored and self._version(con, "rank_version") == version:
+                return stored
+            g = self.graph()
+            start = None
+            if stored:
+                start = [stored.get(n, 1.0 / len(g.nodes)) for n in g.nodes]
+                total = sum(start)
+                start = [x / total for x in start]
+            scores = dict(zip(g.nodes, g.pagerank(start=start)))
+            with con:
+                con.execute("DELETE FROM file_rank")
+                con.executemany("INSERT INTO file_rank(path, score) VALUES (?, ?)", scores.items())
+                con.execute("INSERT OR REPLACE INTO graph_meta(key, value) VALUES ('rank_version', ?)", (version,))
+            return scores
+        finally:
+            con.close()
+
+    def personalized_ranks(self, focus: Iterable[str]) -> Dict[str, float]:
+        """PageRank teleporting only to `focus` files: what they use, directly or not."""
+        g = self.graph()
+        weights = {g.ids[f]: 1.0 for f in focus if f in g.ids}
+        if not weights:
+            return {}
+        return dict(zip(g.nodes, g.pagerank(personalization=weights)))
 
     def list_deps(self, limit: int = 1000) -> List[Dict[str, Any]]:
         con = sqlite3.connect(self.db_path)
@@ -59,12 +520,8 @@ class DependencyGraph:
         stack = [node]
         while stack:
             n = stack.pop()
-            if lang == "python" and n.type in {"import_statement", "import_from_statement"}:
-                text = n.text.decode("utf-8", errors="ignore")
+            text = import_text(n, lang)
+            if text is not None:
                 deps.append(text)
-            if lang in {"javascript", "typescript", "tsx"} and n.type in {"import_statement", "import_clause", "import"}:
-                text = n.text.decode("utf-8", errors="ignore")
-                if "from" in text or "require" in text:
-                    deps.append(text)
             stack.extend(reversed(n.children))
         return deps
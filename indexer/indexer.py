@@ -1,11 +1,32 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+import hashlib
+import multiprocessing
+import os
+import re
 import sqlite3
 import subprocess
-from typing import Iterable, List, Dict
+import threading
+import time
+import uuid
+from typing import Any, Iterable, Iterator, List, Dict, NamedTuple, Set, Tuple
 from tree_sitter_languages import get_parser
 
+from indexer import symbol_search, text_search
+from indexer.chunks import bm25_query, chunk_spans, chunk_words
+from indexer.dep_graph import DependencyGraph, import_text
+from indexer.dep_graph import SUPPORTED as DEP_SUPPORTED
+from indexer.snippets import SnippetReader, Stamp, line_offsets, request_windows
+from indexer.symbol_search import identifier_words
+from indexer.walker import WalkStats, walk_repo
+
+try:
+    import xxhash  # type: ignore
+except ImportError:  # optional; blake2b is the fallback
+    xxhash = None
+
 SUPPORTED = {
     ".py": "python",
     ".js": "javascript",
@@ -32,143 +53,601 @@ EXCLUDE_DIRS = {
     ".agent_staging",
     "models",
 }
+
+# Below this many files a process pool costs more to start than it saves.
+_PARALLEL_MIN_FILES = 256
+# Paths per rg invocation in search_text's fallback, well under ARG_MAX.
+_RG_BATCH = 1000
+
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Columns added after the first release; older databases are migrated in place.
+_FILE_COLUMNS = {"size": "INTEGER", "mtime_ns": "INTEGER", "ino": "INTEGER", "digest": "TEXT", "line_offsets": "BLOB"}
+
+
+class ParsedFile(NamedTuple):
+    rel: str
+    mtime: float
+    # [(kind, name, start_line, end_line)]; None when the content hash matched
+    # the stored one and only the stat fields need refreshing.
+    symbols: List[Tuple[str, str, int, int]] | None
+    size: int
+    mtime_ns: int
+    ino: int
+    digest: str
+    text: str = ""  # decoded source for the text index; only set when reparsed
+    offsets: bytes = b""  # snippets.line_offsets(), packed
+    # Import statements for the dependency graph; None for non-source files.
+    imports: List[str] | None = None
+    # [(start_line, end_line, symbol, body)] for the BM25 chunk index
+    chunks: Tuple[Tuple[int, int, str, str], ...] = ()
+
+
+def content_digest(data: bytes) -> str:
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def parse_file(repo_root: Path, rel: str, known_digest: str = "", want_digest: bool = True) -> ParsedFile | None:
+    lang = SUPPORTED.get(os.path.splitext(rel)[1])
+    if not lang:
+        return None
+    path = repo_root / rel
+    # stat before reading: a write racing the read then shows up as a change next run.
+    st = path.stat()
+    src = path.read_bytes()
+    digest = content_digest(src) if want_digest else ""
+    if known_digest and digest == known_digest:
+        return ParsedFile(rel, st.st_mtime, None, st.st_size, st.st_mtime_ns, st.st_ino, digest)
+    tree = get_parser(lang).parse(src)
+    symbols, imports = _extract(tree.root_node, src, lang)
+    rows = [(sym["kind"], sym["name"], sym["start_line"], sym["end_line"]) for sym in symbols]
+    text = src.decode("utf-8", errors="replace")
+    offsets = line_offsets(src).tobytes()
+    if os.path.splitext(rel)[1] not in DEP_SUPPORTED:
+        imports = None
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        lines.pop()
+    chunks = tuple(
+        (start, end, label, body)
+        for start, end, label in chunk_spans(rows, len(lines))
+        if (body := "\n".join(lines[start - 1:end])).strip()
+    )
+    return ParsedFile(rel, st.st_mtime, rows, st.st_size, st.st_mtime_ns, st.st_ino, digest, text, offsets, imports, chunks)
+
+
+def _parse_worker(item: Tuple[str, str, str, bool]) -> ParsedFile | None:
+    # Runs in pool processes; get_parser caches one parser per language per process.
+    root, rel, known_digest, want_digest = item
+    try:
+        return parse_file(Path(root), rel, known_digest, want_digest)
+    except OSError:
+        # Deleted or unreadable between the walk and the parse.
+        return None
+
+
+def _extract(node, src: bytes, lang: str) -> Tuple[List[Dict[str, object]], List[str]]:
+    # One walk over the tree collects symbols and the imports for the dep graph.
+    symbols: List[Dict[str, object]] = []
+    imports: List[str] = []
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        imp = import_text(n, lang)
+        if imp is not None:
+            imports.append(imp)
+        if lang == "python":
+            if n.type == "function_definition":
+                name = n.child_by_field_name("name")
+                if name:
+                    symbols.append(_make_symbol("function", name, n))
+            elif n.type == "class_definition":
+                name = n.child_by_field_name("name")
+                if name:
+                    symbols.append(_make_symbol("class", name, n))
+        elif lang in {"javascript", "typescript", "tsx"}:
+            if n.type == "function_declaration":
+                name = n.child_by_field_name("name")
+                if name:
+                    symbols.append(_make_symbol("function", name, n))
+            elif n.type == "method_definition":
+                name = n.child_by_field_name("name")
+                if name:
+                    symbols.append(_make_symbol("method", name, n))
+            elif n.type == "class_declaration":
+                name = n.child_by_field_name("name")
+                if name:
+                    symbols.append(_make_symbol("class", name, n))
+            elif n.type == "variable_declarator":
+                init = n.child_by_field_name("value")
+                name = n.child_by_field_name("name")
+                if name and init and init.type in {"arrow_function", "function"}:
+                    symbols.append(_make_symbol("function", name, n))
+        stack.extend(reversed(n.children))
+    return symbols, imports
+
+
+def _make_symbol(kind: str, name_node, parent_node) -> Dict[str, object]:
+    name = name_node.text.decode("utf-8", errors="ignore")
+    start_line = parent_node.start_point[0] + 1
+    end_line = parent_node.end_point[0] + 1
+    return {
+        "kind": kind,
+        "name": name,
+        "start_line": start_line,
+        "end_line": end_line,
+    }
+
+
 @dataclass
 class SymbolIndexer:
     repo_root: Path
     db_path: Path
+    workers: int = 0  # parse processes; 0 = one per CPU core
+    batch_files: int = 1000
+    content_hash: bool = True
+    use_gitignore: bool = True
+    # When set, imports are written to its database (attached as `depdb`) in
+    # the same transaction as the symbols parsed from the same tree.
+    dep_graph: DependencyGraph | None = None
+    last_stats: Dict[str, Any] = field(default_factory=dict, init=False, repr=False)
+    _con: sqlite3.Connection | None = field(default=None, init=False, repr=False)
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False)
+    _fts: bool = field(default=False, init=False, repr=False)
+    _text: bool = field(default=False, init=False, repr=False)
+    _chunks: bool = field(default=False, init=False, repr=False)
+    _reader: SnippetReader | None = field(default=None, init=False, repr=False)
+    # Files the last walk saw but does not index (docs, configs); search_text's rg fallback.
+    _others: Set[str] | None = field(default=None, init=False, repr=False)
+    # Bumped whenever a run reparses or removes a file; see signature().
+    generation: int = field(default=0, init=False)
+    _session: str = field(default_factory=lambda: uuid.uuid4().hex[:12], init=False, repr=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per indexer, shared across threads under _lock. WAL lets
+        # other readers of the db file (repo map, server) proceed during writes.
+        with self._lock:
+            if self._con is None:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                con = sqlite3.connect(self.db_path, check_same_thread=False)
+                for pragma in _SQLITE_PRAGMAS:
+                    con.execute(pragma)
+                # Used by the symbols_fts triggers, so every writer connection needs it.
+                con.create_function("identifier_words", 1, identifier_words, deterministic=True)
+                if self.dep_graph is not None:
+                    self.dep_graph.init_db()
+                    con.execute("ATTACH DATABASE ? AS depdb", (str(self.dep_graph.db_path),))
+                self._con = con
+                self._create_schema(con)
+            return self._con
+
+    def close(self) -> None:
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
 
     def init_db(self) -> None:
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        cur.execute("""CREATE TABLE IF NOT EXISTS files(
-            path TEXT PRIMARY KEY,
-            mtime REAL
-        )""")
-        cur.execute("""CREATE TABLE IF NOT EXISTS symbols(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_path TEXT,
-            kind TEXT,
-            name TEXT,
-            start_line INT,
-            end_line INT
-        )""")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_symbols_file ON symbols(file_path)")
-        con.commit()
-        con.close()
+        self._connect()
+
+    def signature(self) -> str:
+        """Changes whenever indexed content does; O(1), unlike hashing the files table.
+
+        Unique per indexer instance, so a fresh process never matches a stale cache.
+        """
+        return f"{self._session}:{self.generation}"
+
+    def _create_schema(self, con: sqlite3.Connection) -> None:
+        with con:
+            con.execute("""CREATE TABLE IF NOT EXISTS files(
+                path TEXT PRIMARY KEY,
+                mtime REAL
+            )""")
+            con.execute("""CREATE TABLE IF NOT EXISTS symbols(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                file_path TEXT,
+                kind TEXT,
+                name TEXT,
+                start_line INT,
+                end_line INT
+            )""")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_symbols_file ON symbols(file_path)")
+            # Covering indexes: symbol lookups and file listings never touch the base tables.
+            con.execute("CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name, kind, file_path, start_line, end_line)")
+            cols = {row[1] for row in con.execute("PRAGMA table_info(files)")}
+            for name, decl in _FILE_COLUMNS.items():
+                if name not in cols:
+                    con.execute(f"ALTER TABLE files ADD COLUMN {name} {decl}")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_files_path ON files(path, mtime)")
+        self._fts = self._create_fts(con)
+        self._text = self._create_text_index(con)
+        self._chunks = self._create_chunk_index(con)
+        if self.dep_graph is not None:
+            self._backfill_deps(con)
+
+    def _create_fts(self, con: sqlite3.Connection) -> bool:
+        # Trigram FTS5 mirror of symbols.name, kept in sync by triggers. Needs
+        # SQLite >= 3.34; without it search falls back to LIKE scans.
+        try:
+            with con:
+                exists = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'symbols_fts'").fetchone()
+                con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS symbols_fts USING fts5(name, words, tokenize='trigram')")
+                con.execute("""CREATE TRIGGER IF NOT EXISTS symbols_fts_ai AFTER INSERT ON symbols BEGIN
+                    INSERT INTO symbols_fts(rowid, name, words) VALUES (new.id, new.name, identifier_words(new.name));
+                END""")
+                con.execute("""CREATE TRIGGER IF NOT EXISTS symbols_fts_ad AFTER DELETE ON symbols BEGIN
+                    DELETE FROM symbols_fts WHERE rowid = old.id;
+                END""")
+                if not exists:
+                    con.execute("INSERT INTO symbols_fts(rowid, name, words) SELECT id, name, identifier_words(name) FROM symbols")
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def _create_text_index(self, con: sqlite3.Connection) -> bool:
+        # Trigram index over file contents for search_text; rowid = files.rowid.
+        try:
+            with con:
+                exists = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'file_text'").fetchone()
+                con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS file_text USING fts5(path UNINDEXED, body, tokenize='trigram')")
+                if not exists:
+                    # Existing index without text: force the next pass to reparse everything.
+                    con.execute("UPDATE files SET size = NULL, digest = NULL")
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def _create_chunk_index(self, con: sqlite3.Connection) -> bool:
+        # Symbol-bounded chunks with an FTS5 mirror ranked by bm25(); rowid = chunks.id.
+        try:
+            with con:
+                exists = con.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()
+                con.execute("""CREATE TABLE IF NOT EXISTS chunks(
+                    id INTEGER PRIMARY KEY,
+                    file_path TEXT,
+                    start_line INT,
+                    end_line INT,
+                    symbol TEXT
+                )""")
+                con.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks(file_path)")
+                con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(path, symbol, body, words)")
+                if not exists:
+                    con.execute("UPDATE files SET size = NULL, digest = NULL")
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def _delete_chunks(self, con: sqlite3.Connection, rels: List[Tuple[str]]) -> None:
+        if self._chunks:
+            con.executemany("DELETE FROM chunks_fts WHERE rowid IN (SELECT id FROM chunks WHERE file_path = ?)", rels)
+            con.executemany("DELETE FROM chunks WHERE file_path = ?", rels)
+
+    def _backfill_deps(self, con: sqlite3.Connection) -> None:
+        # Source files indexed before the dep graph was attached have no imports
+        # recorded; clear their stat so the next pass reparses just those.
+        missing = " OR ".join("path LIKE '%" + ext + "'" for ext in DEP_SUPPORTED)
+        with con:
+            con.execute(
+                f"UPDATE files SET size = NULL, digest = NULL WHERE ({missing}) "
+                "AND path NOT IN (SELECT path FROM depdb.dep_files)"
+            )
+
+    def _delete_paths(self, con: sqlite3.Connection, removed: List[Tuple[str]]) -> None:
+        if self._text:
+            con.executemany("DELETE FROM file_text WHERE rowid = (SELECT rowid FROM files WHERE path = ?)", removed)
+        con.executemany("DELETE FROM symbols WHERE file_path = ?", removed)
+        con.executemany("DELETE FROM files WHERE path = ?", removed)
+        self._delete_chunks(con, removed)
+        if self.dep_graph is not None:
+            self.dep_graph.remove_files([rel for (rel,) in removed], con, "depdb")
 
     def index_all(self) -> None:
-        self.init_db()
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        cur.execute("DELETE FROM symbols")
-        cur.execute("DELETE FROM files")
-        for p in self._iter_supported_files():
-            self._index_file(cur, p)
-        con.commit()
-        con.close()
+        # Reparse everything, then prune what is gone. Batches commit as they
+        # arrive, so readers keep seeing the previous entries until replaced.
+        start = time.perf_counter()
+        con = self._connect()
+        walk = WalkStats()
+        items = [(rel, "") for rel, _ in self._walk(walk)]
+        counts = self._write_stream(self._parse_many(items))
+        with self._lock:
+            known = [row[0] for row in con.execute("SELECT path FROM files")]
+        removed = [(rel,) for rel in known if rel not in counts["seen"]]
+        with self._lock, con:
+            self._delete_paths(con, removed)
+            con.execute("DELETE FROM symbols WHERE file_path NOT IN (SELECT path FROM files)")
+            if self._chunks:
+                con.execute("DELETE FROM chunks_fts WHERE rowid IN (SELECT id FROM chunks WHERE file_path NOT IN (SELECT path FROM files))")
+                con.execute("DELETE FROM chunks WHERE file_path NOT IN (SELECT path FROM files)")
+            if self.dep_graph is not None:
+                stale = con.execute("SELECT path FROM depdb.dep_files WHERE path NOT IN (SELECT path FROM main.files)")
+                self.dep_graph.remove_files([row[0] for row in stale.fetchall()], con, "depdb")
+        self._set_stats("full", walk, 0, counts, len(removed), start)
 
     def index_incremental(self) -> None:
-        self.init_db()
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        known = {row[0]: row[1] for row in cur.execute("SELECT path, mtime FROM files")}
+        start = time.perf_counter()
+        con = self._connect()
+        with self._lock:
+            known = {
+                row[0]: row[1:]
+                for row in con.execute("SELECT path, size, mtime_ns, ino, digest FROM files")
+            }
+        walk = WalkStats()
         current = set()
-        for p in self._iter_supported_files():
-            rel = str(p.relative_to(self.repo_root))
+        changed: List[Tuple[str, str]] = []
+        skipped = 0
+        for rel, entry in self._walk(walk):
             current.add(rel)
-            mtime = p.stat().st_mtime
-            if rel in known and float(known[rel]) == float(mtime):
+            try:
+                st = entry.stat()
+            except OSError:
                 continue
-            self._index_file(cur, p)
-        removed = set(known.keys()) - current
-        for rel in removed:
-            cur.execute("DELETE FROM symbols WHERE file_path = ?", (rel,))
-            cur.execute("DELETE FROM files WHERE path = ?", (rel,))
-        con.commit()
-        con.close()
-
-    def _iter_supported_files(self) -> Iterable[Path]:
-        for p in self.repo_root.rglob("*"):
-            if not p.is_file():
+            prev = known.get(rel)
+            if prev is not None and prev[:3] == (st.st_size, st.st_mtime_ns, st.st_ino):
+                skipped += 1
                 continue
-            if any(part in EXCLUDE_DIRS for part in p.parts):
+            # Same size but new stat: hash it before paying for a reparse
+            # (e.g. files rewritten unchanged by a git checkout).
+            digest = prev[3] if prev is not None and prev[0] == st.st_size and self.content_hash else ""
+            changed.append((rel, digest or ""))
+        counts = self._write_stream(self._parse_many(changed))
+        removed = [(rel,) for rel in set(known.keys()) - current]
+        if removed:
+            with self._lock, con:
+                self._delete_paths(con, removed)
+        self._set_stats("incremental", walk, skipped, counts, len(removed), start)
+
+    def index_paths(self, rels: Iterable[str]) -> List[str]:
+        """Reindexes just these repo-relative paths, e.g. from a file watcher.
+
+        Missing files are dropped from the index. Returns the paths whose
+        entries actually changed (reparsed or removed).
+        """
+        start = time.perf_counter()
+        con = self._connect()
+        rels = set(rels)
+        if self._others is not None:
+            for rel in rels:
+                if os.path.splitext(rel)[1] in SUPPORTED:
+                    continue
+                if (self.repo_root / rel).is_file():
+                    self._others.add(rel)
+                else:
+                    self._others.discard(rel)
+        rels = sorted(r for r in rels if os.path.splitext(r)[1] in SUPPORTED)
+        with self._lock:
+            known = {}
+            for rel in rels:
+                row = con.execute("SELECT size, mtime_ns, ino, digest FROM files WHERE path = ?", (rel,)).fetchone()
+                if row is not None:
+                    known[rel] = row
+        changed: List[Tuple[str, str]] = []
+        removed: List[Tuple[str]] = []
+        skipped = 0
+        for rel in rels:
+            try:
+                st = (self.repo_root / rel).stat()
+            except OSError:
+                if rel in known:
+                    removed.append((rel,))
                 continue
-            lang = SUPPORTED.get(p.suffix)
-            if not lang:
+            prev = known.get(rel)
+            if prev is not None and tuple(prev[:3]) == (st.st_size, st.st_mtime_ns, st.st_ino):
+                skipped += 1
                 continue
-            yield p
+            digest = prev[3] if prev is not None and prev[0] == st.st_size and self.content_hash else ""
+            changed.append((rel, digest or ""))
+        counts = self._write_stream(self._parse_many(changed))
+        if removed:
+            with self._lock, con:
+                self._delete_paths(con, removed)
+        walk = WalkStats(files=len(rels))
+        self._set_stats("paths", walk, skipped, counts, len(removed), start)
+        return sorted(counts["reparsed_paths"]) + [r for (r,) in removed]
+
+    def _walk(self, stats: WalkStats) -> Iterator[Tuple[str, os.DirEntry]]:
+        others: Set[str] = set()
+        for rel, entry in walk_repo(self.repo_root, EXCLUDE_DIRS, None, use_gitignore=self.use_gitignore, stats=stats):
+            if os.path.splitext(rel)[1] in SUPPORTED:
+                yield rel, entry
+            else:
+                others.add(rel)
+        stats.files -= len(others)
+        self._others = others
+
+    def _set_stats(self, mode: str, walk: WalkStats, skipped: int, counts: Dict[str, Any], removed: int, start: float) -> None:
+        if counts["reparsed"] or removed:
+            self.generation += 1
+        self.last_stats = {
+            "mode": mode,
+            "scanned": walk.files,
+            "skipped": skipped,
+            "unchanged": counts["unchanged"],
+            "reparsed": counts["reparsed"],
+            "removed": removed,
+            "pruned_dirs": walk.pruned_dirs,
+            "ignored_files": walk.ignored_files,
+            "ms": round((time.perf_counter() - start) * 1000.0, 2),
+        }
 
-    def _index_file(self, cur: sqlite3.Cursor, path: Path) -> None:
-        rel = str(path.relative_to(self.repo_root))
-        lang = SUPPORTED.get(path.suffix)
-        if not lang:
+    def _worker_count(self, n_files: int) -> int:
+        if n_files < _PARALLEL_MIN_FILES:
+            return 1
+        workers = self.workers if self.workers > 0 else (os.cpu_count() or 1)
+        return max(1, min(workers, n_files // (_PARALLEL_MIN_FILES // 4)))
+
+    def _parse_many(self, items: List[Tuple[str, str]]) -> Iterator[ParsedFile]:
+        root = str(self.repo_root)
+        jobs = [(root, rel, digest, self.content_hash) for rel, digest in items]
+        n = self._worker_count(len(jobs))
+        if n <= 1:
+            results: Iterable[ParsedFile | None] = map(_parse_worker, jobs)
+            yield from (r for r in results if r is not None)
             return
-        src = path.read_bytes()
-        parser = get_parser(lang)
-        tree = parser.parse(src)
-        cur.execute("DELETE FROM symbols WHERE file_path = ?", (rel,))
-        symbols = self._extract_symbols(tree.root_node, src, lang)
-        for sym in symbols:
-            cur.execute(
-                "INSERT INTO symbols(file_path, kind, name, start_line, end_line) VALUES (?, ?, ?, ?, ?)",
-                (rel, sym["kind"], sym["name"], sym["start_line"], sym["end_line"]),
+        # spawn, not fork: the server process has live threads and an open sqlite handle.
+        ctx = multiprocessing.get_context("spawn")
+        chunksize = max(1, min(256, len(jobs) // (n * 8)))
+        with ProcessPoolExecutor(max_workers=n, mp_context=ctx) as pool:
+            for r in pool.map(_parse_worker, jobs, chunksize=chunksize):
+                if r is not None:
+                    yield r
+
+    def _write_stream(self, parsed: Iterable[ParsedFile]) -> Dict[str, Any]:
+        # Single writer: parse results are committed in batches of batch_files.
+        con = self._connect()
+        counts: Dict[str, Any] = {"seen": set(), "reparsed_paths": [], "reparsed": 0, "unchanged": 0}
+        batch: List[ParsedFile] = []
+        for item in parsed:
+            batch.append(item)
+            counts["seen"].add(item.rel)
+            if item.symbols is not None:
+                counts["reparsed"] += 1
+                counts["reparsed_paths"].append(item.rel)
+            else:
+                counts["unchanged"] += 1
+            if len(batch) >= self.batch_files:
+                with self._lock, con:
+                    self._write_parsed(con, batch)
+                batch = []
+        if batch:
+            with self._lock, con:
+                self._write_parsed(con, batch)
+        return counts
+
+    def file_rows(self, limit: int | None = None) -> List[Tuple[str, float]]:
+        con = self._connect()
+        sql = "SELECT path, mtime FROM files"
+        with self._lock:
+            if limit is not None:
+                return con.execute(sql + " LIMIT ?", (limit,)).fetchall()
+            return con.execute(sql).fetchall()
+
+    def _write_parsed(self, con: sqlite3.Connection, parsed: List[ParsedFile]) -> None:
+        changed = [p for p in parsed if p.symbols is not None]
+        same = [p for p in parsed if p.symbols is None]
+        if self._text:
+            con.executemany(
+                "DELETE FROM file_text WHERE rowid = (SELECT rowid FROM files WHERE path = ?)",
+                [(p.rel,) for p in changed],
             )
-        cur.execute(
-            "INSERT OR REPLACE INTO files(path, mtime) VALUES (?, ?)",
-            (rel, path.stat().st_mtime),
+        con.executemany("DELETE FROM symbols WHERE file_path = ?", [(p.rel,) for p in changed])
+        self._delete_chunks(con, [(p.rel,) for p in changed])
+        if self._chunks:
+            # Ids are assigned here so both tables can be filled with executemany.
+            next_id = con.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM chunks").fetchone()[0]
+            rows = [(p.rel, *c) for p in changed for c in p.chunks]
+            ids = range(next_id, next_id + len(rows))
+            con.executemany(
+                "INSERT INTO chunks(id, file_path, start_line, end_line, symbol) VALUES (?, ?, ?, ?, ?)",
+                [(cid, rel, start, end, label) for cid, (rel, start, end, label, _) in zip(ids, rows)],
+            )
+            con.executemany(
+                "INSERT INTO chunks_fts(rowid, path, symbol, body, words) VALUES (?, ?, ?, ?, ?)",
+                [(cid, rel, label, body, chunk_words(body)) for cid, (rel, _, _, label, body) in zip(ids, rows)],
+            )
+        con.executemany(
+            "INSERT INTO symbols(file_path, kind, name, start_line, end_line) VALUES (?, ?, ?, ?, ?)",
+            [(p.rel, *row) for p in changed for row in p.symbols],
+        )
+        con.executemany(
+            "INSERT OR REPLACE INTO files(path, mtime, size, mtime_ns, ino, digest, line_offsets) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(p.rel, p.mtime, p.size, p.mtime_ns, p.ino, p.digest, p.offsets) for p in changed],
+        )
+        if self._text:
+            con.executemany(
+                "INSERT INTO file_text(rowid, path, body) VALUES ((SELECT rowid FROM files WHERE path = ?), ?, ?)",
+                [(p.rel, p.rel, p.text) for p in changed],
+            )
+        con.executemany(
+            "UPDATE files SET mtime = ?, size = ?, mtime_ns = ?, ino = ? WHERE path = ?",
+            [(p.mtime, p.size, p.mtime_ns, p.ino, p.rel) for p in same],
         )
+        if self.dep_graph is not None:
+            self.dep_graph.write_deps([(p.rel, p.imports) for p in changed if p.imports is not None], con, "depdb")
 
-    def _extract_symbols(self, node, src: bytes, lang: str) -> List[Dict[str, object]]:
-        symbols: List[Dict[str, object]] = []
-        stack = [node]
-        while stack:
-            n = stack.pop()
-            if lang == "python":
-                if n.type == "function_definition":
-                    name = n.child_by_field_name("name")
-                    if name:
-                        symbols.append(self._make_symbol("function", name, n))
-                elif n.type == "class_definition":
-                    name = n.child_by_field_name("name")
-                    if name:
-                        symbols.append(self._make_symbol("class", name, n))
-            elif lang in {"javascript", "typescript", "tsx"}:
-                if n.type == "function_declaration":
-                    name = n.child_by_field_name("name")
-                    if name:
-                        symbols.append(self._make_symbol("function", name, n))
-                elif n.type == "method_definition":
-                    name = n.child_by_field_name("name")
-                    if name:
-                        symbols.append(self._make_symbol("method", name, n))
-                elif n.type == "class_declaration":
-                    name = n.child_by_field_name("name")
-                    if name:
-                        symbols.append(self._make_symbol("class", name, n))
-                elif n.type == "variable_declarator":
-                    init = n.child_by_field_name("value")
-                    name = n.child_by_field_name("name")
-                    if name and init and init.type in {"arrow_function", "function"}:
-                        symbols.append(self._make_symbol("function", name, n))
-            stack.extend(reversed(n.children))
-        return symbols
-
-    def _make_symbol(self, kind: str, name_node, parent_node) -> Dict[str, object]:
-        name = name_node.text.decode("utf-8", errors="ignore")
-        start_line = parent_node.start_point[0] + 1
-        end_line = parent_node.end_point[0] + 1
-        return {
-            "kind": kind,
-            "name": name,
-            "start_line": start_line,
-            "end_line": end_line,
-        }
+    def search_text(
+        self,
+        pattern: str,
+        glob: str | None = None,
+        max_results: int = 200,
+        ignore_case: bool = False,
+        fallback: bool = True,
+    ) -> List[Dict[str, object]]:
+        """Regex search with the same {file, line, column, text} rows as rg_search.
 
-    def rg_search(self, pattern: str, glob: str | None = None, max_results: int = 200) -> List[Dict[str, object]]:
-        args = ["rg", "--line-number", "--column", "--no-heading", "--color", "never", pattern, str(self.repo_root)]
+        Indexed files are narrowed with the trigram index and verified with `re`.
+        When the index comes up short, rg searches just the files the last walk
+        saw but did not index, and is not run at all when there are none.
+        Patterns Python cannot compile go straight to rg.
+        """
+        con = self._connect()
+        try:
+            rx = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        except re.error:
+            rx = None
+        if rx is None or not self._text:
+            return self.rg_search(pattern, glob=glob, max_results=max_results)
+        expr = text_search.match_expression(text_search.literal_plan(pattern))
+        results: List[Dict[str, object]] = []
+        with self._lock:
+            if expr:
+                rows = con.execute("SELECT path, body FROM file_text WHERE file_text MATCH ?", (expr,))
+            else:
+                rows = con.execute("SELECT path, body FROM file_text")
+            for path, body in rows:
+                if not text_search.glob_matches(path, glob) or rx.search(body) is None:
+                    continue
+                for line_no, line in enumerate(body.split("\n"), start=1):
+                    m = rx.search(line.rstrip("\r"))
+                    if m is None:
+                        continue
+                    results.append({"file": path, "line": line_no, "column": m.start() + 1, "text": line.rstrip("\r")})
+                    if len(results) >= max_results:
+                        return results
+        if fallback:
+            try:
+                if self._others is None:  # never walked; cover the tree minus indexed types
+                    exclude = [f"!*{ext}" for ext in SUPPORTED]
+                    results.extend(
+                        self.rg_search(pattern, glob=glob, max_results=max_results - len(results), exclude_globs=exclude)
+                    )
+                else:
+                    others = sorted(rel for rel in self._others if text_search.glob_matches(rel, glob))
+                    for i in range(0, len(others), _RG_BATCH):
+                        results.extend(
+                            self.rg_search(pattern, max_results=max_results - len(results), paths=others[i:i + _RG_BATCH])
+                        )
+                        if len(results) >= max_results:
+                            break
+            except (OSError, RuntimeError):
+                pass  # rg missing or rejected the pattern; indexed results stand
+        return results
+
+    def rg_search(
+        self,
+        pattern: str,
+        glob: str | None = None,
+        max_results: int = 200,
+        exclude_globs: Iterable[str] = (),
+        paths: Iterable[str] | None = None,
+    ) -> List[Dict[str, object]]:
+        """rg over the repo, or over just `paths` (repo-relative) when given."""
+        targets = [str(self.repo_root / rel) for rel in paths] if paths is not None else [str(self.repo_root)]
+        if not targets:
+            return []
+        args = ["rg", "--line-number", "--column", "--no-heading", "--color", "never", "-e", pattern]
         if glob:
             args.extend(["-g", glob])
+        for g in exclude_globs:
+            args.extend(["-g", g])
+        args.extend(["--", *targets])
         p = subprocess.run(args, text=True, capture_output=True)
         if p.returncode not in (0, 1):
             raise RuntimeError(p.stderr.strip())
@@ -193,41 +672,138 @@ class SymbolIndexer:
                 break
         return results
 
+    def snippet_cache(self):
+        """Context manager sharing decoded file windows across one request."""
+        return request_windows()
+
+    def _stored_offsets(self, rel: str) -> Tuple[Stamp, bytes] | None:
+        con = self._connect()
+        with self._lock:
+            row = con.execute("SELECT size, mtime_ns, line_offsets FROM files WHERE path = ?", (rel,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return (row[0], row[1]), row[2] or b""
+
+    def _read_lines(self, file_rel: str, start: int, end: int) -> Tuple[List[str], int] | None:
+        if self._reader is None:
+            self._reader = SnippetReader(self.repo_root, self._stored_offsets)
+        return self._reader.read(file_rel, start, end)
+
     def get_snippet(self, file_rel: str, line: int, window: int = 6, max_lines: int = 80) -> str:
-        path = self.repo_root / file_rel
-        if not path.exists():
-            return ""
-        lines = path.read_text(errors="ignore").splitlines()
         start = max(1, line - window)
-        end = min(len(lines), line + window)
-        if end - start + 1 > max_lines:
-            end = min(len(lines), start + max_lines - 1)
-        out = []
-        for idx in range(start, end + 1):
-            out.append(f"{idx:4d}: {lines[idx-1]}")
-        return "\n".join(out)
+        end = min(line + window, start + max_lines - 1)
+        got = self._read_lines(file_rel, start, end)
+        if got is None:
+            return ""
+        lines, _ = got
+        return "\n".join(f"{idx:4d}: {text}" for idx, text in enumerate(lines, start=start))
 
     def get_file_head(self, file_rel: str, max_lines: int = 200) -> str:
-        path = self.repo_root / file_rel
-        if not path.exists():
+        got = self._read_lines(file_rel, 1, max_lines)
+        if got is None:
             return ""
-        lines = path.read_text(errors="ignore").splitlines()
-        out = []
-        for idx, line in enumerate(lines[:max_lines], start=1):
-            out.append(f"{idx:4d}: {line}")
-        return "\n".join(out)
-
-    def search_symbols(self, name_substr: str, limit: int = 50) -> List[Dict[str, object]]:
-        self.init_db()
-        con = sqlite3.connect(self.db_path)
-        cur = con.cursor()
-        like = f"%{name_substr}%"
-        rows = cur.execute(
-            "SELECT file_path, kind, name, start_line, end_line FROM symbols WHERE name LIKE ? LIMIT ?",
-            (like, limit),
-        ).fetchall()
-        con.close()
-        return [
-            {"file": r[0], "kind": r[1], "name": r[2], "start_line": r[3], "end_line": r[4]}
-            for r in rows
-        ]
+        lines, _ = got
+        return "\n".join(f"{idx:4d}: {text}" for idx, text in enumerate(lines, start=1))
+
+    def search_symbols(
+        self,
+        query: str,
+        limit: int = 50,
+        kind: str | None = None,
+        fuzzy: bool = True,
+        centrality: Dict[str, float] | None = None,
+    ) -> List[Dict[str, object]]:
+        """Ranked symbol search: exact > prefix > word-prefix > substring > fuzzy.
+
+        `centrality` maps file paths to a 0..1 boost (e.g. dep-graph in-degree).
+        An empty query lists symbols in index order.
+        """
+        con = self._connect()
+        q = query.strip()
+        cols = "s.id, s.file_path, s.kind, s.name, s.start_line, s.end_line"
+        kind_sql = " AND s.kind = ?" if kind else ""
+        kind_args: Tuple = (kind,) if kind else ()
+        if not q:
+            with self._lock:
+                rows = con.execute(f"SELECT {cols} FROM symbols s WHERE 1{kind_sql} LIMIT ?", (*kind_args, limit)).fetchall()
+            return [
+                {"file": r[1], "kind": r[2], "name": r[3], "start_line": r[4], "end_line": r[5], "score": 0.0}
+                for r in rows
+            ]
+        cap = symbol_search.CANDIDATES
+        found: Dict[int, Tuple] = {}
+        with self._lock:
+            # Exact and case-sensitive prefix matches come straight off idx_symbols_name.
+            for r in con.execute(
+                f"SELECT {cols} FROM symbols s WHERE s.name >= ? AND s.name < ?{kind_sql} LIMIT ?",
+                (q, q + "\uffff", *kind_args, cap),
+            ):
+                found[r[0]] = r[1:]
+            expr = symbol_search.match_expression(q) if self._fts else ""
+            if expr:
+                sql = f"SELECT {cols} FROM symbols_fts f JOIN symbols s ON s.id = f.rowid WHERE symbols_fts MATCH ?{kind_sql} LIMIT ?"
+                rows = con.execute(sql, (expr, *kind_args, cap)).fetchall()
+            else:
+                rows = con.execute(
+                    f"SELECT {cols} FROM symbols s WHERE s.name LIKE ?{kind_sql} LIMIT ?",
+                    (f"%{q}%", *kind_args, cap),
+                ).fetchall()
+            for r in rows:
+                found[r[0]] = r[1:]
+        results = symbol_search.rank(list(found.values()), q, limit, centrality)
+        fuzzy_expr = symbol_search.fuzzy_expression(q) if fuzzy and self._fts else ""
+        if len(results) < limit and fuzzy_expr:
+            with self._lock:
+                sql = f"SELECT {cols} FROM symbols_fts f JOIN symbols s ON s.id = f.rowid WHERE symbols_fts MATCH ?{kind_sql} LIMIT ?"
+                for r in con.execute(sql, (fuzzy_expr, *kind_args, cap)):
+                    found[r[0]] = r[1:]
+            results = symbol_search.rank(list(found.values()), q, limit, centrality)
+        return results
+
+    def search_chunks(self, query: str, limit: int = 20, max_per_file: int = 3) -> List[Dict[str, object]]:
+        """BM25-ranked code chunks for a natural-language query, best first."""
+        expr = bm25_query(query) if self._chunks else ""
+        if not expr:
+            return []
+        con = self._connect()
+        # Weights per column: path, symbol, body, camelCase words.
+        sql = (
+            "SELECT c.file_path, c.start_line, c.end_line, c.symbol, f.body, bm25(chunks_fts, 2.0, 4.0, 1.0, 1.0) AS score "
+            "FROM chunks_fts f JOIN chunks c ON c.id = f.rowid WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?"
+        )
+        with self._lock:
+            rows = con.execute(sql, (expr, limit * max_per_file)).fetchall()
+        per_file: Dict[str, int] = {}
+        out: List[Dict[str, object]] = []
+        for rel, start, end, symbol, body, score in rows:
+            if per_file.get(rel, 0) >= max_per_file:
+                continue
+            per_file[rel] = per_file.get(rel, 0) + 1
+            out.append({
+                "file": rel, "start_line": start, "end_line": end, "symbol": symbol,
+                "text": body, "score": round(-score, 4),
+            })
+            if len(out) >= limit:
+                break
+        return out
+
+    def chunk_rows(self, paths: Iterable[str] | None = None) -> List[Tuple[str, int, int, str, str]]:
+        """(path, start_line, end_line, symbol, body) for every chunk, or those of `paths`."""
+        if not self._chunks:
+            return []
+        con = self._connect()
+        sql = "SELECT c.file_path, c.start_line, c.end_line, c.symbol, f.body FROM chunks c JOIN chunks_fts f ON f.rowid = c.id"
+        with self._lock:
+            if paths is None:
+                return con.execute(sql + " ORDER BY c.id").fetchall()
+            out: List[Tuple[str, int, int, str, str]] = []
+            for rel in sorted(set(paths)):
+                out += con.execute(sql + " WHERE c.file_path = ? ORDER BY c.start_line", (rel,)).fetchall()
+            return out
+
+    def chunk_count(self) -> int:
+        if not self._chunks:
+            return 0
+        con = self._connect()
+        with self._lock:
+            return con.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
@@ -1,22 +1,50 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Tuple
 import json
 import sqlite3
 
+from indexer.dep_graph import DependencyGraph
+
+# Personalized rank is added on top of the global one, scaled so focus files
+# and what they import outrank everything else.
+FOCUS_WEIGHT = 1.0
+_MAX_SIGNATURES = 12
+_SIGNATURE_CHARS = 120
+# Same rough estimate the server uses when trimming prompts.
+_CHARS_PER_TOKEN = 4
+
 
 @dataclass
 class RepoMapBuilder:
     repo_root: Path
     index_db: Path
     dep_db: Path
+    token_budget: int = 1024
+    dep_graph: DependencyGraph | None = None  # reuses its cached CSR across builds
 
-    def build(self, out_dir: Path, limit_files: int = 200) -> Dict[str, Any]:
+    def build(self, out_dir: Path, limit_files: int = 200, focus: Iterable[str] | None = None) -> Dict[str, Any]:
         out_dir.mkdir(parents=True, exist_ok=True)
+        stats = self.ranked(focus)
+        repo_map = {
+            "file_count": len(stats),
+            "top_modules": stats[:10],
+            "files": stats[:limit_files],
+        }
+        (out_dir / "repo_map.json").write_text(json.dumps(repo_map, indent=2))
+        (out_dir / "repo_map.md").write_text(self._render(stats, self.token_budget))
+        return repo_map
+
+    def render(self, token_budget: int | None = None, focus: Iterable[str] | None = None) -> str:
+        """Most important files and their signatures, within `token_budget`."""
+        return self._render(self.ranked(focus), self.token_budget if token_budget is None else token_budget)
+
+    def ranked(self, focus: Iterable[str] | None = None) -> List[Dict[str, Any]]:
+        """Every indexed file, by PageRank over the import graph (personalized by `focus`)."""
         con = sqlite3.connect(self.index_db)
         cur = con.cursor()
-        files = cur.execute("SELECT path, mtime FROM files LIMIT ?", (limit_files,)).fetchall()
+        files = cur.execute("SELECT path, mtime FROM files").fetchall()
         sym_counts = {r[0]: r[1] for r in cur.execute("SELECT file_path, COUNT(*) FROM symbols GROUP BY file_path").fetchall()}
         con.close()
 
@@ -24,25 +52,60 @@ class RepoMapBuilder:
         cur2 = con2.cursor()
         dep_counts = {r[0]: r[1] for r in cur2.execute("SELECT file_path, COUNT(*) FROM deps GROUP BY file_path").fetchall()}
         con2.close()
+        graph = self.dep_graph or DependencyGraph(repo_root=self.repo_root, db_path=self.dep_db)
+        degrees = graph.degrees()
+        ranks = graph.ranks()
+        boost = graph.personalized_ranks(focus) if focus else {}
 
         stats = []
         for path, mtime in files:
+            internal, dependents = degrees.get(path, (0, 0))
             stats.append({
                 "path": path,
                 "mtime": mtime,
+                "rank": round(ranks.get(path, 0.0) + FOCUS_WEIGHT * boost.get(path, 0.0), 6),
                 "symbols": sym_counts.get(path, 0),
                 "deps": dep_counts.get(path, 0),
+                "internal_deps": internal,
+                "dependents": dependents,
             })
-        stats.sort(key=lambda x: (x["deps"], x["symbols"]), reverse=True)
+        stats.sort(key=lambda x: (-x["rank"], -x["dependents"], -x["symbols"], x["path"]))
+        return stats
 
-        repo_map = {
-            "file_count": len(stats),
-            "top_modules": stats[:10],
-            "files": stats,
-        }
-        (out_dir / "repo_map.json").write_text(json.dumps(repo_map, indent=2))
-        md_lines = ["# Repo Map", "", f"Files: {len(stats)}", "", "## Top Modules"]
-        for s in stats[:10]:
-            md_lines.append(f"- {s['path']} (deps: {s['deps']}, symbols: {s['symbols']})")
-        (out_dir / "repo_map.md").write_text("\n".join(md_lines))
-        return repo_map
+    def _render(self, stats: List[Dict[str, Any]], token_budget: int) -> str:
+        lines = ["# Repo Map", "", f"Files: {len(stats)}", ""]
+        max_chars = token_budget * _CHARS_PER_TOKEN
+        chars = len("\n".join(lines))
+        con = sqlite3.connect(self.index_db)
+        try:
+            for s in stats:
+                head = f"{s['path']} (rank: {s['rank']:.4f}, dependents: {s['dependents']}, symbols: {s['symbols']})"
+                block = [head] + ["  " + sig for sig in self._signatures(con, s["path"])]
+                cost = len("\n".join(block)) + 1
+                if chars + cost > max_chars:
+                    # Drop the signatures before dropping the file.
+                    block, cost = [head], len(head) + 1
+                    if chars + cost > max_chars:
+                        break
+                lines += block
+                chars += cost
+        finally:
+            con.close()
+        return "\n".join(lines)
+
+    def _signatures(self, con: sqlite3.Connection, rel: str) -> List[str]:
+        rows: List[Tuple[int]] = con.execute(
+            "SELECT start_line FROM symbols WHERE file_path = ? ORDER BY start_line LIMIT ?",
+            (rel, _MAX_SIGNATURES),
+        ).fetchall()
+        if not rows:
+            return []
+        try:
+            text = (self.repo_root / rel).read_text(errors="ignore").splitlines()
+        except OSError:
+            return []
+        out = []
+        for (line,) in rows:
+            if 0 < line <= len(text):
+                out.append(text[line - 1].strip()[:_SIGNATURE_CHARS])
+        return out
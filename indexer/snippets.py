@@ -0,0 +1,157 @@
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+import mmap
+import os
+import re
+import stat
+import threading
+
+_NEWLINE = re.compile(b"\n")
+
+# (size, mtime_ns): offsets and cached windows are only valid for this stat.
+Stamp = Tuple[int, int]
+
+
+def line_offsets(data) -> array:
+    """Byte offset of the start of each line; a trailing newline adds no line."""
+    starts = array("I" if len(data) < 2**32 else "Q", [0])
+    starts.extend(m.end() for m in _NEWLINE.finditer(data))
+    if starts[-1] == len(data):
+        starts.pop()
+    return starts
+
+
+def _decode_lines(chunk: bytes) -> List[str]:
+    text = chunk.decode("utf-8", errors="ignore")
+    lines = text.split("\n")
+    if text.endswith("\n"):
+        lines.pop()
+    return [line[:-1] if line.endswith("\r") else line for line in lines]
+
+
+class WindowCache:
+    """LRU of decoded line windows, keyed by file and stat stamp."""
+
+    def __init__(self, max_windows: int = 64) -> None:
+        self.max_windows = max_windows
+        self._windows: OrderedDict[Tuple[str, Stamp, int], List[str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, rel: str, stamp: Stamp, start: int, end: int) -> Optional[List[str]]:
+        for key in reversed(self._windows):
+            first = key[2]
+            lines = self._windows[key]
+            if key[0] == rel and key[1] == stamp and first <= start and end < first + len(lines):
+                self._windows.move_to_end(key)
+                self.hits += 1
+                return lines[start - first:end - first + 1]
+        self.misses += 1
+        return None
+
+    def put(self, rel: str, stamp: Stamp, start: int, lines: List[str]) -> None:
+        self._windows[(rel, stamp, start)] = lines
+        self._windows.move_to_end((rel, stamp, start))
+        while len(self._windows) > self.max_windows:
+            self._windows.popitem(last=False)
+
+
+_REQUEST_WINDOWS: ContextVar[Optional[WindowCache]] = ContextVar("snippet_windows", default=None)
+
+
+@contextmanager
+def request_windows(max_windows: int = 64) -> Iterator[WindowCache]:
+    """Shares decoded windows between snippet reads for the duration of a request."""
+    current = _REQUEST_WINDOWS.get()
+    if current is not None:
+        yield current
+        return
+    cache = WindowCache(max_windows)
+    token = _REQUEST_WINDOWS.set(cache)
+    try:
+        yield cache
+    finally:
+        _REQUEST_WINDOWS.reset(token)
+
+
+class SnippetReader:
+    """Reads line ranges through mmap using per-file line offsets.
+
+    `stored(rel)` returns the (stamp, offsets bytes) recorded at index time;
+    when the file's current stat differs the offsets are rebuilt from the file
+    and kept in a small in-memory cache until the indexer catches up.
+    """
+
+    def __init__(self, repo_root: Path, stored: Callable[[str], Optional[Tuple[Stamp, bytes]]], max_files: int = 256) -> None:
+        self.repo_root = Path(repo_root)
+        self.stored = stored
+        self.max_files = max_files
+        self._offsets: OrderedDict[str, Tuple[Stamp, array]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _offsets_for(self, rel: str, stamp: Stamp, mapped: Callable[[], Optional[mmap.mmap]]) -> array:
+        with self._lock:
+            cached = self._offsets.get(rel)
+            if cached is not None and cached[0] == stamp:
+                self._offsets.move_to_end(rel)
+                return cached[1]
+        row = self.stored(rel)
+        if row is not None and row[0] == stamp and row[1]:
+            offsets = array("I" if stamp[0] < 2**32 else "Q")
+            offsets.frombytes(row[1])
+        else:
+            mm = mapped()
+            offsets = line_offsets(mm if mm is not None else b"")
+        with self._lock:
+            self._offsets[rel] = (stamp, offsets)
+            while len(self._offsets) > self.max_files:
+                self._offsets.popitem(last=False)
+        return offsets
+
+    def read(self, rel: str, start: int, end: int) -> Tuple[List[str], int] | None:
+        """Lines start..end (1-based, inclusive, clamped) and the file's line count."""
+        path = self.repo_root / rel
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            stamp = (st.st_size, st.st_mtime_ns)
+            windows = _REQUEST_WINDOWS.get()
+            mm: Optional[mmap.mmap] = None
+
+            def mapped() -> Optional[mmap.mmap]:
+                nonlocal mm
+                if mm is None and st.st_size:
+                    mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+                return mm
+
+            try:
+                offsets = self._offsets_for(rel, stamp, mapped)
+                total = len(offsets)
+                start, end = max(1, start), min(total, end)
+                if start > end:
+                    return [], total
+                if windows is not None:
+                    lines = windows.get(rel, stamp, start, end)
+                    if lines is not None:
+                        return lines, total
+                lo = offsets[start - 1]
+                hi = offsets[end] if end < total else st.st_size
+                lines = _decode_lines(mapped()[lo:hi])
+                if windows is not None:
+                    windows.put(rel, stamp, start, lines)
+                return lines, total
+            finally:
+                if mm is not None:
+                    mm.close()
+        finally:
+            os.close(fd)
@@ -0,0 +1,100 @@
+from __future__ import annotations
+from difflib import SequenceMatcher
+from typing import Dict, List, Tuple
+import re
+
+# parseHTTPResponse_v2 -> parse, http, response, v, 2
+_IDENT_WORDS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+# Candidate caps per query stage; ranking happens in Python on the union.
+CANDIDATES = 1000
+FUZZY_MIN_RATIO = 0.6
+CENTRALITY_WEIGHT = 0.1
+
+
+def split_identifier(name: str) -> List[str]:
+    return [w.lower() for w in _IDENT_WORDS.findall(name)]
+
+
+def identifier_words(name: str) -> str:
+    # Stored in the FTS `words` column so "http resp" finds parseHTTPResponse.
+    return " ".join(split_identifier(name))
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def match_expression(query: str) -> str:
+    """FTS5 MATCH for substring-of-name or every-word-in-words; "" if too short for trigrams."""
+    parts: List[str] = []
+    if len(query) >= 3 and not query.isspace():
+        parts.append(f"name : {_phrase(query)}")
+    words = [w for w in split_identifier(query) if len(w) >= 3]
+    if len(words) > 1:
+        parts.append("(" + " AND ".join(f"words : {_phrase(w)}" for w in words) + ")")
+    return " OR ".join(parts)
+
+
+def fuzzy_expression(query: str) -> str:
+    """Matches names sharing either half of the query.
+
+    A single typo lands in one half, so the other half still matches as a
+    substring. Halves shorter than a trigram are dropped.
+    """
+    q = query.strip()
+    mid = len(q) // 2
+    halves = [h for h in (q[:mid], q[mid:]) if len(h) >= 3]
+    return " OR ".join(f"name : {_phrase(h)}" for h in halves)
+
+
+def match_quality(name: str, query: str, query_words: List[str], matcher: SequenceMatcher | None = None) -> float:
+    if name == query:
+        return 1.0
+    nl, ql = name.lower(), query.lower()
+    if nl == ql:
+        return 0.95
+    if name.startswith(query):
+        return 0.85
+    if nl.startswith(ql):
+        return 0.8
+    if len(query_words) > 1:
+        words = split_identifier(name)
+        if all(any(w.startswith(qw) for w in words) for qw in query_words):
+            return 0.7
+    if ql in nl:
+        return 0.6
+    if matcher is None:
+        matcher = SequenceMatcher(None, b=ql, autojunk=False)
+    matcher.set_seq1(nl)
+    # The quick ratios are cheap upper bounds; most candidates stop there.
+    if matcher.real_quick_ratio() < FUZZY_MIN_RATIO or matcher.quick_ratio() < FUZZY_MIN_RATIO:
+        return 0.0
+    ratio = matcher.ratio()
+    return 0.5 * ratio if ratio >= FUZZY_MIN_RATIO else 0.0
+
+
+def rank(
+    rows: List[Tuple[str, str, str, int, int]],
+    query: str,
+    limit: int,
+    centrality: Dict[str, float] | None = None,
+) -> List[Dict[str, object]]:
+    """Scores (file, kind, name, start, end) rows; drops rows that do not match at all."""
+    query_words = split_identifier(query)
+    # seq2 is the side SequenceMatcher indexes, so keep the query there and reuse it.
+    matcher = SequenceMatcher(None, b=query.lower(), autojunk=False)
+    scored = []
+    for row in rows:
+        quality = match_quality(row[2], query, query_words, matcher)
+        if quality <= 0:
+            continue
+        boost = CENTRALITY_WEIGHT * (centrality or {}).get(row[0], 0.0)
+        # Shorter names win ties: "load" over "loadAllUsersFromCache" for "load".
+        tie = 0.01 / (1 + abs(len(row[2]) - len(query)))
+        scored.append((quality + boost + tie, row))
+    scored.sort(key=lambda item: (-item[0], item[1][2], item[1][0], item[1][3]))
+    return [
+        {"file": r[0], "kind": r[1], "name": r[2], "start_line": r[3], "end_line": r[4], "score": round(s, 4)}
+        for s, r in scored[:limit]
+    ]
@@ -0,0 +1,105 @@
+from __future__ import annotations
+from fnmatch import fnmatch
+from typing import List, Optional
+import posixpath
+import re
+
+try:
+    import re._parser as sre_parse  # Python >= 3.11
+    from re._constants import AT, BRANCH, LITERAL, MAX_REPEAT, MIN_REPEAT, SUBPATTERN
+except ImportError:  # pragma: no cover - older Pythons
+    import sre_parse  # type: ignore
+    from sre_constants import AT, BRANCH, LITERAL, MAX_REPEAT, MIN_REPEAT, SUBPATTERN  # type: ignore
+
+# Query plans are OR-of-AND lists of literals; None means "no constraint".
+Plan = Optional[List[List[str]]]
+
+_MAX_ALTERNATIVES = 16
+
+
+def _and(a: Plan, b: Plan) -> Plan:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if len(a) * len(b) > _MAX_ALTERNATIVES:
+        # Keep the more selective side rather than exploding the query.
+        return a if len(a) <= len(b) else b
+    return [x + y for x in a for y in b]
+
+
+def _or(plans: List[Plan]) -> Plan:
+    out: List[List[str]] = []
+    for p in plans:
+        if p is None:
+            return None
+        out.extend(p)
+    return out if len(out) <= _MAX_ALTERNATIVES else None
+
+
+def _analyze(items) -> Plan:
+    plan: Plan = None
+    run = ""
+
+    def flush() -> None:
+        nonlocal plan, run
+        if len(run) >= 3:
+            plan = _and(plan, [[run]])
+        run = ""
+
+    for op, arg in items:
+        if op is LITERAL:
+            run += chr(arg)
+            continue
+        if op is AT:
+            continue  # zero-width; literals either side stay adjacent
+        flush()
+        if op is SUBPATTERN:
+            plan = _and(plan, _analyze(arg[-1]))
+        elif op in (MAX_REPEAT, MIN_REPEAT):
+            lo, _hi, sub = arg
+            if lo >= 1:
+                plan = _and(plan, _analyze(sub))
+        elif op is BRANCH:
+            plan = _and(plan, _or([_analyze(alt) for alt in arg[1]]))
+    flush()
+    return plan
+
+
+def literal_plan(pattern: str) -> Plan:
+    """Literal substrings any match of `pattern` must contain (OR of AND lists)."""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+    plan = _analyze(list(parsed))
+    if plan is not None and any(not alt for alt in plan):
+        return None
+    return plan
+
+
+def _trigram_terms(literal: str) -> List[str]:
+    grams = {literal[i:i + 3] for i in range(len(literal) - 2)}
+    return ['"' + g.replace('"', '""') + '"' for g in sorted(grams)]
+
+
+def match_expression(plan: Plan) -> str:
+    """FTS5 MATCH over trigram tokens for a plan; "" when every file is a candidate."""
+    if not plan:
+        return ""
+    alts = []
+    for alt in plan:
+        terms = [t for lit in alt for t in _trigram_terms(lit)]
+        alts.append("(" + " AND ".join(terms) + ")")
+    return " OR ".join(alts)
+
+
+def glob_matches(rel: str, glob: str | None) -> bool:
+    # rg -g semantics: a leading "!" negates, patterns without "/" match the basename.
+    if not glob:
+        return True
+    negate = glob.startswith("!")
+    pat = glob[1:] if negate else glob
+    target = rel if "/" in pat else posixpath.basename(rel)
+    hit = fnmatch(target, pat.lstrip("/"))
+    return hit != negate
@@ -0,0 +1,351 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import hashlib
+import math
+import sqlite3
+import threading
+
+try:
+    import numpy as np  # installed with llama-cpp-python
+except ImportError:  # optional; without it the embedding index stays off
+    np = None  # type: ignore
+
+Embedder = Callable[[List[str]], List[List[float]]]
+ChunkKey = Tuple[str, int, int]  # (path, start_line, end_line)
+
+# Below this many vectors search is exact; above it an IVF index is trained
+# and retrained whenever the collection doubles.
+IVF_MIN_VECTORS = 4096
+KMEANS_ITERS = 8
+KMEANS_SAMPLE = 65536
+DEFAULT_NPROBE = 8
+RRF_K = 60
+_EMBED_CHARS = 2000
+
+
+def available() -> bool:
+    return np is not None
+
+
+def chunk_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", errors="ignore"), digest_size=12).hexdigest()
+
+
+def embed_text(path: str, symbol: str, body: str) -> str:
+    return f"{path}\n{symbol}\n{body}"[:_EMBED_CHARS]
+
+
+def _normalize(x):
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def kmeans(x, k: int, iters: int = KMEANS_ITERS, seed: int = 0):
+    """Spherical k-means over unit rows; returns (k, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    cent = x[rng.choice(len(x), size=k, replace=False)].astype(np.float32)
+    for _ in range(iters):
+        assign = np.argmax(x @ cent.T, axis=1)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, assign, x)
+        empty = np.bincount(assign, minlength=k) == 0
+        if empty.any():
+            sums[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+        cent = _normalize(sums)
+    return cent
+
+
+class VectorStore:
+    """Unit vectors in a memory-mapped float16 matrix, with an IVF index.
+
+    Row metadata and IVF list assignments live in meta.sqlite beside the
+    matrix; rows of deleted chunks are reused by later inserts.
+    """
+
+    def __init__(self, root: Path, dim: int) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._con = sqlite3.connect(self.root / "meta.sqlite", check_same_thread=False)
+        with self._con:
+            self._con.execute("""CREATE TABLE IF NOT EXISTS vectors(
+                row INTEGER PRIMARY KEY,
+                path TEXT,
+                start_line INT,
+                end_line INT,
+                digest TEXT,
+                list INT
+            )""")
+            self._con.execute("CREATE INDEX IF NOT EXISTS idx_vectors_path ON vectors(path)")
+            self._con.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)")
+        meta = dict(self._con.execute("SELECT key, value FROM meta"))
+        if int(meta.get("dim", dim)) != dim:
+            # A different embedding model: nothing stored is comparable.
+            self._reset()
+            meta = {}
+        with self._con:
+            self._con.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('dim', ?)", (str(dim),))
+        self._trained = int(meta.get("trained", 0))
+        self._keys: Dict[ChunkKey, int] = {}
+        self._rows: Dict[int, Tuple[ChunkKey, str]] = {}
+        self._by_digest: Dict[str, int] = {}
+        rows = self._con.execute("SELECT row, path, start_line, end_line, digest, list FROM vectors").fetchall()
+        capacity = self._capacity_on_disk()
+        self._open_matrix(max(capacity, 1024, max((r[0] for r in rows), default=-1) + 1))
+        for row, path, start, end, digest, lst in rows:
+            self._index_row(row, (path, start, end), digest)
+            self._list[row] = -1 if lst is None else lst
+        cent_path = self.root / "centroids.npy"
+        self._centroids = np.load(cent_path) if cent_path.exists() and self._trained else None
+
+    def _reset(self) -> None:
+        with self._con:
+            self._con.execute("DELETE FROM vectors")
+            self._con.execute("DELETE FROM meta")
+        for name in ("vectors.f16", "centroids.npy"):
+            (self.root / name).unlink(missing_ok=True)
+
+    def _capacity_on_disk(self) -> int:
+        path = self.root / "vectors.f16"
+        return path.stat().st_size // (2 * self.dim) if path.exists() else 0
+
+    def _open_matrix(self, capacity: int) -> None:
+        path = self.root / "vectors.f16"
+        with open(path, "ab") as fh:
+            if fh.tell() < capacity * self.dim * 2:
+                fh.truncate(capacity * self.dim * 2)
+        self._mat = np.memmap(path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+        old = getattr(self, "_list", None)
+        self._list = np.full(capacity, -1, dtype=np.int32)
+        self._live = np.zeros(capacity, dtype=bool)
+        if old is not None:
+            self._list[: len(old)] = old
+            self._live[: len(old)] = self._old_live
+
+    def _index_row(self, row: int, key: ChunkKey, digest: str) -> None:
+        self._keys[key] = row
+        self._rows[row] = (key, digest)
+        self._by_digest[digest] = row
+        self._live[row] = True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def digests(self, paths: Iterable[str] | None = None) -> Dict[ChunkKey, str]:
+        with self._lock:
+            keep = set(paths) if paths is not None else None
+            return {key: self._rows[row][1] for key, row in self._keys.items() if keep is None or key[0] in keep}
+
+    def vector_for_digest(self, digest: str):
+        with self._lock:
+            row = self._by_digest.get(digest)
+            if row is None or self._rows.get(row, (None, None))[1] != digest:
+                return None
+            return np.array(self._mat[row], dtype=np.float32)
+
+    def upsert(self, items: Sequence[Tuple[ChunkKey, str, Sequence[float]]]) -> None:
+        if not items:
+            return
+        vecs = _normalize(np.asarray([v for _, _, v in items], dtype=np.float32))
+        with self._lock:
+            free = iter(np.flatnonzero(~self._live).tolist())
+            rows = []
+            for key, _, _ in items:
+                row = self._keys.get(key)
+                if row is None:
+                    row = next(free, None)
+                    if row is None:
+                        self._grow()
+                        free = iter(np.flatnonzero(~self._live).tolist())
+                        row = next(free)
+                self._live[row] = True  # claimed; the free iterator was built before
+                rows.append(row)
+            self._mat[rows] = vecs.astype(np.float16)
+            lists = self._assign(vecs) if self._centroids is not None else np.full(len(rows), -1)
+            for row, (key, digest, _), lst in zip(rows, items, lists.tolist()):
+                self._index_row(row, key, digest)
+                self._list[row] = lst
+            self._mat.flush()
+            with self._con:
+                self._con.executemany(
+                    "INSERT OR REPLACE INTO vectors(row, path, start_line, end_line, digest, list) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(row, *key, digest, lst) for row, (key, digest, _), lst in zip(rows, items, lists.tolist())],
+                )
+
+    def _grow(self) -> None:
+        self._mat.flush()
+        self._old_live = self._live
+        self._open_matrix(len(self._list) * 2)
+
+    def delete(self, keys: Iterable[ChunkKey]) -> int:
+        with self._lock:
+            rows = [self._keys.pop(key) for key in keys if key in self._keys]
+            for row in rows:
+                _, digest = self._rows.pop(row)
+                if self._by_digest.get(digest) == row:
+                    del self._by_digest[digest]
+                self._live[row] = False
+                self._list[row] = -1
+            with self._con:
+                self._con.executemany("DELETE FROM vectors WHERE row = ?", [(r,) for r in rows])
+            return len(rows)
+
+    def _assign(self, vecs):
+        return np.argmax(vecs @ self._centroids.T, axis=1).astype(np.int32)
+
+    def maybe_train(self, force: bool = False) -> bool:
+        """(Re)builds the IVF lists once the collection is big enough or has doubled."""
+        with self._lock:
+            n = len(self)
+            if n < IVF_MIN_VECTORS and not force:
+                return False
+            if not force and self._centroids is not None and n <= 2 * self._trained:
+                return False
+            live = np.flatnonzero(self._live)
+            nlist = max(1, min(len(live), int(4 * math.sqrt(len(live)))))
+            sample = live
+            if len(live) > KMEANS_SAMPLE:
+                sample = np.sort(np.random.default_rng(0).choice(live, size=KMEANS_SAMPLE, replace=False))
+            self._centroids = kmeans(np.asarray(self._mat[sample], dtype=np.float32), nlist)
+            for start in range(0, len(live), 65536):
+                block = live[start:start + 65536]
+                self._list[block] = self._assign(np.asarray(self._mat[block], dtype=np.float32))
+            np.save(self.root / "centroids.npy", self._centroids)
+            self._trained = n
+            with self._con:
+                self._con.executemany("UPDATE vectors SET list = ? WHERE row = ?", [(int(self._list[r]), int(r)) for r in live])
+                self._con.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('trained', ?)", (str(n),))
+            return True
+
+    def search(self, query: Sequence[float], k: int = 20, nprobe: int = DEFAULT_NPROBE) -> List[Tuple[ChunkKey, float]]:
+        q = _normalize(np.asarray(query, dtype=np.float32))
+        with self._lock:
+            if self._centroids is None:
+                cand = np.flatnonzero(self._live)
+            else:
+                probe = np.argsort(self._centroids @ q)[-nprobe:]
+                cand = np.flatnonzero(np.isin(self._list, probe))
+            if len(cand) == 0:
+                return []
+            scores = np.asarray(self._mat[cand], dtype=np.float32) @ q
+            top = np.argpartition(-scores, min(k, len(cand)) - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._rows[int(cand[i])][0], float(scores[i])) for i in top]
+
+    def close(self) -> None:
+        with self._lock:
+            self._mat.flush()
+            self._con.close()
+
+
+class EmbeddingIndex:
+    """Chunk embeddings kept in step with the indexer's chunk table."""
+
+    def __init__(self, root: Path, embed: Embedder, batch_size: int = 32, nprobe: int = DEFAULT_NPROBE) -> None:
+        self.root = Path(root)
+        self.embed = embed
+        self.batch_size = max(1, batch_size)
+        self.nprobe = nprobe
+        self.store: VectorStore | None = None
+        self.last_stats: Dict[str, float] = {}
+        self._sync_lock = threading.Lock()
+
+    def _open(self, dim: int) -> VectorStore:
+        if self.store is None or self.store.dim != dim:
+            self.store = VectorStore(self.root, dim)
+        return self.store
+
+    def sync(self, chunks: Iterable[Tuple[str, int, int, str, str]], paths: Iterable[str] | None = None) -> Dict[str, float]:
+        """Embeds new or changed (path, start, end, symbol, body) chunks and drops stale ones.
+
+        With `paths`, only those files are considered (an indexer change
+        batch); otherwise `chunks` is the whole collection.
+        """
+        with self._sync_lock:
+            wanted: Dict[ChunkKey, Tuple[str, str]] = {}
+            for path, start, end, symbol, body in chunks:
+                text = embed_text(path, symbol, body)
+                wanted[(path, start, end)] = (chunk_digest(text), text)
+            paths = sorted(set(paths)) if paths is not None else None
+            stats = {"embedded": 0, "reused": 0, "removed": 0}
+            if self.store is None and not wanted:
+                return stats
+            have = self.store.digests(paths) if self.store is not None else {}
+            stale = [key for key in have if key not in wanted]
+            todo = [(key, digest, text) for key, (digest, text) in wanted.items() if have.get(key) != digest]
+            pending: List[Tuple[ChunkKey, str, str]] = []
+            for key, digest, text in todo:
+                vec = self.store.vector_for_digest(digest) if self.store is not None else None
+                if vec is not None:
+                    # Same text elsewhere (moved lines, copied file): no model call.
+                    self.store.upsert([(key, digest, vec)])
+                    stats["reused"] += 1
+                else:
+                    pending.append((key, digest, text))
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                vecs = self.embed([text for _, _, text in batch])
+                store = self._open(len(vecs[0]))
+                store.upsert([(key, digest, vec) for (key, digest, _), vec in zip(batch, vecs)])
+                stats["embedded"] += len(batch)
+            if self.store is not None:
+                stats["removed"] = self.store.delete(stale)
+                self.store.maybe_train()
+                stats["vectors"] = len(self.store)
+            self.last_stats = stats
+            return stats
+
+    def open_existing(self) -> bool:
+        """Opens a store persisted by an earlier run without calling the model."""
+        meta = self.root / "meta.sqlite"
+        if self.store is None and meta.exists():
+            con = sqlite3.connect(meta)
+            try:
+                row = con.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+            except sqlite3.OperationalError:
+                row = None
+            finally:
+                con.close()
+            if row is not None:
+                self.store = VectorStore(self.root, int(row[0]))
+        return self.store is not None
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[ChunkKey, float]]:
+        if self.store is None or not len(self.store) or not query.strip():
+            return []
+        return self.store.search(self.embed([query])[0], k=k, nprobe=self.nprobe)
+
+
+def fuse(rankings: Sequence[Sequence[ChunkKey]], limit: int, k: int = RRF_K) -> List[Tuple[ChunkKey, float]]:
+    """Reciprocal rank fusion: sum of 1 / (k + rank) over each ranking a key appears in."""
+    scores: Dict[ChunkKey, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])[:limit]
+
+
+def hybrid_search(indexer, embeddings: EmbeddingIndex | None, query: str, limit: int = 20) -> List[Dict[str, object]]:
+    """BM25 chunks fused with nearest-neighbour chunks; BM25 alone without embeddings."""
+    lexical = indexer.search_chunks(query, limit=limit * 2)
+    if embeddings is None:
+        return lexical[:limit]
+    semantic = embeddings.search(query, k=limit * 2)
+    if not semantic:
+        return lexical[:limit]
+    by_key = {(h["file"], h["start_line"], h["end_line"]): h for h in lexical}
+    fused = fuse([list(by_key), [key for key, _ in semantic]], limit)
+    missing = [key for key, _ in fused if key not in by_key]
+    if missing:
+        for path, start, end, symbol, body in indexer.chunk_rows({key[0] for key in missing}):
+            by_key.setdefault((path, start, end), {
+                "file": path, "start_line": start, "end_line": end, "symbol": symbol, "text": body,
+            })
+    out = []
+    for key, score in fused:
+        hit = by_key.get(key)
+        if hit is not None:
+            out.append({**hit, "score": round(score, 6)})
+    return out
@@ -0,0 +1,196 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Pattern, Tuple
+import os
+import re
+
+
+@dataclass
+class WalkStats:
+    dirs: int = 0
+    files: int = 0
+    pruned_dirs: int = 0
+    ignored_files: int = 0
+
+
+def _translate(glob: str) -> str:
+    out: List[str] = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("/**", i) and i + 3 == len(glob):
+            out.append("(?:/.*)?")
+            i += 3
+        elif glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = glob.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = glob[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        elif c == "\\" and i + 1 < len(glob):
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+@dataclass
+class IgnoreRules:
+    """The subset of .gitignore semantics the indexer needs.
+
+    Supports comments, negation, directory-only patterns, anchoring and `**`.
+    Rules from a nested .gitignore only apply below that directory.
+    """
+
+    # (base dir relative to repo root, compiled pattern, negated, dir_only)
+    rules: List[Tuple[str, Pattern[str], bool, bool]] = field(default_factory=list)
+
+    def add_lines(self, lines: Iterable[str], base: str = "") -> None:
+        for raw in lines:
+            line = raw.rstrip("\n").rstrip("\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            line = line.rstrip() if not line.endswith("\\ ") else line
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+            body = _translate(line)
+            rx = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+            self.rules.append((base, rx, negate, dir_only))
+
+    def add_file(self, path: Path, base: str = "") -> None:
+        """Loads a .gitignore for `base`, replacing rules loaded for it before.
+
+        Long-lived rules (the watcher) see the same file again whenever a
+        subtree is re-walked; appending would duplicate its rules each time.
+        """
+        try:
+            lines = path.read_text(errors="ignore").splitlines()
+        except OSError:
+            return
+        at = next((i for i, rule in enumerate(self.rules) if rule[0] == base), len(self.rules))
+        rest = [rule for rule in self.rules[at:] if rule[0] != base]
+        del self.rules[at:]
+        self.add_lines(lines, base)
+        self.rules.extend(rest)
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        result = False
+        for base, rx, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel.startswith(base + "/"):
+                    continue
+                sub = rel[len(base) + 1:]
+            else:
+                sub = rel
+            if rx.match(sub):
+                result = not negate
+        return result
+
+
+def is_excluded(rel: str, exclude_dirs: Iterable[str], rules: IgnoreRules | None = None, is_dir: bool = False) -> bool:
+    """Whether `rel` lies in a pruned directory or is itself ignored."""
+    parts = rel.split("/")
+    exclude = set(exclude_dirs)
+    dirs = parts if is_dir else parts[:-1]
+    if any(p in exclude for p in dirs):
+        return True
+    if rules is None:
+        return False
+    for i in range(1, len(dirs) + 1):
+        if rules.ignored("/".join(dirs[:i]), True):
+            return True
+    return not is_dir and rules.ignored(rel, False)
+
+
+def walk_repo(
+    repo_root: Path,
+    exclude_dirs: Iterable[str] = (),
+    suffixes: Iterable[str] | None = None,
+    use_gitignore: bool = True,
+    stats: WalkStats | None = None,
+    rules: IgnoreRules | None = None,
+    on_dir: Callable[[str, str], None] | None = None,
+    rel_root: str = "",
+) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Yields (relative posix path, DirEntry) for files under repo_root.
+
+    Excluded and ignored directories are pruned before descending, so large
+    trees like node_modules are never listed. Pass `rules` to keep the loaded
+    .gitignore rules, `on_dir` to see every directory that was descended into
+    and `rel_root` to walk only one subdirectory.
+    """
+    exclude = set(exclude_dirs)
+    wanted = set(suffixes) if suffixes is not None else None
+    stats = stats if stats is not None else WalkStats()
+    rules = rules if rules is not None else IgnoreRules()
+    start = os.path.join(str(repo_root), rel_root) if rel_root else str(repo_root)
+    stack: List[Tuple[str, str]] = [(rel_root, start)]
+    while stack:
+        rel_dir, abs_dir = stack.pop()
+        stats.dirs += 1
+        if on_dir is not None:
+            on_dir(rel_dir, abs_dir)
+        if use_gitignore:
+            gi = os.path.join(abs_dir, ".gitignore")
+            if os.path.isfile(gi):
+                rules.add_file(Path(gi), rel_dir)
+        try:
+            with os.scandir(abs_dir) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs: List[Tuple[str, str]] = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name in exclude or (use_gitignore and rules.ignored(rel, True)):
+                    stats.pruned_dirs += 1
+                    continue
+                subdirs.append((rel, entry.path))
+                continue
+            if wanted is not None and os.path.splitext(entry.name)[1] not in wanted:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if use_gitignore and rules.ignored(rel, False):
+                stats.ignored_files += 1
+                continue
+            stats.files += 1
+            yield rel, entry
+        stack.extend(reversed(subdirs))
@@ -0,0 +1,325 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from indexer.walker import IgnoreRules, is_excluded, walk_repo
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+@dataclass
+class ChangeBatch:
+    paths: List[str]
+    rescan: bool
+    first_ts: float  # wall clock of the oldest event in the batch
+
+
+class ChangeQueue:
+    """Coalescing, debounced queue of changed repo-relative paths.
+
+    Repeated events for a path collapse into one entry. get_batch() returns
+    once no new event arrived for `debounce_s`, or after `max_delay_s` under a
+    steady stream of events, so a save storm becomes a single index pass.
+    """
+
+    def __init__(self, debounce_s: float = 0.2, max_delay_s: float = 2.0) -> None:
+        self.debounce_s = debounce_s
+        self.max_delay_s = max_delay_s
+        self._cond = threading.Condition()
+        self._pending: Dict[str, float] = {}
+        self._rescan = False
+        self._first = 0.0
+        self._last = 0.0
+        self._closed = False
+        self.events = 0
+        self.batches = 0
+
+    def put(self, rel: str) -> None:
+        self.put_many([rel])
+
+    def put_many(self, rels: Iterable[str]) -> None:
+        with self._cond:
+            now = time.time()
+            for rel in rels:
+                self.events += 1
+                self._pending.setdefault(rel, now)
+                self._touch(now)
+            self._cond.notify_all()
+
+    def request_rescan(self) -> None:
+        # Events were lost (queue overflow, directory moved away): walk everything.
+        with self._cond:
+            self.events += 1
+            self._rescan = True
+            self._touch(time.time())
+            self._cond.notify_all()
+
+    def _touch(self, now: float) -> None:
+        if not self._first:
+            self._first = now
+        self._last = now
+
+    def get_batch(self, timeout: float | None = None) -> ChangeBatch | None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._closed:
+                if self._pending or self._rescan:
+                    now = time.time()
+                    quiet = now - self._last
+                    waited = now - self._first
+                    if quiet >= self.debounce_s or waited >= self.max_delay_s:
+                        batch = ChangeBatch(sorted(self._pending), self._rescan, self._first)
+                        self._pending = {}
+                        self._rescan = False
+                        self._first = self._last = 0.0
+                        self.batches += 1
+                        return batch
+                    wait = min(self.debounce_s - quiet, self.max_delay_s - waited)
+                else:
+                    wait = None
+                if deadline is not None:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return None
+                    wait = left if wait is None else min(wait, left)
+                self._cond.wait(wait)
+            return None
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            oldest = self._first
+            return {
+                "depth": len(self._pending) + (1 if self._rescan else 0),
+                "oldest_pending_ms": round((time.time() - oldest) * 1000.0, 1) if oldest else 0.0,
+                "events": self.events,
+                "batches": self.batches,
+            }
+
+
+class _BaseWatcher(ABC):
+    kind = ""
+
+    def __init__(self, repo_root: Path, queue: ChangeQueue, exclude_dirs: Iterable[str], suffixes: Iterable[str], use_gitignore: bool = True) -> None:
+        self.repo_root = Path(repo_root)
+        self.queue = queue
+        self.exclude_dirs = set(exclude_dirs)
+        self.suffixes = set(suffixes)
+        self.use_gitignore = use_gitignore
+        self.rules = IgnoreRules()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.error = ""
+
+    def _wanted(self, rel: str) -> bool:
+        if os.path.splitext(rel)[1] not in self.suffixes:
+            return False
+        return not is_excluded(rel, self.exclude_dirs, self.rules if self.use_gitignore else None)
+
+    def start(self) -> "_BaseWatcher":
+        self._thread = threading.Thread(target=self._run, name=f"index-watch-{self.kind}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @abstractmethod
+    def _run(self) -> None:
+        """Watch until `_stop` is set, pushing changed paths onto `queue`."""
+
+    def stats(self) -> Dict[str, object]:
+        return {"kind": self.kind, "alive": self.is_alive(), "error": self.error}
+
+
+class PollingWatcher(_BaseWatcher):
+    """Fallback: walks the tree every `interval_s` and diffs stat tuples."""
+
+    kind = "poll"
+
+    def __init__(self, *args, interval_s: float = 2.0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.interval_s = interval_s
+        self._seen: Dict[str, Tuple[int, int, int]] = {}
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int, int]]:
+        self.rules = IgnoreRules()
+        snap: Dict[str, Tuple[int, int, int]] = {}
+        for rel, entry in walk_repo(self.repo_root, self.exclude_dirs, self.suffixes, self.use_gitignore, rules=self.rules):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            snap[rel] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snap
+
+    def _run(self) -> None:
+        self._seen = self._snapshot()
+        while not self._stop.wait(self.interval_s):
+            try:
+                snap = self._snapshot()
+            except Exception as exc:
+                self.error = str(exc)
+                continue
+            changed = [rel for rel, sig in snap.items() if self._seen.get(rel) != sig]
+            changed.extend(rel for rel in self._seen.keys() - snap.keys())
+            self._seen = snap
+            if changed:
+                self.queue.put_many(changed)
+
+
+class InotifyWatcher(_BaseWatcher):
+    """Linux inotify via libc; one watch per non-excluded directory."""
+
+    kind = "inotify"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._wd: Dict[int, str] = {}
+        try:
+            self._add_tree("")
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _add_watch(self, rel_dir: str, abs_dir: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(abs_dir), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            # ENOSPC: fs.inotify.max_user_watches exhausted; the caller falls back to polling.
+            raise OSError(err, f"inotify_add_watch {abs_dir}: {os.strerror(err)}")
+        self._wd[wd] = rel_dir
+
+    def _add_tree(self, rel_dir: str) -> List[str]:
+        files = walk_repo(
+            self.repo_root, self.exclude_dirs, self.suffixes, self.use_gitignore,
+            rules=self.rules, on_dir=self._add_watch, rel_root=rel_dir,
+        )
+        return [rel for rel, _ in files]
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                self._dispatch(data)
+        except Exception as exc:
+            self.error = str(exc)
+            self.queue.request_rescan()
+        finally:
+            os.close(self._fd)
+
+    def _dispatch(self, data: bytes) -> None:
+        changed: List[str] = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", errors="surrogateescape")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.queue.request_rescan()
+                continue
+            if mask & IN_IGNORED:
+                self._wd.pop(wd, None)
+                continue
+            base = self._wd.get(wd)
+            if base is None or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue
+            rel = f"{base}/{name}" if base else name
+            if name == ".gitignore":
+                # Ignore rules changed: rebuild from a full walk.
+                self.rules = IgnoreRules()
+                self._add_tree("")
+                self.queue.request_rescan()
+                continue
+            if mask & IN_ISDIR:
+                if is_excluded(rel, self.exclude_dirs, self.rules if self.use_gitignore else None, is_dir=True):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land before the watch is added, so enqueue what is already there.
+                    try:
+                        changed.extend(self._add_tree(rel))
+                    except OSError as exc:
+                        self.error = str(exc)
+                        self.queue.request_rescan()
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.queue.request_rescan()
+                continue
+            if self._wanted(rel):
+                changed.append(rel)
+        if changed:
+            self.queue.put_many(changed)
+
+
+def start_watcher(
+    repo_root: Path,
+    queue: ChangeQueue,
+    exclude_dirs: Iterable[str],
+    suffixes: Iterable[str],
+    use_gitignore: bool = True,
+    mode: str = "auto",
+    poll_interval_s: float = 2.0,
+) -> _BaseWatcher:
+    """Starts an inotify watcher, or the polling fallback.
+
+    mode: auto | inotify | poll. `auto` uses inotify on Linux and falls back
+    to polling when it is unavailable or the watch limit is hit.
+    """
+    args = (repo_root, queue, exclude_dirs, suffixes, use_gitignore)
+    if mode != "poll" and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(*args).start()
+        except (OSError, AttributeError) as exc:
+            if mode == "inotify":
+                raise
+            watcher = PollingWatcher(*args, interval_s=poll_interval_s)
+            watcher.error = f"inotify unavailable: {exc}"
+            return watcher.start()
+    return PollingWatcher(*args, interval_s=poll_interval_s).start()
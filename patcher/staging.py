@@ -1,13 +1,70 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from pathlib import Path
+from pathlib import Path, PurePosixPath
+from typing import List
+import json
+import os
 import shutil
 import subprocess
 
+
+def diff_paths(diff_text: str) -> List[str]:
+    """Every repo path a unified diff reads or writes (both sides of renames)."""
+    paths: List[str] = []
+    for line in diff_text.splitlines():
+        if line.startswith("--- a/") or line.startswith("+++ b/"):
+            found = [line[6:].split("\t")[0].strip()]
+        elif line.startswith("diff --git a/") and " b/" in line:
+            a, _, b = line[len("diff --git a/"):].partition(" b/")
+            found = [a.strip(), b.strip()]
+        elif line.startswith(("rename from ", "rename to ", "copy from ", "copy to ")):
+            found = [line.split(" ", 2)[2].strip()]
+        else:
+            continue
+        for path in found:
+            if path and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def _repo_relative(rel: str) -> bool:
+    p = PurePosixPath(rel)
+    return not p.is_absolute() and ".." not in p.parts
+
+
+def _git(args: List[str], cwd: Path) -> str:
+    p = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"git {args[0]} failed: {p.stderr.strip()}")
+    return p.stdout
+
+
 @dataclass
 class StagingArea:
+    """A pending diff applied as an overlay on the repo.
+
+    Only the files the diff touches are copied into the staging dir before
+    `git apply` runs there; every other path reads straight from the repo.
+    mode="worktree" applies into a detached `git worktree` instead (HEAD plus
+    the repo's uncommitted edits), for running tests against a full tree.
+    """
+
     repo_root: Path
     staging_root: Path
+    mode: str = "overlay"  # overlay | worktree
+
+    @property
+    def overlay_root(self) -> Path:
+        return self.staging_root / "files"
+
+    @property
+    def worktree_root(self) -> Path:
+        # Outside staging_root so reset() keeps the checkout for the next diff.
+        return self.staging_root.with_name(self.staging_root.name + "_worktree")
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.staging_root / "overlay.json"
 
     def ensure(self) -> None:
         self.staging_root.mkdir(parents=True, exist_ok=True)
@@ -17,43 +74,103 @@ class StagingArea:
             shutil.rmtree(self.staging_root)
         self.ensure()
 
-    def apply_unified_diff(self, diff_text: str) -> None:
-        """Apply a unified diff to the staging copy of the repo.
+    def staged_paths(self) -> List[str]:
+        """Paths the staged diffs touched (including ones they delete)."""
+        try:
+            return json.loads(self.manifest_path.read_text())["paths"]
+        except Exception:
+            return []
+
+    def path_for(self, rel: str) -> Path | None:
+        """Where `rel` reads from with the staged diffs applied; None if absent."""
+        if self.mode == "worktree":
+            path = self.worktree_root / rel
+        elif rel in self.staged_paths():
+            path = self.overlay_root / rel
+        else:
+            path = self.repo_root / rel
+        return path if path.is_file() else None
 
-        MVP approach: create a staging copy (rsync-like), then apply `git apply`.
-        """
+    def read_file(self, rel: str) -> bytes | None:
+        path = self.path_for(rel)
+        return path.read_bytes() if path is not None else None
+
+    def apply_unified_diff(self, diff_text: str) -> None:
+        """Apply a unified diff on top of whatever is already staged."""
         self.ensure()
-        # Create staging copy if empty
-        if not any(self.staging_root.iterdir()):
-            shutil.copytree(self.repo_root, self.staging_root, dirs_exist_ok=True)
+        staged = self.staged_paths()
+        if self.mode == "worktree":
+            # Only the first diff after reset() starts from the repo; later ones stack.
+            if not staged or not (self.worktree_root / ".git").exists():
+                staged = []
+                self._sync_worktree()
+            root = self.worktree_root
+        else:
+            root = self.overlay_root
+            root.mkdir(parents=True, exist_ok=True)
+        for rel in diff_paths(diff_text):
+            if rel in staged or not _repo_relative(rel):
+                continue
+            src = self.repo_root / rel
+            if self.mode == "overlay" and src.is_file():
+                dst = root / rel
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dst)
+            staged.append(rel)
+        self.manifest_path.write_text(json.dumps({"mode": self.mode, "paths": staged}))
+        if self.mode == "worktree":
+            self._apply(diff_text, root)
+        else:
+            self._apply(diff_text, root, env=self._overlay_env())
+
+    def _overlay_env(self) -> dict:
+        # The overlay sits inside the repo's work tree; if git discovered that repo
+        # it would resolve patch paths against the repo root and skip them all.
+        env = {k: v for k, v in os.environ.items() if k not in ("GIT_DIR", "GIT_WORK_TREE")}
+        env["GIT_CEILING_DIRECTORIES"] = str(self.staging_root.resolve())
+        return env
+
+    def _sync_worktree(self) -> None:
+        wt = self.worktree_root
+        try:
+            head = _git(["rev-parse", "--verify", "HEAD"], self.repo_root).strip()
+        except RuntimeError as exc:
+            raise RuntimeError(f"worktree staging needs a git repo with a commit: {exc}")
+        if (wt / ".git").exists():
+            _git(["checkout", "--quiet", "--detach", "--force", head], wt)
+            _git(["clean", "-fdq"], wt)
+        else:
+            _git(["worktree", "prune"], self.repo_root)
+            _git(["worktree", "add", "--quiet", "--detach", "--force", str(wt), head], self.repo_root)
+        # Carry over uncommitted edits, but not the agent's own state dir (it holds staging).
+        agent_dir = self.staging_root.parent.resolve()
+        skip = agent_dir if agent_dir != self.repo_root.resolve() else None
+        deleted = set(_git(["ls-files", "-z", "--deleted"], self.repo_root).split("\0"))
+        for rel in _git(["ls-files", "-z", "--modified", "--others", "--exclude-standard"], self.repo_root).split("\0"):
+            src = self.repo_root / rel
+            if not rel or (skip is not None and skip in src.resolve().parents):
+                continue
+            if rel in deleted:
+                (wt / rel).unlink(missing_ok=True)
+            elif src.is_file():
+                (wt / rel).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, wt / rel)
+
+    def _apply(self, diff_text: str, cwd: Path, *flags: str, env: dict | None = None) -> None:
+        cmd = ["git", "apply", *flags, "--whitespace=nowarn", "-"]
         p = subprocess.run(
-            ["git", "apply", "--whitespace=nowarn", "-"],
+            cmd,
             input=diff_text,
             text=True,
-            cwd=self.staging_root,
+            cwd=cwd,
+            env=env,
             capture_output=True,
         )
         if p.returncode != 0:
-            raise RuntimeError(f"git apply failed: {p.stderr.strip()}")
+            raise RuntimeError(f"{' '.join(cmd[:2 + len(flags)])} failed: {p.stderr.strip()}")
 
     def check_unified_diff(self, diff_text: str) -> None:
-        p = subprocess.run(
-            ["git", "apply", "--check", "--whitespace=nowarn", "-"],
-            input=diff_text,
-            text=True,
-            cwd=self.repo_root,
-            capture_output=True,
-        )
-        if p.returncode != 0:
-            raise RuntimeError(f"git apply --check failed: {p.stderr.strip()}")
+        self._apply(diff_text, self.repo_root, "--check")
 
     def apply_unified_diff_to_repo(self, diff_text: str) -> None:
-        p = subprocess.run(
-            ["git", "apply", "--whitespace=nowarn", "-"],
-            input=diff_text,
-            text=True,
-            cwd=self.repo_root,
-            capture_output=True,
-        )
-        if p.returncode != 0:
-            raise RuntimeError(f"git apply failed: {p.stderr.strip()}")
+        self._apply(diff_text, self.repo_root)
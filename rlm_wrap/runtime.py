@@ -1,10 +1,13 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+import hashlib
+import json
 
 from agent.llm_runtime import LlamaRuntime, find_gguf_model
 from agent.keys import load_keys
+from rlm_wrap.session import SessionKey, get_rlm_sessions
 from rlm_wrap.store import RLMVarStore
 
 
@@ -61,41 +64,82 @@ class RLMChatRuntime:
             kwargs["api_key"] = api_key
         return kwargs
 
-    def chat(self, messages: List[Dict[str, str]], vars: Dict[str, Any] | None = None) -> str:
-        if self.var_store is not None and vars:
-            self.var_store.set_many(vars)
-        store_vars = self.var_store.load() if self.var_store is not None else {}
+    def _session_key(self) -> SessionKey:
+        fingerprint = hashlib.sha1(json.dumps({
+            "max_iterations": self.rlm_max_iterations,
+            "environment_kwargs": self.rlm_environment_kwargs or {},
+            "api_key": self._resolve_api_key(),
+        }, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+        return (
+            (self.rlm_backend or "").lower(),
+            self.rlm_backend_model,
+            self.rlm_backend_url,
+            self.rlm_environment,
+            int(self.rlm_max_depth),
+            fingerprint,
+        )
+
+    def _make_rlm(self) -> Any:
+        from rlm import RLM  # type: ignore
+        rlm_kwargs: Dict[str, Any] = {
+            "backend": self.rlm_backend,
+            "max_depth": self.rlm_max_depth,
+            "max_iterations": self.rlm_max_iterations,
+        }
+        if self.rlm_environment:
+            rlm_kwargs["environment"] = self.rlm_environment
+        if self.rlm_environment_kwargs:
+            rlm_kwargs["environment_kwargs"] = self.rlm_environment_kwargs
+        backend_kwargs = self._build_backend_kwargs()
+        if backend_kwargs:
+            rlm_kwargs["backend_kwargs"] = backend_kwargs
+        return RLM(**rlm_kwargs)
+
+    def _rlm_chat(self, messages: List[Dict[str, str]], store_vars: Dict[str, Any]) -> str | None:
+        if not (self.use_rlm and self.rlm_backend):
+            return None
+        prompt = {"messages": messages, "memory": store_vars}
+        root_prompt = (
+            "You are a coding assistant. You can access long-term memory in a JSON object named `context`. "
+            "The `context` contains keys `messages` and `memory`. Use `memory` when details are needed. "
+            "Respond with the final answer only."
+        )
         try:
-            if self.use_rlm and self.rlm_backend:
-                from rlm import RLM  # type: ignore
-                rlm_kwargs: Dict[str, Any] = {
-                    "backend": self.rlm_backend,
-                    "max_depth": self.rlm_max_depth,
-                    "max_iterations": self.rlm_max_iterations,
-                }
-                if self.rlm_environment:
-                    rlm_kwargs["environment"] = self.rlm_environment
-                if self.rlm_environment_kwargs:
-                    rlm_kwargs["environment_kwargs"] = self.rlm_environment_kwargs
-                backend_kwargs = self._build_backend_kwargs()
-                if backend_kwargs:
-                    rlm_kwargs["backend_kwargs"] = backend_kwargs
-                rlm = RLM(**rlm_kwargs)
-                prompt = {"messages": messages, "memory": store_vars}
-                root_prompt = (
-                    "You are a coding assistant. You can access long-term memory in a JSON object named `context`. "
-                    "The `context` contains keys `messages` and `memory`. Use `memory` when details are needed. "
-                    "Respond with the final answer only."
-                )
-                result = rlm.completion(prompt=prompt, root_prompt=root_prompt)
-                return getattr(result, "response", None) or str(result)
+            result = get_rlm_sessions().call(
+                self._session_key(),
+                self._make_rlm,
+                lambda rlm: rlm.completion(prompt=prompt, root_prompt=root_prompt),
+            )
         except Exception:
-            pass
-        model_path = self._load_model_path()
-        llm = LlamaRuntime(
-            model_path=model_path,
+            # Recorded by the session cache; unreachable backends are negatively cached.
+            return None
+        return getattr(result, "response", None) or str(result)
+
+    def _llama(self) -> LlamaRuntime:
+        return LlamaRuntime(
+            model_path=self._load_model_path(),
             n_ctx=self.n_ctx,
             n_gpu_layers=self.n_gpu_layers,
             temperature=self.temperature,
         )
-        return llm.chat(messages)
+
+    def _load_vars(self, vars: Dict[str, Any] | None) -> Dict[str, Any]:
+        if self.var_store is not None and vars:
+            self.var_store.set_many(vars)
+        return self.var_store.load() if self.var_store is not None else {}
+
+    def chat(self, messages: List[Dict[str, str]], vars: Dict[str, Any] | None = None) -> str:
+        store_vars = self._load_vars(vars)
+        answer = self._rlm_chat(messages, store_vars)
+        if answer is not None:
+            return answer
+        return self._llama().chat(messages)
+
+    def chat_stream(self, messages: List[Dict[str, str]], vars: Dict[str, Any] | None = None) -> Iterator[str]:
+        # RLM completions are not incremental, so they arrive as a single delta.
+        store_vars = self._load_vars(vars)
+        answer = self._rlm_chat(messages, store_vars)
+        if answer is not None:
+            yield answer
+            return
+        yield from self._llama().chat_stream(messages)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Tuple
+from urllib.parse import urlsplit
+import socket
+import threading
+import time
+
+# (backend, model, url, environment, depth, config fingerprint)
+SessionKey = Tuple[str, str, str, str, int, str]
+
+
+class RLMUnavailable(RuntimeError):
+    pass
+
+
+@dataclass
+class _Session:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    client: Any = None
+    checked_at: float = 0.0
+    failed_until: float = 0.0
+    last_error: str = ""
+    calls: int = 0
+    builds: int = 0
+    failures: int = 0
+    skipped: int = 0
+
+
+# Connection failures from the HTTP clients RLM backends use (openai, httpx);
+# they do not derive from OSError.
+_UNAVAILABLE_NAMES = {"APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout"}
+
+
+def _unavailable(exc: BaseException) -> bool:
+    """True if `exc` means the backend cannot be reached, not that the call was bad."""
+    if isinstance(exc, (RLMUnavailable, OSError)):
+        return True
+    return any(cls.__name__ in _UNAVAILABLE_NAMES for cls in type(exc).__mro__)
+
+
+def backend_reachable(url: str, timeout: float = 1.0) -> bool:
+    # Cheap liveness probe for self-hosted backends: can we open a TCP connection?
+    if not url:
+        return True
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        with socket.create_connection((parts.hostname or "", port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class RLMSessionCache:
+    """Keeps one RLM client per backend configuration alive across calls.
+
+    A backend that cannot be reached is remembered for negative_ttl_s so
+    callers fall back to llama.cpp immediately instead of paying the
+    connect/timeout cost each time. Other errors are re-raised as-is.
+    """
+
+    def __init__(self, negative_ttl_s: float = 60.0, health_interval_s: float = 30.0) -> None:
+        self.negative_ttl_s = negative_ttl_s
+        self.health_interval_s = health_interval_s
+        self._sessions: Dict[SessionKey, _Session] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, negative_ttl_s: float | None = None, health_interval_s: float | None = None) -> None:
+        if negative_ttl_s is not None:
+            self.negative_ttl_s = max(0.0, float(negative_ttl_s))
+        if health_interval_s is not None:
+            self.health_interval_s = max(0.0, float(health_interval_s))
+
+    def call(self, key: SessionKey, factory: Callable[[], Any], fn: Callable[[Any], Any]) -> Any:
+        session = self._session(key)
+        now = time.time()
+        if session.failed_until > now:
+            with self._lock:
+                session.skipped += 1
+            raise RLMUnavailable(f"RLM backend unavailable: {session.last_error}")
+        for attempt in range(2):
+            client = None
+            try:
+                client = self._client(key, session, factory)
+                # Not under session.lock: calls to one backend run concurrently.
+                return fn(client)
+            except Exception as exc:
+                session.last_error = f"{type(exc).__name__}: {exc}"
+                if not _unavailable(exc):
+                    # A bad prompt or caller bug says nothing about the backend.
+                    raise
+                # Rebuild once: the cached client may hold a dead connection.
+                with session.lock:
+                    if session.client is client:
+                        session.client = None
+                    if attempt == 1 or isinstance(exc, RLMUnavailable):
+                        session.failures += 1
+                        session.failed_until = time.time() + self.negative_ttl_s
+                        raise
+        raise RLMUnavailable(session.last_error)
+
+    def _client(self, key: SessionKey, session: _Session, factory: Callable[[], Any]) -> Any:
+        with session.lock:
+            if session.client is None or self._health_due(session):
+                self._check(key, session)
+            if session.client is None:
+                session.client = factory()
+                session.builds += 1
+            session.calls += 1
+            return session.client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            sessions = [
+                {
+                    "backend": k[0],
+                    "model": k[1],
+                    "url": k[2],
+                    "environment": k[3],
+                    "depth": k[4],
+                    "live": s.client is not None,
+                    "calls": s.calls,
+                    "builds": s.builds,
+                    "failures": s.failures,
+                    "skipped": s.skipped,
+                    "unavailable_for_s": round(max(0.0, s.failed_until - now), 1),
+                    "last_error": s.last_error,
+                }
+                for k, s in self._sessions.items()
+            ]
+        return {"negative_ttl_s": self.negative_ttl_s, "health_interval_s": self.health_interval_s, "sessions": sessions}
+
+    def _session(self, key: SessionKey) -> _Session:
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = _Session()
+                self._sessions[key] = session
+            return session
+
+    def _health_due(self, session: _Session) -> bool:
+        return self.health_interval_s > 0 and time.time() - session.checked_at >= self.health_interval_s
+
+    def _check(self, key: SessionKey, session: _Session) -> None:
+        session.checked_at = time.time()
+        if not backend_reachable(key[2]):
+            session.client = None
+            raise RLMUnavailable(f"cannot reach {key[2]}")
+
+
+_CACHE = RLMSessionCache()
+
+
+def get_rlm_sessions() -> RLMSessionCache:
+    return _CACHE
+
+
+def configure_rlm_sessions(runtime_cfg) -> None:
+    _CACHE.configure(
+        negative_ttl_s=getattr(runtime_cfg, "rlm_negative_ttl_s", None),
+        health_interval_s=getattr(runtime_cfg, "rlm_health_interval_s", None),
+    )
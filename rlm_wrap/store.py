@@ -2,7 +2,7 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from pathlib import Path
 import json
-from typing import Dict, Any, Iterable
+from typing import Dict, Any, Iterable, Tuple
 
 
 @dataclass
@@ -10,15 +10,26 @@ class RLMVarStore:
     repo_root: Path
     filename: str = "rlm_vars.json"
     _cache: Dict[str, Any] = field(default_factory=dict)
+    _stamp: Tuple[int, int] = (0, 0)
 
     @property
     def path(self) -> Path:
         return self.repo_root / ".agent" / self.filename
 
+    def _stat(self) -> Tuple[int, int]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return (0, 0)
+        return (st.st_mtime_ns, st.st_size)
+
     def load(self) -> Dict[str, Any]:
-        if self._cache:
+        # Re-read only when another store instance has rewritten the file.
+        stamp = self._stat()
+        if self._cache and stamp == self._stamp:
             return dict(self._cache)
-        if not self.path.exists():
+        self._stamp = stamp
+        if not stamp[0]:
             self._cache = {}
             return {}
         try:
@@ -30,6 +41,7 @@ class RLMVarStore:
     def save(self) -> None:
         self.path.parent.mkdir(parents=True, exist_ok=True)
         self.path.write_text(json.dumps(self._cache, indent=2))
+        self._stamp = self._stat()
 
     def set(self, key: str, value: Any) -> None:
         self._cache = self.load()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent import context_ingest
+from agent.context_ingest import STOP, WORD_RE, ingest_text, rank_chunks, summarize_chunks, term_matrix
+
+
+def legacy(query: str, chunks, top_k: int):
+    # The per-function tokenization this module used before the shared TermMatrix.
+    words = {}
+    for ch in chunks:
+        for w in WORD_RE.findall(ch.lower()):
+            if w not in STOP:
+                words[w] = words.get(w, 0) + 1
+    sorted(words.items(), key=lambda x: (-x[1], x[0]))[:12]
+    qwords = set(w for w in WORD_RE.findall(query.lower()) if w not in STOP)
+    scored = [(len(qwords & set(w for w in WORD_RE.findall(ch.lower()) if w not in STOP)), ch) for ch in chunks]
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [c for _, c in scored[:top_k]]
+
+
+def source_text(n_chars: int) -> str:
+    root = Path(__file__).resolve().parents[1]
+    parts, size = [], 0
+    while size < n_chars:
+        for p in sorted(root.glob("**/*.py")):
+            text = p.read_text(errors="ignore")
+            parts.append(text)
+            size += len(text)
+            if size >= n_chars:
+                break
+    return "".join(parts)[:n_chars]
+
+
+def timed(label: str, fn, repeat: int) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f"{label:<30} {(time.perf_counter() - start) * 1000 / repeat:8.2f} ms")
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Context ingest ranking and summarisation on a large pasted context.")
+    ap.add_argument("--chars", type=int, default=200000)
+    ap.add_argument("--chunk-size", type=int, default=2000)
+    ap.add_argument("--overlap", type=int, default=200)
+    ap.add_argument("--top-k", type=int, default=6)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    text = source_text(args.chars)
+    query = "cache the repo map and rank files by dependency graph pagerank"
+    chunks = ingest_text(text, args.chunk_size, args.overlap)
+    print(f"{len(text)} chars, {len(chunks)} chunks")
+
+    def cold():
+        context_ingest._TOKEN_CACHE.clear()
+        m = term_matrix(chunks)
+        summarize_chunks(chunks, m)
+        rank_chunks(query, chunks, args.top_k, m)
+
+    def warm():
+        m = term_matrix(chunks)
+        summarize_chunks(chunks, m)
+        rank_chunks(query, chunks, args.top_k, m)
+
+    timed("legacy summarize + rank", lambda: legacy(query, chunks, args.top_k), args.repeat)
+    timed("term matrix, cold cache", cold, args.repeat)
+    warm()
+    timed("term matrix, warm cache", warm, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
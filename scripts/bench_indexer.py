@@ -0,0 +1,135 @@
+from __future__ import annotations
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from indexer.dep_graph import DependencyGraph
+from indexer.indexer import SymbolIndexer
+
+PY_TEMPLATE = '''import os
+
+
+class Model{i}:
+    def load(self):
+        return {i}
+
+    def save(self, path):
+        return os.path.join(path, "m{i}")
+
+
+def helper_{i}(x):
+    return x + {i}
+'''
+
+TS_TEMPLATE = '''export class Service{i} {{
+  run(): number {{ return {i}; }}
+}}
+
+export function make{i}() {{ return new Service{i}(); }}
+export const handler{i} = () => make{i}().run();
+'''
+
+
+def make_repo(root: Path, n_files: int) -> None:
+    for i in range(n_files):
+        d = root / f"pkg{i // 500}" / f"mod{(i // 50) % 10}"
+        d.mkdir(parents=True, exist_ok=True)
+        if i % 4 == 3:
+            (d / f"f{i}.ts").write_text(TS_TEMPLATE.format(i=i))
+        else:
+            (d / f"f{i}.py").write_text(PY_TEMPLATE.format(i=i))
+
+
+def touch(root: Path, n: int) -> None:
+    files = sorted(root.rglob("f*.py"))[:n]
+    for p in files:
+        st = p.stat()
+        with p.open("a") as fh:
+            fh.write("\n\ndef touched():\n    return 0\n")
+        os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def rewrite(root: Path, n: int) -> None:
+    # Same bytes, new mtime: the content hash should avoid a reparse.
+    files = sorted(root.rglob("f*.py"))[-n:]
+    for p in files:
+        st = p.stat()
+        p.write_bytes(p.read_bytes())
+        os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def timed(label: str, fn, idx: SymbolIndexer | None = None) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    extra = ""
+    if idx is not None and idx.last_stats:
+        st = idx.last_stats
+        extra = f"  skipped={st['skipped']} unchanged={st['unchanged']} reparsed={st['reparsed']}"
+    print(f"{label:<28} {elapsed:8.2f}s{extra}")
+    return elapsed
+
+
+def cold_init(root: Path, workers: int) -> None:
+    def two_pass() -> None:
+        idx = SymbolIndexer(repo_root=root, db_path=root / ".bench2" / "index.sqlite", workers=workers)
+        idx.index_all()
+        idx.close()
+        dep = DependencyGraph(repo_root=root, db_path=root / ".bench2" / "deps.sqlite")
+        dep.init_db()
+        for p in root.rglob("*"):
+            if p.is_file() and p.suffix in (".py", ".js", ".ts", ".tsx"):
+                dep.update_file(p)
+
+    def one_pass() -> None:
+        dep = DependencyGraph(repo_root=root, db_path=root / ".bench1" / "deps.sqlite")
+        idx = SymbolIndexer(repo_root=root, db_path=root / ".bench1" / "index.sqlite", workers=workers, dep_graph=dep)
+        idx.index_all()
+        idx.close()
+
+    timed("cold init, separate deps", two_pass)
+    timed("cold init, shared parse", one_pass)
+    for d in (".bench1", ".bench2"):
+        shutil.rmtree(root / d, ignore_errors=True)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Full and incremental symbol indexing over a synthetic repo.")
+    ap.add_argument("--files", type=int, default=50000)
+    ap.add_argument("--touch", type=int, default=500, help="files modified before the incremental run")
+    ap.add_argument("--workers", type=int, default=0, help="parse processes (0 = one per core, 1 = serial)")
+    ap.add_argument("--keep", action="store_true", help="keep the synthetic repo")
+    ap.add_argument("--deps", action="store_true", help="compare cold init with a separate dependency-graph pass")
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench_index_"))
+    try:
+        start = time.perf_counter()
+        make_repo(root, args.files)
+        print(f"generated {args.files} files in {time.perf_counter() - start:.1f}s at {root}")
+        if args.deps:
+            cold_init(root, args.workers)
+        idx = SymbolIndexer(repo_root=root, db_path=root / ".agent" / "index.sqlite", workers=args.workers)
+        timed("index_all", idx.index_all, idx)
+        timed("index_incremental (no-op)", idx.index_incremental, idx)
+        touch(root, args.touch)
+        timed(f"index_incremental ({args.touch})", idx.index_incremental, idx)
+        rewrite(root, args.touch)
+        timed(f"index_incremental (same {args.touch})", idx.index_incremental, idx)
+        timed("search_symbols x100", lambda: [idx.search_symbols(f"helper_{i}") for i in range(100)])
+        rows = idx._connect().execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+        print(f"symbols: {rows}")
+        idx.close()
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
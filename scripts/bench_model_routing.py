@@ -0,0 +1,56 @@
+from __future__ import annotations
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent import keys as keys_mod
+from agent.config import load_config
+from agent.model_registry import _resolve_model_uncached, invalidate_model_cache, resolve_model
+
+
+def _per_call_us(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Per-call model routing overhead, uncached vs cached.")
+    ap.add_argument("--config", default=str(Path(__file__).resolve().parents[1] / "configs" / "config.yaml"))
+    ap.add_argument("--role", default="coder")
+    ap.add_argument("-n", type=int, default=2000)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        config_path = tmp / "config.yaml"
+        shutil.copy(args.config, config_path)
+        (tmp / "keys.env").write_text("OPENAI_API_KEY=sk-bench\nGEMINI_API_KEY=bench\n")
+        config = load_config(config_path)
+
+        def uncached():
+            keys_mod._CACHE.clear()
+            _resolve_model_uncached(args.role, config, tmp, config_path=config_path)
+
+        def cached():
+            resolve_model(args.role, config, tmp, config_path=config_path)
+
+        invalidate_model_cache()
+        before = _per_call_us(uncached, args.n)
+        cached()
+        after = _per_call_us(cached, args.n)
+        print(f"role={args.role} calls={args.n}")
+        print(f"uncached: {before:9.1f} us/call")
+        print(f"cached:   {after:9.1f} us/call  ({before / max(after, 1e-9):.0f}x)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
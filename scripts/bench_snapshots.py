@@ -0,0 +1,79 @@
+from __future__ import annotations
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from vcs.snapshot_cache import SnapshotCache
+
+
+def make_repo(root: Path, n_files: int) -> None:
+    for i in range(n_files):
+        d = root / f"pkg{i // 500}" / f"mod{(i // 50) % 10}"
+        d.mkdir(parents=True, exist_ok=True)
+        (d / f"f{i}.py").write_text(f"def f{i}(x):\n    return x + {i}\n" * 20)
+
+
+def edit(root: Path, n: int, tag: str) -> list[str]:
+    paths = sorted(root.rglob("f*.py"))[:n]
+    for p in paths:
+        with p.open("a") as fh:
+            fh.write(f"# {tag}\n")
+    return [p.relative_to(root).as_posix() for p in paths]
+
+
+def full_copy(repo: Path, cache: SnapshotCache, dest: Path) -> None:
+    # What every snapshot used to cost: a copy2 of each file.
+    for rel, _ in cache._iter_files():
+        target = dest / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(repo / rel, target)
+
+
+def timed(label: str, fn) -> None:
+    start = time.perf_counter()
+    out = fn()
+    extra = ""
+    if out is not None and hasattr(out, "bytes_written"):
+        extra = f"  written={out.bytes_written / 1e6:.1f}MB ratio={out.compression_ratio}"
+    print(f"{label:<32} {time.perf_counter() - start:8.2f}s{extra}")
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Snapshot and restore cost with the content-addressed store.")
+    ap.add_argument("--files", type=int, default=20000)
+    ap.add_argument("--edits", type=int, default=100, help="files changed between snapshots")
+    ap.add_argument("--storage", default="blobs", choices=["blobs", "pack"])
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench_snap_"))
+    try:
+        repo = root / "repo"
+        make_repo(repo, args.files)
+        cache = SnapshotCache(repo_root=repo, max_snapshots=4, storage=args.storage)
+        timed("full copy (previous behaviour)", lambda: full_copy(repo, cache, root / "copy"))
+        timed("snapshot, empty store", lambda: cache.snapshot("base"))
+        timed("snapshot, unchanged repo", lambda: cache.snapshot("noop"))
+        edit(repo, args.edits, "one")
+        timed(f"snapshot, {args.edits} files changed", lambda: cache.snapshot("edit"))
+        target = cache.get_head()
+        touched = edit(repo, args.edits, "delta")
+        timed(f"delta snapshot, {args.edits} files", lambda: cache.snapshot("delta", paths=touched))
+        touched = edit(repo, 1, "small")
+        timed("delta snapshot, 1 file", lambda: cache.snapshot("delta", paths=touched))
+        edit(repo, args.edits, "two")
+        timed(f"restore, {args.edits} files differ", lambda: cache.restore(target))
+        for _ in range(4):
+            cache.snapshot("trim")
+        stored = sum(p.stat().st_size for p in cache.objects_dir.rglob("*") if p.is_file())
+        print(f"store after trimming to 4 snapshots: {stored / 1e6:.1f}MB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from patcher.staging import StagingArea
+
+
+def make_repo(root: Path, n_files: int) -> None:
+    for i in range(n_files):
+        d = root / f"pkg{i // 500}" / f"mod{(i // 50) % 10}"
+        d.mkdir(parents=True, exist_ok=True)
+        (d / f"f{i}.py").write_text(f"def f{i}(x):\n    return x + {i}\n" * 20)
+
+
+def make_diff(n: int) -> str:
+    out = []
+    for i in range(n):
+        rel = f"pkg{i // 500}/mod{(i // 50) % 10}/f{i}.py"
+        out.append(f"--- a/{rel}\n+++ b/{rel}\n@@ -1,2 +1,2 @@\n-def f{i}(x):\n+def f{i}(x, y=0):\n     return x + {i}\n")
+    return "".join(out)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Overlay staging against the old full-copy staging.")
+    ap.add_argument("--files", type=int, default=20000)
+    ap.add_argument("--touched", type=int, default=3)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench_staging_"))
+    try:
+        repo = root / "repo"
+        make_repo(repo, args.files)
+        diff = make_diff(args.touched)
+        staging = StagingArea(repo_root=repo, staging_root=root / "staging")
+
+        start = time.perf_counter()
+        shutil.copytree(repo, root / "copy")
+        print(f"full copytree ({args.files} files)     {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            staging.reset()
+            staging.apply_unified_diff(diff)
+        ms = (time.perf_counter() - start) * 1000 / args.runs
+        print(f"overlay reset+apply ({args.touched} files)    {ms:8.1f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
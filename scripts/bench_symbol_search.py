@@ -0,0 +1,94 @@
+from __future__ import annotations
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from indexer.indexer import ParsedFile, SymbolIndexer
+
+VERBS = "get set load save parse render handle build make update delete create fetch resolve apply".split()
+NOUNS = "user item order config http request response cache index file path node tree model view session token".split()
+
+QUERIES = {
+    "exact": lambda r: f"{r.choice(VERBS)}{r.choice(NOUNS).capitalize()}{r.randrange(997)}",
+    "prefix": lambda r: f"{r.choice(VERBS)}{r.choice(NOUNS).capitalize()[:3]}",
+    "substring": lambda r: f"{r.choice(NOUNS).capitalize()}{r.choice(NOUNS).capitalize()}",
+    "words": lambda r: f"{r.choice(NOUNS)} {r.choice(NOUNS)[:4]}",
+    "typo": lambda r: f"{r.choice(VERBS)}{r.choice(NOUNS).capitalize()}"[:-2] + "xq",
+    "rare": lambda r: f"zz{r.randrange(1000)}",
+}
+
+
+def build(idx: SymbolIndexer, n_symbols: int, per_file: int = 20) -> None:
+    r = random.Random(7)
+    con = idx._connect()
+    batch = []
+    for f in range(n_symbols // per_file):
+        rows = []
+        for j in range(per_file):
+            name = f"{r.choice(VERBS)}{r.choice(NOUNS).capitalize()}{r.choice(NOUNS).capitalize()}{r.randrange(997)}"
+            if r.random() < 0.3:
+                name = "_".join([r.choice(VERBS), r.choice(NOUNS), str(r.randrange(997))])
+            rows.append(("function", name, j * 10 + 1, j * 10 + 8))
+        batch.append(ParsedFile(f"pkg{f // 1000}/m{f}.py", 0.0, rows, 0, 0, 0, ""))
+        if len(batch) >= 1000:
+            with con:
+                idx._write_parsed(con, batch)
+            batch = []
+    if batch:
+        with con:
+            idx._write_parsed(con, batch)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))]
+    return pick(0.5) * 1000, pick(0.99) * 1000
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Symbol search latency (p50/p99) on a synthetic index.")
+    ap.add_argument("--symbols", type=int, default=1_000_000)
+    ap.add_argument("-n", type=int, default=200, help="queries per kind")
+    ap.add_argument("--baseline", action="store_true", help="also time the old LIKE '%%q%%' scan")
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_symsearch_"))
+    try:
+        idx = SymbolIndexer(repo_root=tmp, db_path=tmp / "index.sqlite")
+        start = time.perf_counter()
+        build(idx, args.symbols)
+        print(f"indexed {args.symbols} symbols in {time.perf_counter() - start:.1f}s")
+        con = idx._connect()
+        print(f"{'query':<12} {'p50 ms':>8} {'p99 ms':>8}" + (f" {'LIKE p50':>9} {'LIKE p99':>9}" if args.baseline else ""))
+        for label, make in QUERIES.items():
+            r = random.Random(label)
+            queries = [make(r) for _ in range(args.n)]
+            samples = []
+            for q in queries:
+                t = time.perf_counter()
+                idx.search_symbols(q, limit=20)
+                samples.append(time.perf_counter() - t)
+            p50, p99 = percentiles(samples)
+            line = f"{label:<12} {p50:8.2f} {p99:8.2f}"
+            if args.baseline:
+                base = []
+                for q in queries[: max(1, args.n // 10)]:
+                    t = time.perf_counter()
+                    con.execute("SELECT file_path, kind, name, start_line, end_line FROM symbols WHERE name LIKE ? LIMIT 20", (f"%{q}%",)).fetchall()
+                    base.append(time.perf_counter() - t)
+                b50, b99 = percentiles(base)
+                line += f" {b50:9.2f} {b99:9.2f}"
+            print(line)
+        idx.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
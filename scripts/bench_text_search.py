@@ -0,0 +1,77 @@
+from __future__ import annotations
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from indexer.indexer import SymbolIndexer
+
+TEMPLATE = '''import os
+from pkg{a}.mod{b} import helper_{c}
+
+
+class Model{i}:
+    def load(self, path):
+        return helper_{c}(os.path.join(path, "m{i}"))
+
+    def save_{i}(self, data):
+        return data or {{"id": {i}}}
+'''
+
+QUERIES = ["helper_123", r"def save_\d+", r"class Model4\d\b", "os.path.join", "no_such_symbol_anywhere"]
+
+
+def make_repo(root: Path, n_files: int, with_docs: bool = False) -> None:
+    r = random.Random(3)
+    for i in range(n_files):
+        d = root / f"pkg{i // 500}" / f"mod{(i // 50) % 10}"
+        d.mkdir(parents=True, exist_ok=True)
+        (d / f"f{i}.py").write_text(TEMPLATE.format(i=i, a=r.randrange(20), b=r.randrange(10), c=r.randrange(n_files)))
+        if with_docs and i % 50 == 0:
+            (d / "README.md").write_text(f"# mod{(i // 50) % 10}\n\nSee Model{i}.load and helper_{i}.\n")
+
+
+def p50(fn, n: int) -> float:
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Indexed text search vs one rg subprocess per query.")
+    ap.add_argument("--files", type=int, default=20000)
+    ap.add_argument("--docs", action="store_true", help="add a README.md per directory (non-indexed files)")
+    ap.add_argument("-n", type=int, default=20)
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench_text_"))
+    try:
+        make_repo(root, args.files, args.docs)
+        idx = SymbolIndexer(repo_root=root, db_path=root / ".agent" / "index.sqlite")
+        start = time.perf_counter()
+        idx.index_all()
+        print(f"indexed {args.files} files in {time.perf_counter() - start:.1f}s")
+        have_rg = shutil.which("rg") is not None
+        print(f"{'pattern':<26} {'index ms':>9} {'+fallbk ms':>10}" + (f" {'rg ms':>9}" if have_rg else "  (rg not installed)"))
+        for q in QUERIES:
+            line = f"{q:<26} {p50(lambda: idx.search_text(q, max_results=20, fallback=False), args.n):9.2f}"
+            # What _build_context runs: default fallback, rg over non-indexed files only.
+            line += f" {p50(lambda: idx.search_text(q, max_results=20), args.n):10.2f}"
+            if have_rg:
+                line += f" {p50(lambda: idx.rg_search(q, max_results=20), args.n):9.2f}"
+            print(line)
+        idx.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from indexer.vectors import VectorStore
+
+
+def clustered(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    # Code embeddings cluster by topic; uniform random vectors would understate IVF recall.
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    x = centers[rng.integers(0, clusters, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="IVF recall and latency against exact search on synthetic embeddings.")
+    ap.add_argument("--vectors", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--clusters", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=10)
+    args = ap.parse_args()
+
+    data = clustered(args.vectors + args.queries, args.dim, args.clusters)
+    data, queries = data[: args.vectors], data[args.vectors:]
+    root = Path(tempfile.mkdtemp(prefix="bench_vectors_"))
+    try:
+        store = VectorStore(root, args.dim)
+        start = time.perf_counter()
+        for i in range(0, args.vectors, 1024):
+            store.upsert([((f"f{j}.py", 1, 60), f"d{j}", data[j]) for j in range(i, min(i + 1024, args.vectors))])
+        print(f"insert {args.vectors} x {args.dim}    {time.perf_counter() - start:8.2f}s")
+
+        exact = []
+        start = time.perf_counter()
+        for q in queries:
+            exact.append({f"f{j}.py" for j in np.argsort(-(data @ q))[: args.k]})
+        print(f"exact numpy (float32)      {(time.perf_counter() - start) * 1000 / len(queries):8.2f} ms/query")
+        start = time.perf_counter()
+        for q in queries:
+            store.search(q, k=args.k)
+        print(f"exact store (float16)      {(time.perf_counter() - start) * 1000 / len(queries):8.2f} ms/query")
+
+        start = time.perf_counter()
+        store.maybe_train(force=True)
+        print(f"train IVF ({len(store._centroids)} lists)    {time.perf_counter() - start:8.2f}s")
+        for nprobe in (1, 4, 8, 16, 32):
+            found = 0
+            start = time.perf_counter()
+            for q, truth in zip(queries, exact):
+                found += len(truth & {key[0] for key, _ in store.search(q, k=args.k, nprobe=nprobe)})
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            print(f"ivf nprobe={nprobe:<3}              {ms:8.2f} ms/query  recall@{args.k}={found / (len(queries) * args.k):.3f}")
+        store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
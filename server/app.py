@@ -9,17 +9,20 @@ import re
 import uuid
 import json
 import time
-import sqlite3
 import shutil
-import hashlib
 import threading
+import queue
 import yaml
+from contextlib import contextmanager
+
+from agent.llm_stats import collect_llm_stats, StreamMeter
 
 class TraceSpan:
     def __init__(self, name: str) -> None:
         self.name = name
         self.start = time.perf_counter()
         self.end = None
+        self.meta: dict = {}
 
     def finish(self) -> None:
         self.end = time.perf_counter()
@@ -40,18 +43,45 @@ class TraceContext:
         self.spans.append(s)
         return s
 
+    def record(self, name: str, ms: float, meta: dict | None = None) -> TraceSpan:
+        # Adds a span timed elsewhere (e.g. on a worker thread).
+        s = TraceSpan(name)
+        s.end = s.start + ms / 1000.0
+        s.meta.update(meta or {})
+        self.spans.append(s)
+        return s
+
+    @contextmanager
+    def llm_span(self, name: str):
+        # Span that also records LLM usage (tokens, KV prefix hits) made while it is open.
+        s = self.span(name)
+        with collect_llm_stats() as stats:
+            try:
+                yield s
+            finally:
+                if stats["llm_calls"]:
+                    s.meta.update(stats)
+                s.finish()
+
     def to_dict(self) -> dict:
         return {
             "trace_id": self.id,
             "spans": [
-                {"name": s.name, "ms": round(s.ms(), 2)}
+                {"name": s.name, "ms": round(s.ms(), 2), **s.meta}
                 for s in self.spans
                 if s.end is not None
             ],
         }
 
     def log(self, prefix: str) -> None:
-        parts = [f"{s.name}={s.ms():.2f}ms" for s in self.spans if s.end is not None]
+        parts = []
+        for s in self.spans:
+            if s.end is None:
+                continue
+            part = f"{s.name}={s.ms():.2f}ms"
+            if s.meta.get("prefix_hit_tokens"):
+                part += f" (prefix_hit={s.meta['prefix_hit_tokens']}/{s.meta.get('prompt_tokens', 0)} tok)"
+            parts.append(part)
         print(f"[trace {self.id}] {prefix}: " + ", ".join(parts))
 
 from agent.config import load_config
@@ -60,19 +90,27 @@ from agent.info_pipeline import generate_info_answer, generate_info_answer_from_
 from agent.state import AgentSession, AgentState
 from agent.pipeline import propose_patch, revise_pending_patch
 from agent.llm_router import chat as llm_chat, chat_with_images, backend_for_role
-from agent.model_registry import list_models, set_selected
+from agent.model_registry import list_models, set_selected, invalidate_model_cache
 from agent.context_ingest import ingest_and_store
+from agent.model_pool import configure_model_pool, get_model_pool
+from agent.http_client import configure_http_pool, get_http_pool
+from rlm_wrap.session import configure_rlm_sessions, get_rlm_sessions
+from agent.llm_runtime import LlamaEmbeddingRuntime, configure_kv_cache, find_gguf_model
 from rlm_wrap.store import RLMVarStore
 from agent.state_store import AgentStateStore
 from indexer.dep_graph import DependencyGraph
 from indexer.repo_map import RepoMapBuilder
+from indexer import vectors
+from indexer.vectors import EmbeddingIndex, hybrid_search
+from server.jobs import Job, JobRunner, PreImageLog, capture_images
 from server.tasks import TaskQueue, TaskWorker
 from rlm_wrap.context import reset_context, build_minimal_meta
 from mcp.registry import MCPRegistry
 from mcp.policy import load_policy, load_state, save_state
 from vcs.snapshot_cache import SnapshotCache
-from patcher.staging import StagingArea
-from indexer.indexer import SymbolIndexer
+from patcher.staging import StagingArea, diff_paths
+from indexer.indexer import EXCLUDE_DIRS, SUPPORTED, SymbolIndexer
+from indexer.watcher import ChangeBatch, ChangeQueue, start_watcher
 
 APP_ROOT = Path(__file__).resolve().parents[1]
 CONFIG_PATH = APP_ROOT / "configs" / "config.yaml"
@@ -111,6 +149,11 @@ class PatchRequest(BaseModel):
 class ApproveRequest(BaseModel):
     unified_diff: str
     message: str | None = None
+    wait: bool = False  # block until the snapshot is written, as before jobs
+
+class JobWaitRequest(BaseModel):
+    job_id: str
+    timeout_s: float = 30.0
 
 class ModelSelectRequest(BaseModel):
     role: str
@@ -167,13 +210,26 @@ class TaskLogsRequest(BaseModel):
     after: float | None = None
 
 app = FastAPI(title="Local Code Agent (MVP)")
-CONFIG = load_config(CONFIG_PATH)
-if not CONFIG.paths.models_dir.is_absolute():
-    CONFIG.paths.models_dir = (APP_ROOT / CONFIG.paths.models_dir).resolve()
-if not CONFIG.paths.index_dir.is_absolute():
-    CONFIG.paths.index_dir = (APP_ROOT / CONFIG.paths.index_dir).resolve()
-if not CONFIG.paths.staging_dir.is_absolute():
-    CONFIG.paths.staging_dir = (APP_ROOT / CONFIG.paths.staging_dir).resolve()
+
+
+def _load_runtime_config():
+    # Loads config.yaml with paths resolved against APP_ROOT and applies the
+    # process-wide runtime settings; used at import and on config changes.
+    cfg = load_config(CONFIG_PATH)
+    if not cfg.paths.models_dir.is_absolute():
+        cfg.paths.models_dir = (APP_ROOT / cfg.paths.models_dir).resolve()
+    if not cfg.paths.index_dir.is_absolute():
+        cfg.paths.index_dir = (APP_ROOT / cfg.paths.index_dir).resolve()
+    if not cfg.paths.staging_dir.is_absolute():
+        cfg.paths.staging_dir = (APP_ROOT / cfg.paths.staging_dir).resolve()
+    configure_model_pool(cfg.runtime)
+    configure_http_pool(cfg.runtime)
+    configure_rlm_sessions(cfg.runtime)
+    configure_kv_cache(cfg.runtime, cfg.paths.models_dir / ".kv_cache")
+    return cfg
+
+
+CONFIG = _load_runtime_config()
 
 MCP_CONFIG_PATH = APP_ROOT / "configs" / "mcp.yaml"
 MCP_REGISTRY = MCPRegistry(MCP_CONFIG_PATH)
@@ -192,15 +248,21 @@ STATE = {
     "session_id": None,
     "state_store": None,
     "dep_graph": None,
+    "embeddings": None,
     "task_queue": None,
     "task_worker": None,
+    "jobs": JobRunner(),
+    "pre_images": PreImageLog(),
     "suggest_next_steps": True,
     "index_status": {"in_progress": False, "last_run_ts": 0.0, "last_duration_ms": 0.0, "last_error": ""},
     "index_events": [],
     "index_event_id": 0,
     "index_thread": None,
+    "index_queue": None,
+    "index_watcher": None,
     "index_lock": threading.Lock(),
     "index_sig": "",
+    "symbol_centrality": (None, {}),
     "requested_repo_root": "",
     "repo_root_stateless": False,
 }
@@ -278,48 +340,119 @@ def _update_index_sig() -> None:
         pass
 
 
-def _start_indexer_thread(interval: int = 10) -> None:
+def _stop_index_watcher() -> None:
+    if STATE.get("index_watcher") is not None:
+        STATE["index_watcher"].stop()
+        STATE["index_watcher"] = None
+    if STATE.get("index_queue") is not None:
+        STATE["index_queue"].close()
+        STATE["index_queue"] = None
+
+
+def _start_index_watcher(repo: Path) -> None:
+    _stop_index_watcher()
+    rt = CONFIG.runtime
+    q = ChangeQueue(debounce_s=max(0, rt.index_debounce_ms) / 1000.0)
+    STATE["index_queue"] = q
+    try:
+        STATE["index_watcher"] = start_watcher(
+            repo, q, EXCLUDE_DIRS, SUPPORTED.keys(),
+            use_gitignore=rt.index_respect_gitignore,
+            mode=rt.index_watch_mode,
+            poll_interval_s=rt.index_poll_interval_s,
+        )
+    except Exception as exc:
+        STATE["index_watcher"] = None
+        _record_index_event(f"Index watcher error: {exc}")
+
+
+def _apply_index_batch(batch: ChangeBatch) -> None:
+    lock: threading.Lock = STATE["index_lock"]
+    with lock:
+        indexer = STATE.get("indexer")
+        if indexer is None:
+            return
+        STATE["index_status"]["in_progress"] = True
+        start = time.perf_counter()
+        changed: list[str] | None = []
+        try:
+            if batch.rescan:
+                indexer.index_incremental()
+                changed = None
+            else:
+                changed = indexer.index_paths(batch.paths)
+            if changed is None or changed:
+                _record_index_event("Updating repo map…")
+                _build_repo_map()
+                _record_index_event("Index updated.")
+            STATE["index_status"]["last_error"] = ""
+        except Exception as exc:
+            STATE["index_status"]["last_error"] = str(exc)
+            _record_index_event(f"Index error: {exc}")
+        finally:
+            STATE["index_status"]["last_run_ts"] = time.time()
+            STATE["index_status"]["last_duration_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+            STATE["index_status"]["last_event_lag_ms"] = round((time.time() - batch.first_ts) * 1000.0, 2)
+            STATE["index_status"]["in_progress"] = False
+    _sync_embeddings(None if batch.rescan else changed)
+
+
+def _make_embedding_index(repo: Path) -> EmbeddingIndex | None:
+    rt = CONFIG.runtime
+    if not rt.embeddings:
+        return None
+    if not vectors.available():
+        _record_index_event("Embeddings disabled: numpy is not installed.")
+        return None
+    try:
+        model_path = find_gguf_model(CONFIG.paths.models_dir / rt.embedding_model_dir, rt.embedding_filename_hint)
+    except FileNotFoundError as exc:
+        _record_index_event(f"Embeddings disabled: {exc}")
+        return None
+    index = EmbeddingIndex(
+        repo / ".agent" / "vectors",
+        LlamaEmbeddingRuntime(model_path=model_path).embed,
+        batch_size=rt.embedding_batch_size,
+        nprobe=rt.embedding_nprobe,
+    )
+    index.open_existing()
+    return index
+
+
+def _sync_embeddings(changed: list[str] | None) -> None:
+    # Runs outside the index lock: embedding is far slower than parsing.
+    embeddings: EmbeddingIndex | None = STATE.get("embeddings")
+    indexer = STATE.get("indexer")
+    if embeddings is None or indexer is None or changed == []:
+        return
+    try:
+        stats = embeddings.sync(indexer.chunk_rows(changed), paths=changed)
+        if stats.get("embedded") or stats.get("removed"):
+            _record_index_event(f"Embeddings updated: {stats.get('embedded', 0)} embedded, {stats.get('removed', 0)} removed.")
+    except Exception as exc:
+        STATE["index_status"]["last_error"] = str(exc)
+        _record_index_event(f"Embedding error: {exc}")
+
+
+def _start_indexer_thread() -> None:
+    # Applies batches from the watcher's queue; idle while nothing changes.
     t = STATE.get("index_thread")
     if t is not None and getattr(t, "is_alive", lambda: False)():
         return
 
     def loop() -> None:
         while True:
-            time.sleep(interval)
-            repo_root = STATE.get("repo_root")
-            if not repo_root or ".agent_stateless" in str(repo_root):
-                continue
-            if STATE.get("indexer") is None:
+            q: ChangeQueue | None = STATE.get("index_queue")
+            if q is None:
+                time.sleep(0.5)
                 continue
-            if STATE["index_status"]["in_progress"]:
+            batch = q.get_batch(timeout=1.0)
+            if batch is None:
                 continue
-            lock: threading.Lock = STATE["index_lock"]
-            acquired = lock.acquire(blocking=False)
-            if not acquired:
+            repo_root = STATE.get("repo_root")
+            if not repo_root or ".agent_stateless" in str(repo_root):
                 continue
-            STATE["index_status"]["in_progress"] = True
-            start = time.perf_counter()
-            _record_index_event("Indexing workspace…")
-            try:
-                STATE["indexer"].index_incremental()
-                sig = _repo_signature(STATE["indexer"])
-                changed = sig != (STATE.get("index_sig") or "")
-                STATE["index_sig"] = sig
-                if changed:
-                    _record_index_event("Updating repo map…")
-                    _build_repo_map(full=False)
-                    _record_index_event("Index updated.")
-                else:
-                    _record_index_event("Index up to date.")
-                STATE["index_status"]["last_error"] = ""
-            except Exception as exc:
-                STATE["index_status"]["last_error"] = str(exc)
-                _record_index_event(f"Index error: {exc}")
-            finally:
-                STATE["index_status"]["last_run_ts"] = time.time()
-                STATE["index_status"]["last_duration_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
-                STATE["index_status"]["in_progress"] = False
-                lock.release()
+            _apply_index_batch(batch)
 
     thread = threading.Thread(target=loop, daemon=True)
     STATE["index_thread"] = thread
@@ -331,7 +464,129 @@ def _stream_text(event: str, text: str, chunk: int = 800):
         yield _sse_event(event, text[i:i + chunk])
 
 
-def _handle_query(req: QueryRequest, trace: TraceContext) -> dict:
+class _StreamCancelled(Exception):
+    """Raised from on_delta once the SSE client has gone away."""
+
+
+def _stream_llm(trace: TraceContext, name: str, meter: StreamMeter, fn):
+    # Runs fn(on_delta) on a worker thread and yields ("delta", text) as tokens
+    # arrive, then ("result", value). Errors from fn are re-raised here.
+    q: queue.Queue = queue.Queue()
+    cancel = threading.Event()
+    span = trace.span(name)
+
+    def on_delta(text: str) -> None:
+        # Unwinds fn so the model stream closes and frees its pooled model.
+        if cancel.is_set():
+            raise _StreamCancelled()
+        q.put(("delta", text))
+
+    def run() -> None:
+        with collect_llm_stats() as stats:
+            try:
+                item = ("result", fn(on_delta))
+            except Exception as exc:
+                item = ("error", exc)
+        if stats["llm_calls"]:
+            span.meta.update(stats)
+        q.put(item)
+
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while True:
+            kind, value = q.get()
+            if kind == "delta":
+                meter.tick(value)
+                yield kind, value
+                continue
+            span.meta.update(meter.to_dict())
+            span.finish()
+            if kind == "error":
+                raise value
+            yield kind, value
+            return
+    finally:
+        # Closed early when the client disconnects; stop generating at the next token.
+        cancel.set()
+
+
+def _record_file_spans(trace: TraceContext, proposal) -> None:
+    for fs in getattr(proposal, "file_spans", None) or []:
+        meta = {k: v for k, v in fs.items() if k != "ms"}
+        trace.record("llm_propose_file", fs.get("ms", 0.0), meta)
+
+
+class _MarkerFilter:
+    # Drops <CONTINUE>/<END> from a token stream; a marker may be split across deltas.
+    MARKERS = ("<CONTINUE>", "<END>")
+
+    def __init__(self, emit) -> None:
+        self.emit = emit
+        self.buf = ""
+
+    def feed(self, text: str) -> None:
+        self.buf += text
+        for m in self.MARKERS:
+            self.buf = self.buf.replace(m, "")
+        keep = 0
+        for m in self.MARKERS:
+            for n in range(min(len(m) - 1, len(self.buf)), 0, -1):
+                if self.buf.endswith(m[:n]):
+                    keep = max(keep, n)
+                    break
+        out = self.buf[: len(self.buf) - keep]
+        self.buf = self.buf[len(self.buf) - keep:]
+        if out:
+            self.emit(out)
+
+    def flush(self) -> None:
+        if self.buf:
+            self.emit(self.buf)
+            self.buf = ""
+
+
+def _prepare_info_context(req: QueryRequest, user_text: str, trace: TraceContext) -> tuple[dict | None, dict | None, str | None]:
+    # Returns (context, facts, fixed_answer); context is None when no LLM call is needed.
+    workspace_ctx = req.workspace_context
+    if workspace_ctx:
+        files = workspace_ctx.get("files") or []
+        facts = {
+            "files_read": len(files),
+            "context_bytes": sum([len((f.get("content") or "")) for f in files]),
+            "chunks_retrieved": 0,
+            "backend": backend_for_role("reasoner", CONFIG),
+        }
+        return workspace_ctx, facts, None
+    repo_root = str(STATE["repo_root"])
+    if ".agent_stateless" in repo_root:
+        return None, None, (
+            "No workspace context received. The server cannot access your local VS Code files. "
+            "Enable 'sendContextBundle' or init with a real repo_root inside the VM."
+        )
+    span = trace.span("index_refresh")
+    STATE["indexer"].index_incremental()
+    span.finish()
+    span = trace.span("repomap_refresh")
+    _build_repo_map()
+    span.finish()
+    span = trace.span("context_bundle")
+    repo_ctx, stats = _build_repo_context_bundle(user_text, Path(STATE["repo_root"]), STATE["indexer"])
+    span.finish()
+    facts = {
+        "files_read": stats.get("files_read", 0),
+        "files_considered": stats.get("files_considered", 0),
+        "context_bytes": stats.get("context_bytes", 0),
+        "chunks_retrieved": stats.get("chunks_retrieved", 0),
+        "retrieval_ms": stats.get("retrieval_ms", 0.0),
+        "retrieval_chunks": stats.get("retrieval_chunks", 0),
+        "retrieval_hits": stats.get("retrieval_hits", 0),
+        "chunks_indexed": stats.get("chunks_indexed", 0),
+        "backend": backend_for_role("reasoner", CONFIG),
+    }
+    return repo_ctx, facts, None
+
+
+def _handle_query(req: QueryRequest, trace: TraceContext, stream_info: bool = False) -> dict:
     if STATE["repo_root"] is None:
         raise HTTPException(400, "init first")
     images = req.images or []
@@ -357,23 +612,21 @@ def _handle_query(req: QueryRequest, trace: TraceContext) -> dict:
         }
     if images:
         try:
-            span = trace.span("vlm_analyze")
-            analysis = chat_with_images("vlm", [
-                {"role": "system", "content": "You are a vision assistant. Describe the image(s) concisely and accurately."},
-                {"role": "user", "content": user_text},
-            ], images, CONFIG, Path(STATE["repo_root"]), CONFIG_PATH)
-            span.finish()
+            with trace.llm_span("vlm_analyze"):
+                analysis = chat_with_images("vlm", [
+                    {"role": "system", "content": "You are a vision assistant. Describe the image(s) concisely and accurately."},
+                    {"role": "user", "content": user_text},
+                ], images, CONFIG, Path(STATE["repo_root"]), CONFIG_PATH)
             if analysis:
                 refine_prompt = (
                     "Given the user request and image analysis, rewrite a refined, specific instruction for the planner. "
                     "Keep it short and concrete, include any critical visual details. Return only the refined instruction."
                 )
-                span = trace.span("refine_prompt")
-                refined = llm_chat("reasoner", [
-                    {"role": "system", "content": "You refine requests for planning."},
-                    {"role": "user", "content": f"User request:\n{user_text}\n\nImage analysis:\n{analysis}\n\n{refine_prompt}"},
-                ], CONFIG, Path(STATE["repo_root"]), CONFIG_PATH)
-                span.finish()
+                with trace.llm_span("refine_prompt"):
+                    refined = llm_chat("reasoner", [
+                        {"role": "system", "content": "You refine requests for planning."},
+                        {"role": "user", "content": f"User request:\n{user_text}\n\nImage analysis:\n{analysis}\n\n{refine_prompt}"},
+                    ], CONFIG, Path(STATE["repo_root"]), CONFIG_PATH)
                 user_text = refined.strip() or f"{user_text}\n\n[Image Analysis]\n{analysis}"
         except Exception as exc:
             user_text = f"{user_text}\n\n[Image Analysis Error]\n{exc}"
@@ -392,64 +645,33 @@ def _handle_query(req: QueryRequest, trace: TraceContext) -> dict:
     plan = result.plan
     if result.state == "READY" and result.intent not in ("INFO",):
         try:
-            span = trace.span("llm_plan")
-            plan = _generate_plan_llm(user_text)
-            span.finish()
+            with trace.llm_span("llm_plan"):
+                plan = _generate_plan_llm(user_text)
         except Exception:
             plan = result.plan
     answer = None
     facts = None
+    metrics = None
+    info_ctx = None
     if result.state == "READY" and result.intent == "INFO":
         try:
-            workspace_ctx = req.workspace_context
-            if workspace_ctx:
-                span = trace.span("info_pipeline")
-                parts, metrics = _llm_info_answer_with_continuation_and_metrics(workspace_ctx, max_parts=3)
-                span.finish()
+            info_ctx, facts, answer = _prepare_info_context(req, user_text, trace)
+            if info_ctx is not None and not stream_info:
+                with trace.llm_span("info_pipeline"):
+                    parts, metrics = _llm_info_answer_with_continuation_and_metrics(info_ctx, max_parts=3)
                 answer = "\n".join([p.replace("<CONTINUE>", "").replace("<END>", "") for p in parts]).strip()
-                files_read = len(workspace_ctx.get("files") or [])
-                bytes_read = sum([len((f.get("content") or "")) for f in (workspace_ctx.get("files") or [])])
-                facts = {
-                    "files_read": files_read,
-                    "context_bytes": bytes_read,
-                    "chunks_retrieved": metrics.get("chunks_retrieved") if metrics else 0,
-                    "backend": backend_for_role("reasoner", CONFIG),
-                }
-            else:
-                repo_root = str(STATE["repo_root"])
-                if ".agent_stateless" in repo_root:
-                    answer = (
-                        "No workspace context received. The server cannot access your local VS Code files. "
-                        "Enable 'sendContextBundle' or init with a real repo_root inside the VM."
-                    )
-                else:
-                    span = trace.span("index_refresh")
-                    STATE["indexer"].index_incremental()
-                    span.finish()
-                    span = trace.span("repomap_refresh")
-                    _build_repo_map(full=False)
-                    span.finish()
-                    span = trace.span("info_pipeline")
-                    repo_ctx, stats = _build_repo_context_bundle(user_text, Path(STATE["repo_root"]), STATE["indexer"])
-                    parts, metrics = _llm_info_answer_with_continuation_and_metrics(repo_ctx, max_parts=3)
-                    span.finish()
-                    answer = "\n".join([p.replace("<CONTINUE>", "").replace("<END>", "") for p in parts]).strip()
-                    facts = {
-                        "files_read": stats.get("files_read", 0),
-                        "files_considered": stats.get("files_considered", 0),
-                        "context_bytes": stats.get("context_bytes", 0),
-                        "chunks_retrieved": stats.get("chunks_retrieved", 0),
-                        "backend": backend_for_role("reasoner", CONFIG),
-                    }
+                if req.workspace_context:
+                    facts["chunks_retrieved"] = metrics.get("chunks_retrieved") if metrics else 0
         except Exception as exc:
+            info_ctx = None
             answer = f"Unable to generate summary: {exc}"
-    return {
+    out = {
         "state": result.state,
         "questions": result.questions,
         "plan": plan,
         "answer": answer,
         "facts": facts,
-        "metrics": locals().get("metrics"),
+        "metrics": metrics,
         "trace": trace.to_dict(),
         "use_mcp": result.use_mcp,
         "mcp_server": result.mcp_server,
@@ -457,6 +679,10 @@ def _handle_query(req: QueryRequest, trace: TraceContext) -> dict:
         "needs_confirm": result.needs_confirm,
         "confirm_token": result.confirm_token,
     }
+    if stream_info and info_ctx is not None:
+        # Generated by the caller as a token stream.
+        out["_info_ctx"] = info_ctx
+    return out
 
 
 def _context_to_text(ctx: dict) -> str:
@@ -566,13 +792,11 @@ def _load_repo_map() -> dict | None:
 
 
 def _repo_signature(indexer: SymbolIndexer) -> str:
-    indexer.init_db()
-    con = sqlite3.connect(indexer.db_path)
-    cur = con.cursor()
-    rows = cur.execute("SELECT path, mtime FROM files ORDER BY path").fetchall()
-    con.close()
-    payload = "\n".join([f"{p}:{m}" for p, m in rows])
-    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    # Generation-based: the watcher keeps the index current, so no per-query rescan.
+    return indexer.signature()
+
+
+_MENTIONED_PATH_RE = re.compile(r"[\w./-]+\.(?:py|js|ts|tsx)\b")
 
 
 def _build_repo_context_bundle(user_text: str, repo_root: Path, indexer: SymbolIndexer) -> tuple[dict, dict]:
@@ -615,60 +839,75 @@ def _build_repo_context_bundle(user_text: str, repo_root: Path, indexer: SymbolI
             files_considered += 1
             bytes_read += len(content or "")
 
-    # Entry points
-    for path in [
-        repo_root / "index.html",
-        repo_root / "src" / "main.ts",
-        repo_root / "src" / "main.tsx",
-        repo_root / "src" / "main.js",
-        repo_root / "src" / "main.jsx",
-        repo_root / "src" / "App.tsx",
-        repo_root / "src" / "App.ts",
-        repo_root / "src" / "App.jsx",
-        repo_root / "src" / "App.js",
-    ]:
-        rel = str(path.relative_to(repo_root)) if path.exists() else ""
-        if rel and rel not in seen:
-            content = _read_file_snippet(path, max_chars=8000)
+    # Files named in the request go in whole and personalize the repo map.
+    focus = [rel for rel in dict.fromkeys(_MENTIONED_PATH_RE.findall(user_text)) if (repo_root / rel).is_file()]
+    for rel in focus:
+        if rel not in seen:
+            content = _read_file_snippet(repo_root / rel, max_chars=8000)
             files.append({"path": rel, "content": content})
             seen.add(rel)
             files_considered += 1
             bytes_read += len(content or "")
+    try:
+        builder = _repo_map_builder()
+        files.append({"path": "repo_map.md", "content": builder.render(focus=focus)})
+        top_modules = builder.ranked(focus)[:12] if focus else (_load_repo_map() or {}).get("top_modules") or []
+    except Exception:
+        top_modules = (_load_repo_map() or {}).get("top_modules") or []
 
-    repo_map = _load_repo_map() or {}
-    top_modules = repo_map.get("top_modules") or []
-    for mod in top_modules[:12]:
-        path = mod.get("path")
-        if not path or path in seen:
+    # Query-aware retrieval: best BM25 chunks until the budget is spent.
+    start = time.perf_counter()
+    try:
+        hits = hybrid_search(indexer, STATE.get("embeddings"), user_text, limit=cfg.retrieval_chunks)
+    except Exception:
+        hits = []
+    retrieval_ms = round((time.perf_counter() - start) * 1000.0, 2)
+    used = sum(len(f.get("content") or "") for f in files)
+    chunks_used = 0
+    for hit in hits:
+        if hit["file"] in seen:
             continue
-        full = repo_root / path
-        if full.exists() and full.is_file():
-            content = _read_file_snippet(full, max_chars=8000)
-            files.append({"path": path, "content": content})
-            seen.add(path)
-            files_considered += 1
-            bytes_read += len(content or "")
+        text = hit["text"]
+        if used + len(text) > max_chars:
+            continue
+        files.append({"path": f"{hit['file']}:{hit['start_line']}-{hit['end_line']}", "content": text})
+        used += len(text)
+        bytes_read += len(text)
+        chunks_used += 1
+    files_considered += len(hits)
+
+    if not hits:
+        # Nothing matched the question: fall back to entry points and central modules.
+        for path in [
+            repo_root / "index.html",
+            repo_root / "src" / "main.ts",
+            repo_root / "src" / "main.tsx",
+            repo_root / "src" / "main.js",
+            repo_root / "src" / "main.jsx",
+            repo_root / "src" / "App.tsx",
+            repo_root / "src" / "App.ts",
+            repo_root / "src" / "App.jsx",
+            repo_root / "src" / "App.js",
+        ]:
+            rel = str(path.relative_to(repo_root)) if path.exists() else ""
+            if rel and rel not in seen:
+                content = _read_file_snippet(path, max_chars=8000)
+                files.append({"path": rel, "content": content})
+                seen.add(rel)
+                files_considered += 1
+                bytes_read += len(content or "")
 
-    # If still small, add a few indexed files
-    try:
-        con = sqlite3.connect(indexer.db_path)
-        cur = con.cursor()
-        rows = cur.execute("SELECT path FROM files LIMIT 40").fetchall()
-        con.close()
-        for (path,) in rows:
-            if path in seen:
+        for mod in top_modules[:12]:
+            path = mod.get("path")
+            if not path or path in seen:
                 continue
             full = repo_root / path
             if full.exists() and full.is_file():
-                content = _read_file_snippet(full, max_chars=4000)
+                content = _read_file_snippet(full, max_chars=8000)
                 files.append({"path": path, "content": content})
                 seen.add(path)
                 files_considered += 1
                 bytes_read += len(content or "")
-            if len(files) >= 25:
-                break
-    except Exception:
-        pass
 
     # Trim total chars
     total = 0
@@ -721,11 +960,15 @@ def _build_repo_context_bundle(user_text: str, repo_root: Path, indexer: SymbolI
         "context_bytes": sum([len(f.get("content") or "") for f in trimmed]),
         "bytes_read": bytes_read,
         "chunks_retrieved": chunks_retrieved,
+        "retrieval_ms": retrieval_ms,
+        "retrieval_chunks": chunks_used,
+        "retrieval_hits": len(hits),
+        "chunks_indexed": indexer.chunk_count(),
     }
     return context, stats
 
 
-def _llm_info_answer_with_continuation_and_metrics(ctx: dict, max_parts: int = 3) -> tuple[list[str], dict]:
+def _llm_info_answer_with_continuation_and_metrics(ctx: dict, max_parts: int = 3, on_delta=None) -> tuple[list[str], dict]:
     context_text = _context_to_text(ctx)
     n_ctx = CONFIG.reasoner.context or 8192
     max_input_tokens = int(n_ctx * 0.7)
@@ -751,18 +994,24 @@ def _llm_info_answer_with_continuation_and_metrics(ctx: dict, max_parts: int = 3
         f"Context:\n{context_text}"
     )
     parts: list[str] = []
+    emit = _MarkerFilter(on_delta) if on_delta else None
     raw = llm_chat("reasoner", [
         {"role": "system", "content": "You are a software project summarizer."},
         {"role": "user", "content": base_prompt},
-    ], CONFIG, Path(STATE["repo_root"]), CONFIG_PATH)
+    ], CONFIG, Path(STATE["repo_root"]), CONFIG_PATH, on_delta=emit.feed if emit else None)
     parts.append(raw)
     while len(parts) < max_parts and "<CONTINUE>" in raw and "<END>" not in raw:
+        if emit:
+            emit.flush()
+            on_delta("\n")
         raw = llm_chat("reasoner", [
             {"role": "system", "content": "Continue the previous summary. Do not repeat. End with <CONTINUE> or <END>."},
             {"role": "assistant", "content": "\n".join(parts)},
             {"role": "user", "content": "Continue."},
-        ], CONFIG, Path(STATE["repo_root"]), CONFIG_PATH)
+        ], CONFIG, Path(STATE["repo_root"]), CONFIG_PATH, on_delta=emit.feed if emit else None)
         parts.append(raw)
+    if emit:
+        emit.flush()
     output_text = "\n".join(parts)
     metrics = {
         "input_tokens": _estimate_tokens(context_text),
@@ -822,11 +1071,24 @@ def init(req: InitRequest):
             "repo_root_stateless": stateless,
             "requested_repo_root": requested_root,
         }
-    snapshots = SnapshotCache(repo_root=repo, max_snapshots=4)
-    staging = StagingArea(repo_root=repo, staging_root=repo / ".agent" / "staging")
-    indexer = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite")
+    # Deferred snapshots/reindexes of the previous repo finish before its state is dropped.
+    STATE["jobs"].wait_all()
+    snapshots = SnapshotCache(
+        repo_root=repo,
+        max_snapshots=4,
+        max_delta_chain=CONFIG.runtime.snapshot_delta_chain,
+        storage=CONFIG.runtime.snapshot_storage,
+    )
+    staging = StagingArea(repo_root=repo, staging_root=repo / ".agent" / "staging", mode=CONFIG.runtime.staging_mode)
     dep_graph = DependencyGraph(repo_root=repo, db_path=repo / ".agent" / "deps.sqlite")
-    dep_graph.init_db()
+    indexer = SymbolIndexer(
+        repo_root=repo,
+        db_path=repo / ".agent" / "index.sqlite",
+        workers=CONFIG.runtime.index_workers,
+        content_hash=CONFIG.runtime.index_content_hash,
+        use_gitignore=CONFIG.runtime.index_respect_gitignore,
+        dep_graph=dep_graph,
+    )
     if indexer.db_path.exists():
         indexer.index_incremental()
     else:
@@ -836,7 +1098,10 @@ def init(req: InitRequest):
     except Exception:
         STATE["index_sig"] = ""
 
+    if STATE.get("indexer") is not None:
+        STATE["indexer"].close()
     STATE.update(repo_root=str(repo), snapshots=snapshots, staging=staging, indexer=indexer, pending_diff=None, dep_graph=dep_graph)
+    STATE["embeddings"] = _make_embedding_index(repo)
     STATE["session"] = AgentSession(state=AgentState.IDLE)
     mcp_state = load_state(repo)
     STATE["mcp_allowed"] = bool(mcp_state.get("mcp_allowed", False))
@@ -873,7 +1138,14 @@ def init(req: InitRequest):
         worker = TaskWorker(STATE["task_queue"], _handle_task)
         worker.start()
         STATE["task_worker"] = worker
+    if stateless:
+        _stop_index_watcher()
+    else:
+        _start_index_watcher(repo)
     _start_indexer_thread()
+    if STATE.get("embeddings") is not None and STATE.get("index_queue") is not None:
+        # First sync embeds whatever changed since the last run, in the background.
+        STATE["index_queue"].request_rescan()
     return {
         "status":"ok",
         "repo_root": str(repo),
@@ -895,26 +1167,32 @@ def query(req: QueryRequest, response: Response):
 @app.post("/query_stream")
 def query_stream(req: QueryRequest):
     trace = TraceContext()
-    result = _handle_query(req, trace)
+    result = _handle_query(req, trace, stream_info=True)
+    info_ctx = result.pop("_info_ctx", None)
     max_stream = 4000
 
     def gen():
         yield _sse_event("status", "started")
-        if result.get("intent") == "INFO" and req.workspace_context and (
-            not result.get("answer") or len(result.get("answer") or "") > max_stream
-        ):
-            span = trace.span("llm_info_stream")
-            parts, metrics = _llm_info_answer_with_continuation_and_metrics(req.workspace_context, max_parts=3)
-            span.finish()
-            for part in parts:
-                clean = part.replace("<CONTINUE>", "").replace("<END>", "")
-                yield from _stream_text("answer", clean)
-            facts = {
-                "files_read": len(req.workspace_context.get("files") or []),
-                "context_bytes": sum([len((f.get("content") or "")) for f in (req.workspace_context.get("files") or [])]),
-                "chunks_retrieved": metrics.get("chunks_retrieved") if metrics else 0,
-                "backend": backend_for_role("reasoner", CONFIG),
-            }
+        if info_ctx is not None:
+            meter = StreamMeter()
+            metrics: dict = {}
+            try:
+                for kind, value in _stream_llm(
+                    trace, "llm_info_stream", meter,
+                    lambda on_delta: _llm_info_answer_with_continuation_and_metrics(info_ctx, max_parts=3, on_delta=on_delta),
+                ):
+                    if kind == "delta":
+                        yield _sse_event("answer", value)
+                    else:
+                        _, metrics = value
+            except Exception as exc:
+                yield _sse_event("error", f"Unable to generate summary: {exc}")
+                yield _sse_event("done", json.dumps(trace.to_dict()))
+                return
+            metrics.update(meter.to_dict())
+            facts = dict(result.get("facts") or {})
+            if req.workspace_context:
+                facts["chunks_retrieved"] = metrics.get("chunks_retrieved", 0)
             yield _sse_event("metrics", json.dumps(metrics))
             yield _sse_event("facts", json.dumps(facts))
         elif result.get("answer"):
@@ -936,11 +1214,11 @@ def query_stream(req: QueryRequest):
             yield from _stream_text("plan", "\n".join(f"- {p}" for p in result["plan"]))
         else:
             yield _sse_event("error", "No answer or plan was produced.")
-        yield _sse_event("done", json.dumps(result.get("trace", {})))
+        yield _sse_event("done", json.dumps(trace.to_dict()))
+        trace.log("query_stream")
 
     response = StreamingResponse(gen(), media_type="text/event-stream")
     response.headers["X-Trace-Id"] = trace.id
-    trace.log("query_stream")
     return response
 
 @app.post("/propose")
@@ -963,11 +1241,11 @@ def propose(req: ProposeRequest, response: Response):
     external_context, ingest_meta = _maybe_ingest_context(req.instruction, external_context)
     span.finish()
     try:
-        span = trace.span("llm_propose")
-        proposal = propose_patch(req.instruction, STATE["indexer"], CONFIG, external_context=external_context)
-        span.finish()
+        with trace.llm_span("llm_propose"):
+            proposal = propose_patch(req.instruction, STATE["indexer"], CONFIG, external_context=external_context, dep_graph=STATE.get("dep_graph"), embeddings=STATE.get("embeddings"))
     except Exception as exc:
         raise HTTPException(400, f"propose failed: {exc}")
+    _record_file_spans(trace, proposal)
     STATE["pending_diff"] = proposal.diff
     STATE["pending_summary"] = proposal.summary
     STATE["pending_risk"] = proposal.risk_notes
@@ -1009,31 +1287,45 @@ def propose_stream(req: ProposeRequest):
     span = trace.span("context_ingest")
     external_context, ingest_meta = _maybe_ingest_context(req.instruction, external_context)
     span.finish()
-    try:
-        span = trace.span("llm_propose")
-        proposal = propose_patch(req.instruction, STATE["indexer"], CONFIG, external_context=external_context)
-        span.finish()
-    except Exception as exc:
-        raise HTTPException(400, f"propose failed: {exc}")
-    STATE["pending_diff"] = proposal.diff
-    STATE["pending_summary"] = proposal.summary
-    STATE["pending_risk"] = proposal.risk_notes
-    if STATE.get("state_store"):
-        STATE["state_store"].write_pending_patch({
-            "diff": proposal.diff,
-            "summary": proposal.summary,
-            "risk": proposal.risk_notes,
-        })
-    touched = _touched_files(proposal.diff)
+    indexer = STATE["indexer"]
+    dep_graph = STATE.get("dep_graph")
+    embeddings = STATE.get("embeddings")
 
     def gen():
         yield _sse_event("status", "started")
+        meter = StreamMeter()
+        proposal = None
+        try:
+            for kind, value in _stream_llm(
+                trace, "llm_propose", meter,
+                lambda on_delta: propose_patch(req.instruction, indexer, CONFIG, external_context=external_context, on_delta=on_delta, dep_graph=dep_graph, embeddings=embeddings),
+            ):
+                if kind == "delta":
+                    yield _sse_event("draft", value)
+                else:
+                    proposal = value
+        except Exception as exc:
+            yield _sse_event("error", f"propose failed: {exc}")
+            yield _sse_event("done", "")
+            return
+        _record_file_spans(trace, proposal)
+        STATE["pending_diff"] = proposal.diff
+        STATE["pending_summary"] = proposal.summary
+        STATE["pending_risk"] = proposal.risk_notes
+        if STATE.get("state_store"):
+            STATE["state_store"].write_pending_patch({
+                "diff": proposal.diff,
+                "summary": proposal.summary,
+                "risk": proposal.risk_notes,
+            })
+        touched = _touched_files(proposal.diff)
         if proposal.summary:
             yield _sse_event("summary", proposal.summary)
         if proposal.risk_notes:
             yield _sse_event("risk", proposal.risk_notes)
         for i in range(0, len(proposal.diff), 800):
             yield _sse_event("diff", proposal.diff[i:i + 800])
+        yield _sse_event("metrics", json.dumps(meter.to_dict()))
         yield _sse_event("meta", json.dumps({
             "touched_files": touched,
             "mcp": mcp_meta,
@@ -1041,10 +1333,10 @@ def propose_stream(req: ProposeRequest):
             "trace": trace.to_dict(),
         }))
         yield _sse_event("done", "")
+        trace.log("propose_stream")
 
     response = StreamingResponse(gen(), media_type="text/event-stream")
     response.headers["X-Trace-Id"] = trace.id
-    trace.log("propose_stream")
     return response
 
 @app.get("/pending")
@@ -1069,7 +1361,7 @@ def revise_pending(req: ReviseRequest):
     external_context.extend(mcp_context)
     external_context, ingest_meta = _maybe_ingest_context(req.instruction, external_context)
     try:
-        proposal = revise_pending_patch(req.instruction, STATE["pending_diff"], STATE["indexer"], CONFIG, external_context=external_context)
+        proposal = revise_pending_patch(req.instruction, STATE["pending_diff"], STATE["indexer"], CONFIG, external_context=external_context, dep_graph=STATE.get("dep_graph"), embeddings=STATE.get("embeddings"))
     except Exception as exc:
         raise HTTPException(400, f"revise failed: {exc}")
     STATE["pending_diff"] = proposal.diff
@@ -1111,31 +1403,45 @@ def revise_pending_stream(req: ReviseRequest):
     span = trace.span("context_ingest")
     external_context, ingest_meta = _maybe_ingest_context(req.instruction, external_context)
     span.finish()
-    try:
-        span = trace.span("llm_revise")
-        proposal = revise_pending_patch(req.instruction, STATE["pending_diff"], STATE["indexer"], CONFIG, external_context=external_context)
-        span.finish()
-    except Exception as exc:
-        raise HTTPException(400, f"revise failed: {exc}")
-    STATE["pending_diff"] = proposal.diff
-    STATE["pending_summary"] = proposal.summary
-    STATE["pending_risk"] = proposal.risk_notes
-    if STATE.get("state_store"):
-        STATE["state_store"].write_pending_patch({
-            "diff": proposal.diff,
-            "summary": proposal.summary,
-            "risk": proposal.risk_notes,
-        })
-    touched = _touched_files(proposal.diff)
+    indexer = STATE["indexer"]
+    pending_diff = STATE["pending_diff"]
+    dep_graph = STATE.get("dep_graph")
+    embeddings = STATE.get("embeddings")
 
     def gen():
         yield _sse_event("status", "started")
+        meter = StreamMeter()
+        proposal = None
+        try:
+            for kind, value in _stream_llm(
+                trace, "llm_revise", meter,
+                lambda on_delta: revise_pending_patch(req.instruction, pending_diff, indexer, CONFIG, external_context=external_context, on_delta=on_delta, dep_graph=dep_graph, embeddings=embeddings),
+            ):
+                if kind == "delta":
+                    yield _sse_event("draft", value)
+                else:
+                    proposal = value
+        except Exception as exc:
+            yield _sse_event("error", f"revise failed: {exc}")
+            yield _sse_event("done", "")
+            return
+        STATE["pending_diff"] = proposal.diff
+        STATE["pending_summary"] = proposal.summary
+        STATE["pending_risk"] = proposal.risk_notes
+        if STATE.get("state_store"):
+            STATE["state_store"].write_pending_patch({
+                "diff": proposal.diff,
+                "summary": proposal.summary,
+                "risk": proposal.risk_notes,
+            })
+        touched = _touched_files(proposal.diff)
         if proposal.summary:
             yield _sse_event("summary", proposal.summary)
         if proposal.risk_notes:
             yield _sse_event("risk", proposal.risk_notes)
         for i in range(0, len(proposal.diff), 800):
             yield _sse_event("diff", proposal.diff[i:i + 800])
+        yield _sse_event("metrics", json.dumps(meter.to_dict()))
         yield _sse_event("meta", json.dumps({
             "touched_files": touched,
             "mcp": mcp_meta,
@@ -1143,10 +1449,10 @@ def revise_pending_stream(req: ReviseRequest):
             "trace": trace.to_dict(),
         }))
         yield _sse_event("done", "")
+        trace.log("revise_pending_stream")
 
     response = StreamingResponse(gen(), media_type="text/event-stream")
     response.headers["X-Trace-Id"] = trace.id
-    trace.log("revise_pending_stream")
     return response
 
 @app.post("/apply_to_staging")
@@ -1371,42 +1677,29 @@ def _ensure_repo_map() -> None:
     branch = store.get_active_branch()
     repo_map_path = store.branch_root(branch) / "repo_map" / "repo_map.json"
     if not repo_map_path.exists():
-        _build_repo_map(full=True)
+        _build_repo_map()
 
 
 def _build_repo_map(full: bool = False) -> None:
-    repo_root = Path(STATE["repo_root"])
-    dep_graph: DependencyGraph = STATE["dep_graph"]
+    # The indexer records imports as it parses, so deps.sqlite is already
+    # current; `full` reparses everything first.
+    if full:
+        with STATE["index_lock"]:
+            STATE["indexer"].index_all()
     store: AgentStateStore = STATE["state_store"]
     repo_map_dir = store.branch_root(store.get_active_branch()) / "repo_map"
-    cache_path = repo_map_dir / "cache.json"
-    if full:
-        for p in repo_root.rglob("*"):
-            if p.is_file() and p.suffix in (".py", ".js", ".ts", ".tsx"):
-                dep_graph.update_file(p)
-        cache = {}
-    else:
-        cache = {}
-        if cache_path.exists():
-            try:
-                cache = json.loads(cache_path.read_text())
-            except Exception:
-                cache = {}
-        con = sqlite3.connect(STATE["indexer"].db_path)
-        cur = con.cursor()
-        rows = cur.execute("SELECT path, mtime FROM files").fetchall()
-        con.close()
-        for rel, mtime in rows:
-            prev = cache.get(rel)
-            if prev is None or float(prev) != float(mtime):
-                p = repo_root / rel
-                if p.exists():
-                    dep_graph.update_file(p)
-            cache[rel] = float(mtime)
-    repo_map_dir.mkdir(parents=True, exist_ok=True)
-    cache_path.write_text(json.dumps(cache, indent=2))
-    builder = RepoMapBuilder(repo_root=repo_root, index_db=STATE["indexer"].db_path, dep_db=dep_graph.db_path)
-    builder.build(repo_map_dir)
+    _repo_map_builder().build(repo_map_dir)
+
+
+def _repo_map_builder() -> RepoMapBuilder:
+    dep_graph: DependencyGraph = STATE["dep_graph"]
+    return RepoMapBuilder(
+        repo_root=Path(STATE["repo_root"]),
+        index_db=STATE["indexer"].db_path,
+        dep_db=dep_graph.db_path,
+        token_budget=CONFIG.runtime.repo_map_tokens,
+        dep_graph=dep_graph,
+    )
 
 
 def _handle_task(task: dict) -> dict:
@@ -1426,8 +1719,64 @@ def _handle_task(task: dict) -> dict:
         return revise_pending(req)
     return {"ok": False, "error": f"unknown task type: {t}"}
 
-@app.post("/approve")
-def _apply_approve(unified_diff: str, message: str | None) -> dict:
+def _queue_after_approve(message: str, paths: list[str], seq: int) -> list[Job]:
+    # The patch is on disk; recording and reindexing it happen off the request path.
+    snapshots: SnapshotCache = STATE["snapshots"]
+    pre_images: PreImageLog = STATE["pre_images"]
+    state_store = STATE.get("state_store")
+    indexer = STATE["indexer"]
+    repo = Path(STATE["repo_root"])
+
+    def snapshot_job() -> dict:
+        try:
+            if state_store:
+                try:
+                    state_store.snapshot(snapshots.get_head(), message="approved")
+                except Exception:
+                    pass
+            # Later approvals may already have touched these files; their pre-images stand in.
+            meta = snapshots.snapshot(message=message, paths=paths, overlay=pre_images.after(seq))
+        finally:
+            pre_images.discard(seq)
+        minimal = build_minimal_meta(
+            repo_root=repo,
+            head=snapshots.get_head(),
+            model_cfg={"reasoner": CONFIG.reasoner.__dict__, "coder": CONFIG.coder.__dict__, "vlm": CONFIG.vlm.__dict__},
+            index_path=indexer.db_path,
+        )
+        reset_context(repo, minimal)
+        return {"snapshot": meta.__dict__}
+
+    def reindex_job() -> dict:
+        _apply_index_batch(ChangeBatch(paths=paths, rescan=False, first_ts=time.time()))
+        _update_index_sig()
+        return {"error": STATE["index_status"].get("last_error", "")}
+
+    jobs: JobRunner = STATE["jobs"]
+    return [
+        jobs.submit("snapshot", snapshot_job, message=message, paths=paths),
+        jobs.submit("reindex", reindex_job, paths=paths),
+    ]
+
+
+def _approve_result(jobs: list[Job], wait: bool) -> dict:
+    snap_job = jobs[0]
+    if wait:
+        for job in jobs:
+            STATE["jobs"].wait(job.id)
+        if snap_job.status == "error":
+            raise HTTPException(500, f"snapshot failed: {snap_job.error}")
+        snapshot = snap_job.result["snapshot"]
+    else:
+        snapshot = {"pending": True, "job_id": snap_job.id, "message": snap_job.info.get("message", "")}
+    return {
+        "snapshot": snapshot,
+        "jobs": [job.to_dict() for job in jobs],
+        "snapshots": STATE["snapshots"].list_snapshots(),
+    }
+
+
+def _apply_approve(unified_diff: str, message: str | None, wait: bool = False) -> dict:
     if STATE["repo_root"] is None:
         raise HTTPException(400, "init first")
     if STATE["pending_diff"] is None:
@@ -1438,42 +1787,28 @@ def _apply_approve(unified_diff: str, message: str | None) -> dict:
         STATE["staging"].check_unified_diff(unified_diff)
     except Exception as exc:
         raise HTTPException(400, str(exc))
+    message = message or "Approved change"
+    paths = diff_paths(unified_diff)
+    # Pre-images go in before the tree changes so pending snapshots stay consistent.
+    seq = STATE["pre_images"].register(capture_images(Path(STATE["repo_root"]), paths))
     try:
         STATE["staging"].apply_unified_diff_to_repo(unified_diff)
     except Exception as exc:
+        STATE["pre_images"].discard(seq)
         raise HTTPException(400, str(exc))
-    message = message or "Approved change"
-    # Re-index (MVP full re-index; later incremental)
-    STATE["indexer"].index_all()
-    _update_index_sig()
-    # Clear pending context + reset RLM vars
+    # Clear pending context; snapshot, reindex and RLM reset follow as jobs
     STATE["pending_diff"] = None
     STATE["pending_summary"] = ""
     STATE["pending_risk"] = ""
     if STATE.get("state_store"):
         STATE["state_store"].clear_pending_patch()
-        try:
-            STATE["state_store"].snapshot(STATE["snapshots"].get_head(), message="approved")
-        except Exception:
-            pass
-    snap_meta = STATE["snapshots"].snapshot(message=message)
-    minimal = build_minimal_meta(
-        repo_root=Path(STATE["repo_root"]),
-        head=STATE["snapshots"].get_head(),
-        model_cfg={"reasoner": CONFIG.reasoner.__dict__, "coder": CONFIG.coder.__dict__, "vlm": CONFIG.vlm.__dict__},
-        index_path=STATE["indexer"].db_path,
-    )
-    reset_context(Path(STATE["repo_root"]), minimal)
-    return {
-        "status":"ok",
-        "snapshot": snap_meta.__dict__,
-        "snapshots": STATE["snapshots"].list_snapshots(),
-    }
+    jobs = _queue_after_approve(message, paths, seq)
+    return {"status": "ok", **_approve_result(jobs, wait)}
 
 
 @app.post("/approve")
 def approve(req: ApproveRequest):
-    return _apply_approve(req.unified_diff, req.message)
+    return _apply_approve(req.unified_diff, req.message, wait=req.wait)
 
 
 @app.post("/approve_stream")
@@ -1498,39 +1833,28 @@ def approve_stream(req: ApproveRequest):
             span.finish()
             yield _sse_event("status", "applying patch")
             span = trace.span("apply_patch")
-            STATE["staging"].apply_unified_diff_to_repo(req.unified_diff)
-            span.finish()
-            yield _sse_event("status", "reindexing")
-            span = trace.span("reindex")
-            STATE["indexer"].index_all()
-            _update_index_sig()
-            span.finish()
-            yield _sse_event("status", "snapshotting")
-            span = trace.span("snapshot")
             message = req.message or "Approved change"
-            if STATE.get("state_store"):
-                STATE["state_store"].clear_pending_patch()
-                try:
-                    STATE["state_store"].snapshot(STATE["snapshots"].get_head(), message="approved")
-                except Exception:
-                    pass
-            snap_meta = STATE["snapshots"].snapshot(message=message)
-            span.finish()
-            yield _sse_event("status", "resetting context")
-            span = trace.span("reset_context")
-            minimal = build_minimal_meta(
-                repo_root=Path(STATE["repo_root"]),
-                head=STATE["snapshots"].get_head(),
-                model_cfg={"reasoner": CONFIG.reasoner.__dict__, "coder": CONFIG.coder.__dict__, "vlm": CONFIG.vlm.__dict__},
-                index_path=STATE["indexer"].db_path,
-            )
-            reset_context(Path(STATE["repo_root"]), minimal)
+            paths = diff_paths(req.unified_diff)
+            seq = STATE["pre_images"].register(capture_images(Path(STATE["repo_root"]), paths))
+            try:
+                STATE["staging"].apply_unified_diff_to_repo(req.unified_diff)
+            except Exception:
+                STATE["pre_images"].discard(seq)
+                raise
             span.finish()
             STATE["pending_diff"] = None
             STATE["pending_summary"] = ""
             STATE["pending_risk"] = ""
+            if STATE.get("state_store"):
+                STATE["state_store"].clear_pending_patch()
+            jobs = _queue_after_approve(message, paths, seq)
+            if req.wait:
+                yield _sse_event("status", "snapshotting")
+            span = trace.span("snapshot" if req.wait else "queue_jobs")
+            result = _approve_result(jobs, req.wait)
+            span.finish()
             yield _sse_event("status", "done")
-            yield _sse_event("meta", json.dumps({"snapshot": snap_meta.__dict__}))
+            yield _sse_event("meta", json.dumps({"snapshot": result["snapshot"], "jobs": result["jobs"]}))
             yield _sse_event("done", json.dumps(trace.to_dict()))
         except HTTPException as exc:
             yield _sse_event("error", str(exc.detail))
@@ -1558,7 +1882,10 @@ def reject():
 def snapshots_list():
     if STATE.get("snapshots") is None:
         raise HTTPException(400, "init first")
-    return {"snapshots": STATE["snapshots"].list_snapshots()}
+    return {
+        "snapshots": STATE["snapshots"].list_snapshots(),
+        "pending": STATE["jobs"].list(kind="snapshot", active=True),
+    }
 
 class SnapshotCreateRequest(BaseModel):
     message: str | None = None
@@ -1567,16 +1894,34 @@ class SnapshotCreateRequest(BaseModel):
 def snapshots_create(req: SnapshotCreateRequest):
     if STATE.get("snapshots") is None:
         raise HTTPException(400, "init first")
-    meta = STATE["snapshots"].snapshot(message=req.message or "manual")
-    return {"status": "ok", "snapshot": meta.__dict__, "snapshots": STATE["snapshots"].list_snapshots()}
+    snapshots: SnapshotCache = STATE["snapshots"]
+    message = req.message or "manual"
+    # SnapshotCache is not thread-safe: every write goes through the job runner.
+    job = STATE["jobs"].run("snapshot", lambda: {"snapshot": snapshots.snapshot(message=message).__dict__}, message=message)
+    if job.status == "error":
+        raise HTTPException(500, f"snapshot failed: {job.error}")
+    return {"status": "ok", "snapshot": job.result["snapshot"], "snapshots": snapshots.list_snapshots()}
+
+def _run_restore(snapshot_id: str) -> Job:
+    # Queued behind pending approval snapshots, so it neither races nor precedes them.
+    snapshots: SnapshotCache = STATE["snapshots"]
+    indexer = STATE["indexer"]
+
+    def restore_job() -> dict:
+        snapshots.restore(snapshot_id)
+        indexer.index_all()
+        _update_index_sig()
+        return {"head": snapshots.get_head()}
+
+    return STATE["jobs"].run("restore", restore_job, snapshot_id=snapshot_id)
 
 @app.post("/snapshots/restore")
 def snapshots_restore(req: SnapshotRestoreRequest):
     if STATE.get("snapshots") is None:
         raise HTTPException(400, "init first")
-    STATE["snapshots"].restore(req.snapshot_id)
-    STATE["indexer"].index_all()
-    _update_index_sig()
+    job = _run_restore(req.snapshot_id)
+    if job.status == "error":
+        raise HTTPException(500, f"restore failed: {job.error}")
     STATE["pending_diff"] = None
     STATE["pending_summary"] = ""
     STATE["pending_risk"] = ""
@@ -1605,12 +1950,9 @@ class RevertRequest(BaseModel):
 def revert(req: RevertRequest):
     if STATE.get("snapshots") is None:
         raise HTTPException(400, "init first")
-    try:
-        STATE["snapshots"].restore(req.sha)
-    except Exception as exc:
-        raise HTTPException(400, f"snapshot not found: {exc}")
-    STATE["indexer"].index_all()
-    _update_index_sig()
+    job = _run_restore(req.sha)
+    if job.status == "error":
+        raise HTTPException(400, f"snapshot not found: {job.error}")
     STATE["pending_diff"] = None
     STATE["pending_summary"] = ""
     STATE["pending_risk"] = ""
@@ -1703,9 +2045,33 @@ def repo_map():
     branch = store.get_active_branch()
     repo_map_path = store.branch_root(branch) / "repo_map" / "repo_map.json"
     if not repo_map_path.exists():
-        _build_repo_map(full=True)
+        _build_repo_map()
     return json.loads(repo_map_path.read_text())
 
+def _symbol_centrality() -> dict:
+    # Recomputed only when deps.sqlite changes; it uses a rollback journal, so every write moves its mtime.
+    dep_graph: DependencyGraph | None = STATE.get("dep_graph")
+    if dep_graph is None or not dep_graph.db_path.exists():
+        return {}
+    st = dep_graph.db_path.stat()
+    stamp = (str(dep_graph.db_path), st.st_mtime_ns, st.st_size)
+    cached_stamp, scores = STATE["symbol_centrality"]
+    if cached_stamp != stamp:
+        scores = dep_graph.centrality(p for p, _ in STATE["indexer"].file_rows())
+        STATE["symbol_centrality"] = (stamp, scores)
+    return scores
+
+
+@app.get("/symbols/search")
+def symbols_search(q: str = "", limit: int = 50, kind: str | None = None, fuzzy: bool = True):
+    if STATE["repo_root"] is None or STATE.get("indexer") is None:
+        raise HTTPException(400, "init first")
+    limit = max(1, min(limit, 500))
+    start = time.perf_counter()
+    results = STATE["indexer"].search_symbols(q, limit=limit, kind=kind, fuzzy=fuzzy, centrality=_symbol_centrality())
+    return {"query": q, "results": results, "ms": round((time.perf_counter() - start) * 1000.0, 2)}
+
+
 @app.post("/repo_map/rebuild")
 def repo_map_rebuild(req: RepoMapRebuildRequest):
     _build_repo_map(full=req.full)
@@ -1743,6 +2109,17 @@ def task_logs(req: TaskLogsRequest):
         raise HTTPException(400, "init first")
     return {"logs": STATE["task_queue"].read_logs(req.task_id, req.after)}
 
+@app.get("/jobs")
+def jobs_list(limit: int = 50, active: bool = False):
+    return {"jobs": STATE["jobs"].list(limit=limit, active=active)}
+
+@app.post("/jobs/wait")
+def jobs_wait(req: JobWaitRequest):
+    job = STATE["jobs"].wait(req.job_id, timeout=max(0.0, req.timeout_s))
+    if job is None:
+        raise HTTPException(404, "job not found")
+    return job.to_dict()
+
 @app.get("/worker/status")
 def worker_status():
     w = STATE.get("task_worker")
@@ -1759,6 +2136,14 @@ def worker_status():
         "queue_size": len(STATE["task_queue"].list(limit=1000)) if STATE.get("task_queue") else 0,
     }
 
+@app.get("/runtime/status")
+def runtime_status():
+    return {
+        "model_pool": get_model_pool().stats(),
+        "http_pool": get_http_pool().stats(),
+        "rlm_sessions": get_rlm_sessions().stats(),
+    }
+
 @app.get("/models")
 def get_models():
     if STATE["repo_root"] is None:
@@ -1832,6 +2217,7 @@ def add_model(req: ModelAddRequest):
         cfg["models"].setdefault("vlm", {})
         cfg["models"]["vlm"]["enabled"] = True
     CONFIG_PATH.write_text(yaml.safe_dump(cfg, sort_keys=False))
+    invalidate_model_cache()
     if req.download_now:
         try:
             from scripts.download_models import download_one  # type: ignore
@@ -1840,6 +2226,7 @@ def add_model(req: ModelAddRequest):
             download_one(req.repo_id, hint, out_dir)
         except Exception as exc:
             raise HTTPException(400, f"download failed: {exc}")
+        invalidate_model_cache()
     return {"status": "ok"}
 
 @app.post("/models/remove")
@@ -1863,6 +2250,7 @@ def remove_model(req: ModelRemoveRequest):
         path = Path(APP_ROOT / "models" / model_dir)
         if path.exists() and path.is_dir():
             shutil.rmtree(path, ignore_errors=True)
+    invalidate_model_cache()
     return {"status": "ok", "removed": [o.get("id") for o in removed]}
 
 
@@ -1899,7 +2287,9 @@ def set_inference_config(req: InferenceConfigRequest):
     data["inference"] = {"mode": mode, "roles": roles}
     CONFIG_PATH.write_text(yaml.safe_dump(data, sort_keys=False))
     global CONFIG
-    CONFIG = load_config(CONFIG_PATH)
+    CONFIG = _load_runtime_config()
+    get_rlm_sessions().clear()
+    invalidate_model_cache()
     return {"status": "ok"}
 
 class RunCommandRequest(BaseModel):
@@ -1983,19 +2373,29 @@ def index_status(after_id: int = 0):
     status = STATE.get("index_status") or {}
     now = time.time()
     last = status.get("last_run_ts", 0.0) or 0.0
-    interval = 10
-    if last <= 0:
+    watcher = STATE.get("index_watcher")
+    q: ChangeQueue | None = STATE.get("index_queue")
+    queue_stats = q.stats() if q is not None else {}
+    if watcher is not None and watcher.is_alive():
+        # Event driven: the index is current whenever nothing is queued.
+        freshness = "fresh" if not queue_stats.get("depth") and not status.get("in_progress") else "updating"
+    elif last <= 0:
         freshness = "unknown"
-    elif now - last > interval * 2:
+    elif now - last > 20:
         freshness = "stale"
     else:
         freshness = "fresh"
     events = [e for e in (STATE.get("index_events") or []) if e.get("id", 0) > after_id]
+    indexer = STATE.get("indexer")
     return {
         "in_progress": bool(status.get("in_progress", False)),
         "last_run_ts": last,
         "last_duration_ms": status.get("last_duration_ms", 0.0),
         "last_error": status.get("last_error", ""),
+        "last_counts": dict(indexer.last_stats) if indexer is not None else {},
+        "last_event_lag_ms": status.get("last_event_lag_ms", 0.0),
+        "watcher": watcher.stats() if watcher is not None else {"kind": "", "alive": False, "error": ""},
+        "queue": queue_stats,
         "freshness": freshness,
         "events": events,
         "repo_root": STATE.get("repo_root"),
@@ -0,0 +1,186 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+import itertools
+import os
+import queue
+import stat
+import threading
+import time
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    info: Dict[str, Any] = field(default_factory=dict)
+    status: str = "pending"  # pending | running | done | error
+    created_at: float = field(default_factory=time.time)
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    result: Dict[str, Any] = field(default_factory=dict)
+    error: str = ""
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            **self.info,
+        }
+
+
+class JobRunner:
+    """In-process background jobs, run one at a time in submission order.
+
+    Unlike TaskQueue these are not persisted: they are follow-up work of a
+    request that already returned (snapshot, reindex), tracked so clients
+    can poll or wait for them.
+    """
+
+    def __init__(self, keep: int = 200) -> None:
+        self.keep = keep
+        self._jobs: Dict[str, Job] = {}
+        self._order: List[str] = []
+        self._queue: "queue.Queue[tuple[Job, Callable[[], Dict[str, Any] | None]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, fn: Callable[[], Dict[str, Any] | None], **info: Any) -> Job:
+        job = Job(id=f"job_{int(time.time() * 1000)}_{next(self._ids)}", kind=kind, info=info)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._order.append(job.id)
+            for old in self._order[: max(0, len(self._order) - self.keep)]:
+                if self._jobs[old]._done.is_set():
+                    del self._jobs[old]
+            self._order = [jid for jid in self._order if jid in self._jobs]
+        self._queue.put((job, fn))
+        return job
+
+    def _run(self) -> None:
+        while True:
+            job, fn = self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = fn() or {}
+                job.status = "done"
+            except Exception as exc:
+                job.error = str(exc)
+                job.status = "error"
+            job.finished_at = time.time()
+            job._done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id: str, timeout: float | None = None) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is not None:
+            job._done.wait(timeout)
+        return job
+
+    def run(self, kind: str, fn: Callable[[], Dict[str, Any] | None], **info: Any) -> Job:
+        """Submits `fn` and blocks until it has run, after everything queued before it."""
+        job = self.submit(kind, fn, **info)
+        job._done.wait()
+        return job
+
+    def wait_all(self, timeout: float | None = None) -> bool:
+        """Waits for everything submitted so far; False on timeout."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        deadline = None if timeout is None else time.time() + timeout
+        for job in jobs:
+            left = None if deadline is None else max(0.0, deadline - time.time())
+            if not job._done.wait(left):
+                return False
+        return True
+
+    def list(self, limit: int = 50, kind: str | None = None, active: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = [self._jobs[jid] for jid in self._order]
+        if kind is not None:
+            jobs = [j for j in jobs if j.kind == kind]
+        if active:
+            jobs = [j for j in jobs if j.status in ("pending", "running")]
+        return [j.to_dict() for j in jobs[-limit:]]
+
+
+def capture_images(repo_root: Path, paths: List[str]) -> Dict[str, Any]:
+    """(content, mode, mtime_ns) of each path as it is now, None if absent."""
+    images: Dict[str, Any] = {}
+    for rel in paths:
+        try:
+            st = os.lstat(repo_root / rel)
+            if not stat.S_ISREG(st.st_mode):
+                images[rel] = None
+                continue
+            images[rel] = ((repo_root / rel).read_bytes(), stat.S_IMODE(st.st_mode), st.st_mtime_ns)
+        except OSError:
+            images[rel] = None
+    return images
+
+
+class PreImageLog:
+    """Pre-images of files an approval is about to change, kept until its
+    deferred snapshot has run.
+
+    Register before touching the tree: a snapshot job for an earlier approval
+    then sees these files as they were, not as the later approval left them.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+
+    def register(self, images: Dict[str, Any]) -> int:
+        with self._lock:
+            seq = next(self._seq)
+            self._entries[seq] = images
+            return seq
+
+    def discard(self, seq: int) -> None:
+        with self._lock:
+            self._entries.pop(seq, None)
+
+    def after(self, seq: int) -> "_ImagesAfter":
+        """Live view of the earliest image per path registered after `seq`."""
+        return _ImagesAfter(self, seq)
+
+
+class _ImagesAfter(Mapping[str, Any]):
+    def __init__(self, log: PreImageLog, seq: int) -> None:
+        self._log = log
+        self._seq = seq
+
+    def _later(self) -> List[Dict[str, Any]]:
+        with self._log._lock:
+            return [images for seq, images in sorted(self._log._entries.items()) if seq > self._seq]
+
+    def __getitem__(self, rel: str) -> Any:
+        for images in self._later():
+            if rel in images:
+                return images[rel]
+        raise KeyError(rel)
+
+    def __iter__(self) -> Iterator[str]:
+        seen: Dict[str, None] = {}
+        for images in self._later():
+            seen.update(dict.fromkeys(images))
+        return iter(list(seen))
+
+    def __len__(self) -> int:
+        return len(list(iter(self)))
@@ -0,0 +1,31 @@
+from indexer.chunks import MAX_CHUNK_LINES, bm25_query, chunk_spans, chunk_words
+
+
+def test_chunks_follow_symbols_and_split_large_ones():
+    symbols = [
+        ("class", "Store", 10, 100),
+        ("function", "load", 12, 30),
+        ("function", "save", 32, 98),
+        ("function", "main", 105, 120),
+    ]
+    spans = chunk_spans(symbols, 130)
+    assert spans[0][0] == 1
+    assert [s for s, e, lbl in spans if lbl == "load"] == [12]
+    assert all(e - s + 1 <= MAX_CHUNK_LINES for s, e, _ in spans)
+    # Every line is covered exactly once, in order.
+    covered = [line for s, e, _ in spans for line in range(s, e + 1)]
+    assert covered == list(range(1, 131))
+    assert [lbl for s, e, lbl in spans if s <= 50 <= e] == ["save"]
+
+
+def test_small_pieces_are_merged():
+    spans = chunk_spans([("function", "a", 3, 4), ("function", "b", 5, 6)], 7)
+    assert spans == [(1, 7, "a")]
+
+
+def test_query_terms_and_words():
+    assert bm25_query("How does parseHTTPResponse handle the index_all?") == (
+        '"parsehttpresponse" OR "parse" OR "http" OR "response" OR "handle" OR "index" OR "all"'
+    )
+    assert bm25_query("is it the?") == ""
+    assert chunk_words("x = fooBar(snake_case)") == "bar foo"
@@ -0,0 +1,29 @@
+from agent import context_ingest
+from agent.context_ingest import ingest_text, rank_chunks, summarize_chunks, term_matrix
+
+
+def test_rank_chunks_by_tfidf():
+    chunks = [
+        "def render(): return template",
+        "snapshot snapshot restore the snapshot tree",
+        "restore settings from the default profile",
+        "unrelated text about logging",
+    ]
+    # "snapshot" is rarer than "restore", so the chunk with both ranks first.
+    assert rank_chunks("restore a snapshot", chunks, top_k=2) == [chunks[1], chunks[2]]
+    # No matches and no query terms both keep document order.
+    assert rank_chunks("zebra", chunks, top_k=2) == chunks[:2]
+    assert rank_chunks("the and", chunks, top_k=3) == chunks[:3]
+
+
+def test_summary_and_ranking_share_one_tokenization():
+    text = "alpha beta gamma " * 300
+    chunks = ingest_text(text, chunk_size=510, chunk_overlap=0)
+    context_ingest._TOKEN_CACHE.clear()
+    matrix = term_matrix(chunks)
+    cached = len(context_ingest._TOKEN_CACHE)
+    assert 0 < cached < len(chunks)  # identical chunks are tokenized once
+    assert summarize_chunks(chunks, matrix).startswith(f"Context ingested: {len(chunks)} chunks. Keywords: ")
+    assert summarize_chunks(chunks, matrix) == summarize_chunks(chunks)
+    assert rank_chunks("gamma", chunks, top_k=1, matrix=matrix) == chunks[:1]
+    assert len(context_ingest._TOKEN_CACHE) == cached
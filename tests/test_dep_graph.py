@@ -0,0 +1,87 @@
+from indexer.dep_graph import DependencyGraph, PathAliases, resolve_import
+
+FILES = {"indexer/indexer.py", "indexer/walker.py", "agent/config.py", "src/util/index.ts", "src/a.ts"}
+
+
+def test_resolve_python_imports():
+    assert resolve_import("server/app.py", "from indexer.indexer import SymbolIndexer", FILES) == ["indexer/indexer.py"]
+    assert resolve_import("indexer/indexer.py", "from .walker import walk_repo", FILES) == ["indexer/walker.py"]
+    assert resolve_import("x.py", "import agent.config as c, os", FILES) == ["agent/config.py"]
+    assert resolve_import("x.py", "import yaml", FILES) == []
+
+
+def test_resolve_js_relative_imports():
+    assert resolve_import("src/b/c.ts", "import { x } from '../util'", FILES) == ["src/util/index.ts"]
+    assert resolve_import("src/b.ts", "const a = require('./a')", FILES) == ["src/a.ts"]
+    assert resolve_import("src/b.ts", "import React from 'react'", FILES) == []
+
+
+def test_resolve_tsconfig_aliases_and_js_extension():
+    aliases = PathAliases(base_url="src", paths=[("@app/*", ["src/app/*"])])
+    files = {"src/app/store.ts", "src/lib/http.ts", "src/a.ts"}
+    assert resolve_import("src/x.ts", "import { s } from '@app/store'", files, aliases) == ["src/app/store.ts"]
+    assert resolve_import("src/x.ts", "import { get } from 'lib/http'", files, aliases) == ["src/lib/http.ts"]
+    assert resolve_import("src/x.ts", "export * from './a.js'", files, aliases) == ["src/a.ts"]
+
+
+def test_tsconfig_with_comments(tmp_path):
+    (tmp_path / "tsconfig.json").write_text('{\n  // aliases\n  "compilerOptions": {"baseUrl": ".", "paths": {"~/*": ["src/*"],},},\n}')
+    aliases = PathAliases.load(tmp_path)
+    assert aliases.candidates("~/util") == ["src/util", "~/util"]
+
+
+def _graph(tmp_path, files):
+    for rel, text in files.items():
+        p = tmp_path / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(text)
+    g = DependencyGraph(repo_root=tmp_path, db_path=tmp_path / "deps.sqlite")
+    g.init_db()
+    g.update_files([tmp_path / rel for rel in files])
+    return g
+
+
+def test_graph_forward_reverse_and_transitive(tmp_path):
+    g = _graph(tmp_path, {
+        "pkg/__init__.py": "",
+        "pkg/core.py": "import os\n",
+        "pkg/api.py": "from .core import thing\n",
+        "app.py": "from pkg import api\n",
+        "cli.py": "import app\n",
+    })
+    assert g.dependencies("pkg/api.py") == ["pkg/core.py"]
+    assert g.dependents("pkg/core.py") == ["pkg/api.py"]
+    assert g.dependents("pkg/core.py", depth=2) == ["pkg/api.py", "app.py"]
+    assert g.dependents("pkg/core.py", depth=None) == ["pkg/api.py", "app.py", "cli.py"]
+    assert g.dependencies("cli.py", depth=None) == ["app.py", "pkg/__init__.py", "pkg/api.py", "pkg/core.py"]
+    assert g.degrees()["pkg/core.py"] == (0, 1)
+
+    g.remove_file("pkg/api.py")
+    assert g.dependents("pkg/core.py") == []
+    assert g.dependencies("app.py") == ["pkg/__init__.py"]
+
+
+def test_graph_resolves_targets_added_later(tmp_path):
+    g = _graph(tmp_path, {"src/main.ts": "import { u } from './util';\nconst h = require('./helpers');\n"})
+    assert g.dependencies("src/main.ts") == []
+    (tmp_path / "src" / "util").mkdir()
+    (tmp_path / "src" / "util" / "index.ts").write_text("export const u = 1;\n")
+    (tmp_path / "src" / "helpers.js").write_text("module.exports = {};\n")
+    g.update_files([tmp_path / "src" / "util" / "index.ts", tmp_path / "src" / "helpers.js"])
+    assert g.dependencies("src/main.ts") == ["src/helpers.js", "src/util/index.ts"]
+
+
+def test_pagerank_is_persisted_and_follows_graph_changes(tmp_path):
+    g = _graph(tmp_path, {"a.py": "import c\n", "b.py": "import c\n", "c.py": "", "d.py": "import a\n"})
+    ranks = g.ranks()
+    assert max(ranks, key=ranks.get) == "c.py"
+    assert abs(sum(ranks.values()) - 1.0) < 1e-6
+    assert g.ranks() == ranks
+
+    (tmp_path / "b.py").write_text("import d\n")
+    (tmp_path / "c.py").write_text("import d\n")
+    g.update_files([tmp_path / "b.py", tmp_path / "c.py"])
+    assert max(g.ranks(), key=g.ranks().get) == "d.py"
+
+    personal = g.personalized_ranks(["a.py"])
+    assert personal["b.py"] == 0.0 and personal["c.py"] > 0.0
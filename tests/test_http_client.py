@@ -0,0 +1,123 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent.http_client import HTTPPool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    plan = []
+    ports = []
+    conns = []
+    delay = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        self.rfile.read(length)
+        self.ports.append(self.client_address[1])
+        self.conns.append(self.connection)
+        time.sleep(self.delay)
+        status, headers = self.plan.pop(0) if self.plan else (200, {})
+        out = json.dumps({"status": status}).encode("utf-8")
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args, **kwargs):
+        return
+
+
+@pytest.fixture()
+def server():
+    _Handler.plan = []
+    _Handler.ports = []
+    _Handler.conns = []
+    _Handler.delay = 0.0
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _url(srv):
+    host, port = srv.server_address
+    return f"http://{host}:{port}/v1/chat/completions"
+
+
+def test_pool_reuses_keepalive_connection(server):
+    pool = HTTPPool()
+    for _ in range(3):
+        assert pool.post_json(_url(server), {}, {}) == {"status": 200}
+    assert len(set(_Handler.ports)) == 1
+    host = next(iter(pool.stats()["hosts"].values()))
+    assert host["opened"] == 1
+    assert host["reused"] == 2
+    assert host["idle"] == 1
+    pool.close()
+
+
+def test_pool_retries_retryable_status_with_retry_after(server):
+    _Handler.plan = [(503, {"Retry-After": "0"}), (429, {"Retry-After": "0"})]
+    pool = HTTPPool(max_retries=3)
+    assert pool.post_json(_url(server), {}, {}) == {"status": 200}
+    assert next(iter(pool.stats()["hosts"].values()))["retries"] == 2
+    pool.close()
+
+
+def test_pool_does_not_retry_client_errors(server):
+    _Handler.plan = [(400, {})]
+    pool = HTTPPool(max_retries=3)
+    with pytest.raises(RuntimeError, match="HTTP 400"):
+        pool.post_json(_url(server), {}, {}, label="Remote backend")
+    assert len(_Handler.ports) == 1
+    pool.close()
+
+
+def test_pool_recovers_from_server_closed_idle_connection(server):
+    pool = HTTPPool(max_retries=1)
+    assert pool.post_json(_url(server), {}, {}) == {"status": 200}
+    # The server drops the kept-alive socket while it sits idle in the pool.
+    _Handler.conns[0].shutdown(socket.SHUT_RDWR)
+    time.sleep(0.05)
+    assert pool.post_json(_url(server), {}, {}) == {"status": 200}
+    host = next(iter(pool.stats()["hosts"].values()))
+    assert host["reused"] == 1  # the stale socket was tried first
+    assert host["retries"] == 1
+    assert host["opened"] == 2
+    assert len(set(_Handler.ports)) == 2
+    pool.close()
+
+
+def test_pool_does_not_resend_after_read_timeout(server):
+    _Handler.delay = 0.5
+    pool = HTTPPool(max_retries=3, read_timeout=0.1, backoff_base=0.01)
+    with pytest.raises(RuntimeError, match="timed out"):
+        pool.post_json(_url(server), {}, {})
+    time.sleep(0.6)
+    assert len(_Handler.ports) == 1
+    assert next(iter(pool.stats()["hosts"].values()))["retries"] == 0
+    pool.close()
+
+
+def test_pool_retries_refused_connection():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    pool = HTTPPool(max_retries=2, backoff_base=0.01)
+    with pytest.raises(RuntimeError, match="request failed"):
+        pool.post_json(f"http://127.0.0.1:{port}/v1/chat/completions", {}, {})
+    host = next(iter(pool.stats()["hosts"].values()))
+    assert host["retries"] == 1
+    assert host["opened"] == 2
+    pool.close()
@@ -0,0 +1,185 @@
+import os
+from pathlib import Path
+
+from indexer.dep_graph import DependencyGraph
+from indexer.indexer import SymbolIndexer
+
+
+def _names(idx):
+    return sorted((r["file"], r["name"]) for r in idx.search_symbols("", limit=1000))
+
+
+def test_incremental_index_updates_and_removes(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("def alpha():\n    pass\n")
+    (repo / "b.py").write_text("class Beta:\n    pass\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite")
+    idx.index_all()
+    assert _names(idx) == [("a.py", "alpha"), ("b.py", "Beta")]
+
+    (repo / "a.py").write_text("def alpha2():\n    pass\n\ndef gamma():\n    pass\n")
+    st = (repo / "a.py").stat()
+    os.utime(repo / "a.py", ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    (repo / "b.py").unlink()
+    idx.index_incremental()
+    assert _names(idx) == [("a.py", "alpha2"), ("a.py", "gamma")]
+    assert [p for p, _ in idx.file_rows()] == ["a.py"]
+
+
+def test_index_uses_wal_and_single_connection(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("def alpha():\n    pass\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite")
+    idx.index_all()
+    con = idx._con
+    idx.index_incremental()
+    idx.search_symbols("alp")
+    assert idx._con is con
+    assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    idx.close()
+    assert idx.search_symbols("alp")[0]["name"] == "alpha"
+
+
+def test_parallel_index_matches_serial(tmp_path: Path, monkeypatch):
+    import indexer.indexer as indexer_mod
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for i in range(40):
+        (repo / f"m{i}.py").write_text(f"def f{i}():\n    pass\n\nclass C{i}:\n    pass\n")
+    serial = SymbolIndexer(repo_root=repo, db_path=tmp_path / "serial.sqlite", workers=1)
+    serial.index_all()
+
+    monkeypatch.setattr(indexer_mod, "_PARALLEL_MIN_FILES", 8)
+    parallel = SymbolIndexer(repo_root=repo, db_path=tmp_path / "parallel.sqlite", workers=2, batch_files=7)
+    assert parallel._worker_count(40) == 2
+    parallel.index_all()
+    assert _names(parallel) == _names(serial)
+    assert len(_names(parallel)) == 80
+
+
+def test_walk_prunes_excluded_and_gitignored(tmp_path: Path):
+    from indexer.walker import WalkStats, walk_repo
+
+    repo = tmp_path / "repo"
+    for d in ["src", "node_modules/pkg", "gen", "src/sub"]:
+        (repo / d).mkdir(parents=True)
+    (repo / ".gitignore").write_text("gen/\n*.tmp.py\n!keep.tmp.py\n")
+    (repo / "src" / ".gitignore").write_text("/local.py\n")
+    for f in ["src/a.py", "src/local.py", "src/sub/local.py", "node_modules/pkg/x.js",
+              "gen/g.py", "src/b.tmp.py", "src/keep.tmp.py", "README.md"]:
+        (repo / f).write_text("x = 1\n")
+    stats = WalkStats()
+    got = [rel for rel, _ in walk_repo(repo, {"node_modules"}, {".py", ".js"}, stats=stats)]
+    assert got == ["src/a.py", "src/keep.tmp.py", "src/sub/local.py"]
+    assert stats.pruned_dirs == 2
+    assert stats.ignored_files == 2
+
+
+def test_incremental_skips_by_stat_and_hash(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("def alpha():\n    pass\n")
+    (repo / "b.py").write_text("def beta():\n    pass\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=tmp_path / "index.sqlite")
+    idx.index_all()
+    assert idx.last_stats["reparsed"] == 2
+
+    sig = idx.signature()
+    idx.index_incremental()
+    assert idx.last_stats["skipped"] == 2
+    assert idx.last_stats["reparsed"] == 0
+    assert idx.signature() == sig
+
+    # Rewritten with identical content: stat changes, hash does not.
+    for name in ("a.py", "b.py"):
+        p = repo / name
+        st = p.stat()
+        p.write_text(p.read_text())
+        os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    idx.index_incremental()
+    assert idx.last_stats["unchanged"] == 2
+    assert idx.last_stats["reparsed"] == 0
+    idx.index_incremental()
+    assert idx.last_stats["skipped"] == 2
+    assert _names(idx) == [("a.py", "alpha"), ("b.py", "beta")]
+    assert idx.signature() == sig
+
+    (repo / "b.py").unlink()
+    assert idx.index_paths(["b.py"]) == ["b.py"]
+    assert idx.signature() != sig
+
+
+def test_symbol_search_ranks_and_tolerates_typos(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text(
+        "def load():\n    pass\n\ndef loadAllUsers():\n    pass\n\n"
+        "def parseHTTPResponse():\n    pass\n\nclass Loader:\n    pass\n\ndef render_user():\n    pass\n"
+    )
+    (repo / "b.py").write_text("def load():\n    pass\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=tmp_path / "index.sqlite")
+    idx.index_all()
+
+    names = [r["name"] for r in idx.search_symbols("load")]
+    assert names[:2] == ["load", "load"]
+    assert set(names[2:]) == {"loadAllUsers", "Loader"}
+    # Centrality breaks the tie between equal matches.
+    top = idx.search_symbols("load", centrality={"b.py": 1.0})[0]
+    assert (top["file"], top["name"]) == ("b.py", "load")
+    assert [r["name"] for r in idx.search_symbols("http resp")] == ["parseHTTPResponse"]
+    assert [r["name"] for r in idx.search_symbols("rendr_user")] == ["render_user"]
+    assert [r["name"] for r in idx.search_symbols("Load", kind="class")] == ["Loader"]
+
+    # FTS stays in sync with deletes.
+    (repo / "a.py").write_text("def other():\n    pass\n")
+    st = (repo / "a.py").stat()
+    os.utime(repo / "a.py", ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    idx.index_incremental()
+    assert idx.search_symbols("parseHTTP") == []
+
+
+def test_index_writes_dep_graph_from_same_parse(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("import os\n\ndef alpha():\n    pass\n")
+    (repo / "b.py").write_text("from a import alpha\n")
+    (repo / "c.py").write_text("import b\n")
+    plain = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite")
+    plain.index_all()
+    plain.close()
+
+    # Attaching a dep graph to an existing index backfills the imports.
+    dep = DependencyGraph(repo_root=repo, db_path=repo / ".agent" / "deps.sqlite")
+    idx = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite", dep_graph=dep)
+    idx.index_incremental()
+    assert idx.last_stats["reparsed"] == 3
+    assert dep.dependents("a.py", depth=None) == ["b.py", "c.py"]
+
+    (repo / "c.py").write_text("import a\n")
+    (repo / "b.py").unlink()
+    assert idx.index_paths(["b.py", "c.py"]) == ["c.py", "b.py"]
+    assert dep.dependents("a.py") == ["c.py"]
+    assert dep.files() == {"a.py", "c.py"}
+
+
+def test_search_chunks_ranks_by_query(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "watch.py").write_text(
+        "import time\n\n\nclass DebounceQueue:\n    def put(self, path):\n        self.pending[path] = time.time()\n"
+    )
+    (repo / "store.py").write_text("def save_snapshot(tree):\n    return write_tree(tree)\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite")
+    idx.index_all()
+    assert idx.chunk_count() == 2
+    hits = idx.search_chunks("how are file events debounced in the queue?")
+    assert [h["file"] for h in hits] == ["watch.py"]
+    assert hits[0]["symbol"] == "DebounceQueue" and "self.pending" in hits[0]["text"]
+
+    (repo / "store.py").write_text("def restore_snapshot(tree):\n    return tree\n")
+    idx.index_paths(["store.py"])
+    assert [h["file"] for h in idx.search_chunks("restore snapshot")] == ["store.py"]
+    assert idx.search_chunks("write") == []
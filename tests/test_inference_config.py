@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("llama_cpp")
+
+from agent import llm_runtime
+from server import app as server_app
+
+
+def test_inference_config_change_reapplies_kv_cache(tmp_path, monkeypatch):
+    cfg_path = tmp_path / "config.yaml"
+    cfg_path.write_text(server_app.CONFIG_PATH.read_text().replace("kv_cache_mode: ram", "kv_cache_mode: disk"))
+    monkeypatch.setattr(server_app, "CONFIG_PATH", cfg_path)
+    monkeypatch.setattr(server_app, "CONFIG", server_app.CONFIG)
+    monkeypatch.setitem(llm_runtime._KV_CACHE_CFG, "mode", "ram")
+    monkeypatch.setitem(llm_runtime._KV_CACHE_CFG, "cache_dir", "")
+
+    server_app.set_inference_config(server_app.InferenceConfigRequest(mode="local", roles={}))
+    assert llm_runtime._KV_CACHE_CFG["mode"] == "disk"
+    assert Path(llm_runtime._KV_CACHE_CFG["cache_dir"]).is_absolute()
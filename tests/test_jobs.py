@@ -0,0 +1,62 @@
+from pathlib import Path
+import threading
+
+from server.jobs import JobRunner, PreImageLog, capture_images
+
+
+def test_jobs_run_in_order_and_report_errors():
+    runner = JobRunner()
+    gate = threading.Event()
+    seen = []
+
+    def first():
+        gate.wait(5)
+        seen.append("first")
+        return {"n": 1}
+
+    def fail():
+        raise RuntimeError("boom")
+
+    a = runner.submit("snapshot", first, message="m")
+    b = runner.submit("reindex", fail)
+    c = runner.submit("reindex", lambda: seen.append("third"))
+    assert [j["id"] for j in runner.list(kind="snapshot", active=True)] == [a.id]
+    assert not runner.wait_all(timeout=0.05)
+    gate.set()
+    assert runner.wait_all(timeout=5)
+    assert seen == ["first", "third"]
+    assert runner.wait(a.id).to_dict()["result"] == {"n": 1}
+    assert runner.get(b.id).status == "error" and runner.get(b.id).error == "boom"
+    assert c.status == "done" and runner.list(active=True) == []
+    assert runner.get("job_missing") is None
+
+
+def test_pre_image_view_prefers_earliest_later_image(tmp_path: Path):
+    (tmp_path / "a.py").write_text("v1\n")
+    log = PreImageLog()
+    first = log.register(capture_images(tmp_path, ["a.py"]))
+    view = log.after(first)
+    assert dict(view) == {}
+    (tmp_path / "a.py").write_text("v2\n")
+    second = log.register(capture_images(tmp_path, ["a.py", "gone.py"]))
+    (tmp_path / "a.py").write_text("v3\n")
+    log.register(capture_images(tmp_path, ["a.py"]))
+    assert view["a.py"][0] == b"v2\n"
+    assert view["gone.py"] is None and len(view) == 2
+    log.discard(second)
+    assert view["a.py"][0] == b"v3\n"
+
+
+def test_run_blocks_behind_queued_jobs():
+    runner = JobRunner()
+    gate = threading.Event()
+    order = []
+
+    def queued():
+        gate.wait(5)
+        order.append("queued")
+
+    runner.submit("snapshot", queued)
+    threading.Timer(0.05, gate.set).start()
+    job = runner.run("restore", lambda: order.append("run") or {"ok": True})
+    assert order == ["queued", "run"] and job.result == {"ok": True}
@@ -0,0 +1,29 @@
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("llama_cpp")
+
+from agent import llm_runtime
+
+
+class _Llm:
+    cache = None
+
+    def set_cache(self, cache):
+        self.cache = cache
+
+
+def test_disk_kv_cache_falls_back_to_ram_without_diskcache(tmp_path, monkeypatch):
+    # llama_cpp's LlamaDiskCache import fails when `diskcache` is not installed.
+    real = sys.modules["llama_cpp.llama_cache"]
+    stub = types.ModuleType("llama_cpp.llama_cache")
+    stub.LlamaRAMCache = real.LlamaRAMCache
+    monkeypatch.setitem(sys.modules, "llama_cpp.llama_cache", stub)
+    monkeypatch.setitem(llm_runtime._KV_CACHE_CFG, "mode", "disk")
+    monkeypatch.setitem(llm_runtime._KV_CACHE_CFG, "cache_dir", str(tmp_path))
+    llm = _Llm()
+    with pytest.warns(RuntimeWarning, match="diskcache|LlamaDiskCache"):
+        llm_runtime._attach_kv_cache(llm, ("model", 1))
+    assert type(llm.cache.inner) is real.LlamaRAMCache
@@ -0,0 +1,15 @@
+from agent.llm_stats import collect_llm_stats, record_llm_call
+
+
+def test_collect_llm_stats_nested():
+    with collect_llm_stats() as outer:
+        record_llm_call(prompt_tokens=100, completion_tokens=10, prefix_hit_tokens=80, ms=5.0)
+        with collect_llm_stats() as inner:
+            record_llm_call(prompt_tokens=50, completion_tokens=5, prefix_hit_tokens=40, ms=2.5)
+    assert inner["llm_calls"] == 1
+    assert inner["prefix_hit_tokens"] == 40
+    assert outer["llm_calls"] == 2
+    assert outer["prompt_tokens"] == 150
+    assert outer["prefix_hit_tokens"] == 120
+    record_llm_call(prompt_tokens=1)
+    assert outer["llm_calls"] == 2
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from agent.model_pool import ModelPool, model_key
+
+
+class _FakeModel:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_reuses_loaded_model():
+    pool = ModelPool(max_models=2, idle_ttl_s=0)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return _FakeModel("a")
+
+    key = model_key("/models/a.gguf", 4096, 0)
+    with pool.acquire(key, loader) as m1:
+        pass
+    with pool.acquire(key, loader) as m2:
+        pass
+    assert m1 is m2
+    assert len(loads) == 1
+    stats = pool.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_pool_evicts_least_recently_used():
+    pool = ModelPool(max_models=2, idle_ttl_s=0)
+    models = {}
+
+    def loader_for(name):
+        def load():
+            models[name] = _FakeModel(name)
+            return models[name]
+        return load
+
+    for name in ["a", "b", "a", "c"]:
+        with pool.acquire(model_key(f"/models/{name}.gguf", 4096, 0), loader_for(name)):
+            pass
+    resident = {r["model_path"] for r in pool.stats()["resident"]}
+    assert resident == {"/models/a.gguf", "/models/c.gguf"}
+    assert models["b"].closed is True
+    assert pool.stats()["evictions"] == 1
+
+
+def test_pool_idle_ttl_unloads():
+    pool = ModelPool(max_models=2, idle_ttl_s=5)
+    with pool.acquire(model_key("/models/a.gguf", 4096, 0), lambda: _FakeModel("a")):
+        pass
+    assert pool.sweep(now=time.time() + 1) == 0
+    assert pool.sweep(now=time.time() + 10) == 1
+    assert pool.stats()["resident"] == []
+
+
+def test_pool_concurrent_acquire_loads_once():
+    pool = ModelPool(max_models=2, idle_ttl_s=0)
+    loads = []
+    key = model_key("/models/a.gguf", 4096, 0)
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return _FakeModel("a")
+
+    def worker():
+        with pool.acquire(key, loader):
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
+    assert pool.stats()["hits"] == 3
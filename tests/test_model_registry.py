@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import yaml
+
+import agent.model_registry as registry
+
+
+def _config(tmp_path):
+    return SimpleNamespace(
+        paths=SimpleNamespace(models_dir=tmp_path / "models"),
+        vlm=SimpleNamespace(enabled=False),
+        model_registry={
+            "coder": {
+                "default": "local-a",
+                "options": [
+                    {"id": "local-a", "provider": "local", "role": "coder", "model_dir": "a"},
+                    {"id": "local-b", "provider": "local", "role": "coder", "model_dir": "b"},
+                ],
+            },
+        },
+    )
+
+
+def _counting(monkeypatch):
+    calls = []
+    real = registry._resolve_model_uncached
+
+    def wrapped(*args, **kwargs):
+        calls.append(1)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(registry, "_resolve_model_uncached", wrapped)
+    return calls
+
+
+def test_resolve_model_is_cached_until_selection_changes(tmp_path, monkeypatch):
+    registry.invalidate_model_cache()
+    calls = _counting(monkeypatch)
+    config = _config(tmp_path)
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(yaml.safe_dump({"model_registry": {"selected": {"coder": "best"}}}))
+
+    assert registry.resolve_model("coder", config, tmp_path, config_path).id == "local-a"
+    assert registry.resolve_model("coder", config, tmp_path, config_path).id == "local-a"
+    assert len(calls) == 1
+
+    registry.set_selected("coder", "local-b", tmp_path, config_path)
+    assert registry.resolve_model("coder", config, tmp_path, config_path).id == "local-b"
+    assert len(calls) == 2
+
+
+def test_resolve_model_misses_on_keys_env_change(tmp_path, monkeypatch):
+    registry.invalidate_model_cache()
+    calls = _counting(monkeypatch)
+    config = _config(tmp_path)
+    registry.resolve_model("coder", config, tmp_path)
+    (tmp_path / "keys.env").write_text("OPENAI_API_KEY=sk-test\n")
+    registry.resolve_model("coder", config, tmp_path)
+    assert len(calls) == 2
+    options = registry.list_models("coder", config, tmp_path)["options"]
+    assert any(o["provider"] == "openai" for o in options)
@@ -0,0 +1,75 @@
+import contextlib
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("llama_cpp")
+
+import agent.pipeline as pipeline
+from agent.llm_stats import collect_llm_stats, record_llm_call
+
+
+class _FakeIndexer:
+    repo_root = Path(".")
+
+    def get_file_head(self, file_rel, max_lines=200):
+        return f"   1: # {file_rel}"
+
+    def snippet_cache(self):
+        return contextlib.nullcontext()
+
+
+def _setup(monkeypatch, files, workers, delays):
+    config = SimpleNamespace(runtime=SimpleNamespace(multi_step_max_files=5))
+    monkeypatch.setattr(pipeline, "_store_rlm_context", lambda indexer: None)
+    monkeypatch.setattr(pipeline, "_plan_edit_steps", lambda *a: {"files": [{"path": f} for f in files], "steps": ["edit"], "checks": []})
+    monkeypatch.setattr(pipeline, "max_concurrency", lambda *a, **k: workers)
+    active = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_chat(role, messages, config, repo_root, config_path=None, on_delta=None):
+        path = messages[-1]["content"].split("File to edit: ", 1)[1].splitlines()[0]
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(delays[path])
+        record_llm_call(prompt_tokens=10, completion_tokens=5)
+        with lock:
+            active["now"] -= 1
+        out = f"SUMMARY: {path}\nRISK: low\ndiff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1 +1 @@\n-a\n+b\n"
+        if on_delta:
+            for line in out.splitlines(keepends=True):
+                on_delta(line)
+        return out
+
+    monkeypatch.setattr(pipeline, "llm_chat", fake_chat)
+    return config, active
+
+
+def test_multistep_runs_files_concurrently_in_order(monkeypatch):
+    files = ["a.py", "b.py", "c.py"]
+    config, active = _setup(monkeypatch, files, workers=3, delays={"a.py": 0.15, "b.py": 0.05, "c.py": 0.01})
+    deltas = []
+    with collect_llm_stats() as stats:
+        proposal = pipeline.propose_patch_multistep("edit", _FakeIndexer(), config, on_delta=deltas.append)
+    assert active["peak"] == 3
+    assert [s["file"] for s in proposal.file_spans] == files
+    assert proposal.diff.index("a/a.py") < proposal.diff.index("a/b.py") < proposal.diff.index("a/c.py")
+    assert proposal.summary == "a.py; b.py; c.py"
+    streamed = "".join(deltas)
+    assert streamed.index("SUMMARY: a.py") < streamed.index("SUMMARY: b.py") < streamed.index("SUMMARY: c.py")
+    assert stats["llm_calls"] == 3
+    assert stats["prompt_tokens"] == 30
+
+
+def test_multistep_sequential_for_local(monkeypatch):
+    files = ["a.py", "b.py"]
+    config, active = _setup(monkeypatch, files, workers=1, delays={"a.py": 0.01, "b.py": 0.01})
+    with collect_llm_stats() as stats:
+        proposal = pipeline.propose_patch_multistep("edit", _FakeIndexer(), config)
+    assert active["peak"] == 1
+    assert [s["workers"] for s in proposal.file_spans] == [1, 1]
+    assert stats["llm_calls"] == 2
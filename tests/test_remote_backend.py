@@ -13,6 +13,16 @@ class _Handler(BaseHTTPRequestHandler):
         content = "ok"
         if data.get("messages"):
             content = data["messages"][-1].get("content", "ok")
+        if data.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for piece in ["echo", ":", " ", str(content)]:
+                chunk = {"choices": [{"delta": {"content": piece}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
         resp = {"choices": [{"message": {"content": f"echo:{content}"}}]}
         out = json.dumps(resp).encode("utf-8")
         self.send_response(200)
@@ -48,3 +58,12 @@ def test_remote_backend_chat_with_images():
     out = backend.chat_with_images([{"role": "user", "content": "img"}], images=[{"data": "data:image/png;base64,AAA"}])
     assert out == "echo:img"
     server.shutdown()
+
+
+def test_remote_backend_chat_stream():
+    server = _start_server()
+    host, port = server.server_address
+    backend = RemoteOpenAIBackend(base_url=f"http://{host}:{port}", model="test-model")
+    deltas = list(backend.chat_stream([{"role": "user", "content": "hi"}]))
+    assert deltas == ["echo", ":", " ", "hi"]
+    server.shutdown()
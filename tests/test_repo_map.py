@@ -22,3 +22,30 @@ def test_repo_map_build(tmp_path: Path):
     out = builder.build(repo / ".agent" / "state" / "sessions" / "s" / "branches" / "main" / "repo_map")
     assert out["file_count"] >= 2
     assert any(m["deps"] >= 1 for m in out["top_modules"])
+
+
+def test_repo_map_ranks_by_pagerank_within_budget(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "core.py").write_text("def base():\n    pass\n\nclass Store:\n    pass\n")
+    (repo / "util.py").write_text("from core import base\n\ndef helper():\n    pass\n")
+    for i in range(3):
+        (repo / f"app{i}.py").write_text(f"import core\nimport util\n\ndef main_{i}():\n    pass\n")
+    (repo / "side.py").write_text("import os\n\ndef lonely():\n    pass\n")
+
+    dep = DependencyGraph(repo_root=repo, db_path=repo / ".agent" / "deps.sqlite")
+    idx = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite", dep_graph=dep)
+    idx.index_all()
+    builder = RepoMapBuilder(repo_root=repo, index_db=idx.db_path, dep_db=dep.db_path, dep_graph=dep)
+
+    out = builder.build(repo / ".agent" / "repo_map", limit_files=3)
+    assert [m["path"] for m in out["top_modules"][:2]] == ["core.py", "util.py"]
+    assert out["file_count"] == 6 and len(out["files"]) == 3
+
+    text = builder.render(token_budget=40)
+    assert "core.py" in text and "  def base():" in text
+    assert "side.py" not in text
+    assert len(text) // 4 <= 40
+
+    focused = builder.ranked(focus=["side.py"])
+    assert focused[0]["path"] == "side.py"
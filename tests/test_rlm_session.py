@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from rlm_wrap.session import RLMSessionCache, RLMUnavailable
+
+
+class _Client:
+    def __init__(self, fail=0):
+        self.fail = fail
+
+    def completion(self, prompt):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("backend gone")
+        return f"ok:{prompt}"
+
+
+KEY = ("openai", "gpt", "", "local", 1, "x")
+
+
+def test_session_is_reused_across_calls():
+    cache = RLMSessionCache(health_interval_s=0)
+    builds = []
+
+    def factory():
+        builds.append(1)
+        return _Client()
+
+    assert cache.call(KEY, factory, lambda c: c.completion("a")) == "ok:a"
+    assert cache.call(KEY, factory, lambda c: c.completion("b")) == "ok:b"
+    assert len(builds) == 1
+
+
+def test_session_rebuilds_once_on_error():
+    cache = RLMSessionCache(health_interval_s=0)
+    clients = [_Client(fail=1), _Client()]
+    assert cache.call(KEY, lambda: clients.pop(0), lambda c: c.completion("a")) == "ok:a"
+    assert cache.stats()["sessions"][0]["builds"] == 2
+
+
+def test_unreachable_backend_is_negatively_cached():
+    cache = RLMSessionCache(negative_ttl_s=60, health_interval_s=0)
+    builds = []
+
+    def factory():
+        builds.append(1)
+        return _Client(fail=99)
+
+    with pytest.raises(ConnectionError):
+        cache.call(KEY, factory, lambda c: c.completion("a"))
+    with pytest.raises(RLMUnavailable):
+        cache.call(KEY, factory, lambda c: c.completion("b"))
+    assert len(builds) == 2
+    session = cache.stats()["sessions"][0]
+    assert session["skipped"] == 1
+    assert session["unavailable_for_s"] > 0
+
+
+def test_health_check_fails_fast_for_closed_port():
+    cache = RLMSessionCache(negative_ttl_s=60, health_interval_s=30)
+    key = ("openai", "m", "http://127.0.0.1:9", "local", 1, "x")
+    with pytest.raises(RLMUnavailable):
+        cache.call(key, _Client, lambda c: c.completion("a"))
+    assert cache.stats()["sessions"][0]["builds"] == 0
+
+
+def test_call_errors_do_not_disable_backend():
+    cache = RLMSessionCache(negative_ttl_s=60, health_interval_s=0)
+
+    def bad_prompt(client):
+        raise ValueError("context length exceeded")
+
+    with pytest.raises(ValueError):
+        cache.call(KEY, _Client, bad_prompt)
+    assert cache.call(KEY, _Client, lambda c: c.completion("a")) == "ok:a"
+    session = cache.stats()["sessions"][0]
+    assert session["builds"] == 1 and session["failures"] == 0
+    assert session["unavailable_for_s"] == 0
+
+
+def test_calls_to_one_backend_run_concurrently():
+    cache = RLMSessionCache(health_interval_s=0)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def both_inside(client):
+        barrier.wait()  # raises BrokenBarrierError if calls were serialised
+        return client.completion("x")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.call(KEY, _Client, both_inside))) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["ok:x", "ok:x"]
+    assert cache.stats()["sessions"][0]["builds"] == 1
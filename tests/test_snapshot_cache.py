@@ -0,0 +1,202 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+from vcs.snapshot_cache import SnapshotCache
+
+
+def _blobs(cache: SnapshotCache) -> set:
+    return {p.parent.name + p.name for p in cache.objects_dir.rglob("*") if p.is_file()}
+
+
+def _repo(tmp_path: Path) -> Path:
+    repo = tmp_path / "repo"
+    (repo / "pkg").mkdir(parents=True)
+    (repo / "a.py").write_text("a = 1\n")
+    (repo / "pkg" / "b.py").write_text("b = 2\n")
+    (repo / "pkg" / "copy.py").write_text("b = 2\n")
+    return repo
+
+
+def test_snapshot_stores_each_content_once(tmp_path: Path):
+    repo = _repo(tmp_path)
+    cache = SnapshotCache(repo_root=repo)
+    first = cache.snapshot("one")
+    assert first.file_count == 3
+    assert len(_blobs(cache)) == 2  # b.py and copy.py share a blob
+
+    (repo / "a.py").write_text("a = 10\n")
+    cache.snapshot("two")
+    assert len(_blobs(cache)) == 3
+    manifest = json.loads((cache.cache_dir / first.snapshot_id / "manifest.json").read_text())
+    assert sorted(manifest["files"]) == ["a.py", "pkg/b.py", "pkg/copy.py"]
+
+
+def test_restore_rewrites_only_changed_files(tmp_path: Path):
+    repo = _repo(tmp_path)
+    os.chmod(repo / "a.py", 0o755)
+    cache = SnapshotCache(repo_root=repo)
+    snap = cache.snapshot()
+    untouched = (repo / "pkg" / "b.py").stat().st_ino
+
+    (repo / "a.py").write_text("broken\n")
+    os.chmod(repo / "a.py", 0o644)
+    (repo / "pkg" / "copy.py").unlink()
+    (repo / "new.py").write_text("x = 1\n")
+    cache.restore(snap.snapshot_id)
+
+    assert (repo / "a.py").read_text() == "a = 1\n"
+    assert (repo / "a.py").stat().st_mode & 0o777 == 0o755
+    assert (repo / "pkg" / "copy.py").read_text() == "b = 2\n"
+    assert not (repo / "new.py").exists()
+    assert (repo / "pkg" / "b.py").stat().st_ino == untouched
+    assert cache.get_head() == snap.snapshot_id
+
+
+def test_trim_collects_unreferenced_blobs(tmp_path: Path):
+    repo = _repo(tmp_path)
+    cache = SnapshotCache(repo_root=repo, max_snapshots=2)
+    first = cache.snapshot()
+    first_only = _blobs(cache)
+    (repo / "a.py").write_text("a = 2\n")
+    cache.snapshot()
+    (repo / "a.py").write_text("a = 3\n")
+    cache.snapshot()
+
+    assert [s["snapshot_id"] for s in cache.list_snapshots()][0] != first.snapshot_id
+    assert not (cache.cache_dir / first.snapshot_id).exists()
+    blobs = _blobs(cache)
+    assert len(blobs) == 3  # shared b.py blob plus the two later a.py versions
+    assert len(first_only - blobs) == 1
+
+
+def test_restore_reads_full_copy_snapshots(tmp_path: Path):
+    repo = _repo(tmp_path)
+    cache = SnapshotCache(repo_root=repo)
+    legacy = cache.cache_dir / "snap_legacy"
+    (legacy / "pkg").mkdir(parents=True)
+    shutil.copy2(repo / "pkg" / "b.py", legacy / "pkg" / "b.py")
+    (legacy / "manifest.json").write_text(json.dumps(["pkg/b.py"]))
+    cache.restore("snap_legacy")
+    assert sorted(rel for rel, _ in cache._iter_files()) == ["pkg/b.py"]
+
+
+def test_delta_snapshot_records_touched_paths(tmp_path: Path):
+    repo = _repo(tmp_path)
+    cache = SnapshotCache(repo_root=repo)
+    base = cache.snapshot("base")
+    (repo / "a.py").write_text("a = 2\n")
+    (repo / "pkg" / "copy.py").unlink()
+    (repo / "new.py").write_text("n = 1\n")
+    (repo / "pkg" / "b.py").write_text("not in the diff\n")
+    delta = cache.snapshot("edit", paths=["a.py", "pkg/copy.py", "new.py", ".agent/x"])
+
+    manifest = json.loads((cache.cache_dir / delta.snapshot_id / "manifest.json").read_text())
+    assert delta.parent == base.snapshot_id and manifest["depth"] == 1
+    assert sorted(manifest["files"]) == ["a.py", "new.py", "pkg/b.py"]  # b.py: edited outside the diff
+    assert manifest["deleted"] == ["pkg/copy.py"]
+    assert manifest["pre"]["new.py"] is None and manifest["pre"]["a.py"] is not None
+    assert delta.file_count == 3
+
+    cache.restore(base.snapshot_id)
+    assert (repo / "a.py").read_text() == "a = 1\n" and not (repo / "new.py").exists()
+    assert (repo / "pkg" / "b.py").read_text() == "b = 2\n"
+    cache.restore(delta.snapshot_id)
+    assert (repo / "a.py").read_text() == "a = 2\n" and (repo / "new.py").exists()
+    assert not (repo / "pkg" / "copy.py").exists()
+    assert (repo / "pkg" / "b.py").read_text() == "not in the diff\n"
+
+
+def test_restoring_a_delta_keeps_files_made_outside_the_agent(tmp_path: Path):
+    repo = _repo(tmp_path)
+    cache = SnapshotCache(repo_root=repo)
+    cache.snapshot("base")
+    (repo / "notes.txt").write_text("mine\n")
+    (repo / "pkg" / "b.py").write_text("b = 'edited by hand'\n")
+    (repo / "a.py").write_text("a = 2\n")
+    approve = cache.snapshot("approve", paths=["a.py"])
+
+    (repo / "a.py").write_text("a = 3\n")
+    (repo / "later.txt").write_text("made after the snapshot\n")
+    cache.restore(approve.snapshot_id)
+    assert (repo / "a.py").read_text() == "a = 2\n"
+    assert (repo / "notes.txt").read_text() == "mine\n"
+    assert (repo / "pkg" / "b.py").read_text() == "b = 'edited by hand'\n"
+    # Never recorded by the chain, so restore leaves it alone.
+    assert (repo / "later.txt").exists()
+
+
+def test_delta_chain_compacts_and_survives_trim(tmp_path: Path):
+    repo = _repo(tmp_path)
+    cache = SnapshotCache(repo_root=repo, max_snapshots=2, max_delta_chain=2)
+    base = cache.snapshot()
+    metas = []
+    for i in range(3):
+        (repo / "a.py").write_text(f"a = {i + 10}\n")
+        metas.append(cache.snapshot(paths=["a.py"]))
+    assert [m.parent for m in metas] == [base.snapshot_id, metas[0].snapshot_id, ""]
+
+    (repo / "a.py").write_text("a = 99\n")
+    last = cache.snapshot(paths=["a.py"])
+    assert last.parent == metas[2].snapshot_id
+    (repo / "a.py").write_text("a = 100\n")
+    cache.snapshot(paths=["a.py"])
+    listed = [s["snapshot_id"] for s in cache.list_snapshots()]
+    assert metas[2].snapshot_id not in listed
+    # The unlisted full base stays while deltas depend on it.
+    assert (cache.cache_dir / metas[2].snapshot_id).exists()
+    assert not (cache.cache_dir / base.snapshot_id).exists()
+    cache.restore(last.snapshot_id)
+    assert (repo / "a.py").read_text() == "a = 99\n"
+
+
+def test_pack_storage_streams_one_compressed_file(tmp_path: Path):
+    repo = _repo(tmp_path)
+    (repo / "big.py").write_text("value = 'repeated line'\n" * 400)
+    cache = SnapshotCache(repo_root=repo, max_snapshots=1, storage="pack")
+    snap = cache.snapshot()
+    packs = sorted(p.name for p in cache.packs_dir.iterdir())
+    assert packs == [f"{snap.snapshot_id}.idx", f"{snap.snapshot_id}.pack"]
+    assert [p for p in cache.objects_dir.iterdir() if p != cache.packs_dir] == []  # no loose blobs
+    assert snap.bytes_written == (cache.packs_dir / f"{snap.snapshot_id}.pack").stat().st_size
+    assert snap.compression_ratio > 5 and snap.elapsed_ms > 0
+    assert [f["path"] for f in cache.list_files(snap.snapshot_id)] == ["a.py", "big.py", "pkg/b.py", "pkg/copy.py"]
+
+    (repo / "big.py").write_text("broken\n")
+    (repo / "a.py").write_text("also broken\n")
+    assert cache.restore_file(snap.snapshot_id, "big.py")
+    assert (repo / "big.py").read_text().startswith("value = ")
+    assert (repo / "a.py").read_text() == "also broken\n"
+    assert not cache.restore_file(snap.snapshot_id, "missing.py")
+
+    # Reopened, a later snapshot stores only the changed file and the old pack is collected.
+    cache = SnapshotCache(repo_root=repo, max_snapshots=1, storage="pack")
+    second = cache.snapshot()
+    assert second.bytes_written < 100
+    cache.restore(second.snapshot_id)
+    assert (repo / "a.py").read_text() == "also broken\n"
+    (repo / "a.py").write_text("a = 5\n")
+    third = cache.snapshot()
+    assert not (cache.packs_dir / f"{second.snapshot_id}.pack").exists()
+    assert (cache.packs_dir / f"{snap.snapshot_id}.pack").exists()  # still holds big.py
+    cache.restore(third.snapshot_id)
+    assert (repo / "big.py").read_text().startswith("value = ")
+
+
+def test_overlay_records_pre_images_of_later_changes(tmp_path: Path):
+    repo = _repo(tmp_path)
+    cache = SnapshotCache(repo_root=repo)
+    cache.snapshot("base")
+    # A later change already hit the tree; the overlay holds the files as they were.
+    (repo / "a.py").write_text("a = 3\n")
+    (repo / "new.py").write_text("n = 1\n")
+    (repo / "pkg" / "b.py").unlink()
+    overlay = {"a.py": (b"a = 2\n", 0o644, 1), "new.py": None, "pkg/b.py": (b"b = 2\n", 0o644, 1)}
+    delta = cache.snapshot("delta", paths=["a.py", "new.py"], overlay=overlay)
+    full = cache.snapshot("full", overlay=overlay)
+    for snap in (delta, full):
+        cache.restore(snap.snapshot_id)
+        assert (repo / "a.py").read_text() == "a = 2\n"
+        assert (repo / "pkg" / "b.py").read_text() == "b = 2\n"
+        assert not (repo / "new.py").exists()
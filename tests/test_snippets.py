@@ -0,0 +1,62 @@
+import os
+from pathlib import Path
+
+from indexer.indexer import SymbolIndexer
+from indexer.snippets import line_offsets, request_windows
+
+
+def _old_snippet(path: Path, line: int, window: int = 6, max_lines: int = 80) -> str:
+    lines = path.read_text(errors="ignore").splitlines()
+    start = max(1, line - window)
+    end = min(len(lines), line + window)
+    if end - start + 1 > max_lines:
+        end = min(len(lines), start + max_lines - 1)
+    return "\n".join(f"{idx:4d}: {lines[idx-1]}" for idx in range(start, end + 1))
+
+
+def test_line_offsets():
+    assert list(line_offsets(b"")) == []
+    assert list(line_offsets(b"a\nbb\n")) == [0, 2]
+    assert list(line_offsets(b"a\nbb")) == [0, 2]
+    assert list(line_offsets(b"\n\n")) == [0, 1]
+
+
+def test_snippets_match_full_read(tmp_path: Path):
+    (tmp_path / "a.py").write_text("".join(f"x{i} = {i}\n" for i in range(1, 101)))
+    (tmp_path / "b.py").write_bytes(b"def f():\r\n    return 1\r\n\r\nz = 2")
+    (tmp_path / "empty.py").write_text("")
+    idx = SymbolIndexer(repo_root=tmp_path, db_path=tmp_path / ".agent" / "index.sqlite")
+    idx.index_all()
+    for rel in ("a.py", "b.py", "empty.py"):
+        for line in (1, 3, 50, 99, 100, 150):
+            assert idx.get_snippet(rel, line) == _old_snippet(tmp_path / rel, line)
+        assert idx.get_snippet(rel, 40, window=30, max_lines=10) == _old_snippet(tmp_path / rel, 40, 30, 10)
+    assert idx.get_file_head("a.py", max_lines=3) == "   1: x1 = 1\n   2: x2 = 2\n   3: x3 = 3"
+    assert idx.get_file_head("missing.py") == ""
+    assert idx.get_snippet("missing.py", 3) == ""
+
+
+def test_stale_offsets_are_rebuilt(tmp_path: Path):
+    p = tmp_path / "a.py"
+    p.write_text("one = 1\ntwo = 2\n")
+    idx = SymbolIndexer(repo_root=tmp_path, db_path=tmp_path / "index.sqlite")
+    idx.index_all()
+    assert idx.get_snippet("a.py", 2, window=0) == "   2: two = 2"
+    st = p.stat()
+    p.write_text("zero = 0\none = 1\ntwo = 2\n")
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    # Not reindexed yet: offsets come from the file itself.
+    assert idx.get_snippet("a.py", 2, window=0) == "   2: one = 1"
+
+
+def test_request_windows_share_decoded_lines(tmp_path: Path):
+    (tmp_path / "a.py").write_text("".join(f"v{i} = {i}\n" for i in range(1, 301)))
+    idx = SymbolIndexer(repo_root=tmp_path, db_path=tmp_path / "index.sqlite")
+    idx.index_all()
+    with idx.snippet_cache() as cache:
+        head = idx.get_file_head("a.py", max_lines=200)
+        assert idx.get_file_head("a.py", max_lines=120) == "\n".join(head.split("\n")[:120])
+        assert idx.get_snippet("a.py", 50) == _old_snippet(tmp_path / "a.py", 50)
+        with request_windows() as inner:
+            assert inner is cache
+    assert (cache.hits, cache.misses) == (2, 1)
@@ -0,0 +1,110 @@
+from pathlib import Path
+import shutil
+import subprocess
+
+import pytest
+
+from patcher.staging import StagingArea, diff_paths
+
+
+def _repo(tmp_path: Path) -> Path:
+    repo = tmp_path / "repo"
+    (repo / "pkg").mkdir(parents=True)
+    (repo / "a.py").write_text("a = 1\n")
+    (repo / "pkg" / "b.py").write_text("b = 2\n")
+    (repo / "old.py").write_text("o = 1\n")
+    return repo
+
+
+def _commit(repo: Path) -> None:
+    subprocess.run(["git", "init", "-q"], cwd=repo, check=True)
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(["git", "-c", "user.email=t@t", "-c", "user.name=t", "commit", "-qm", "init"], cwd=repo, check=True)
+
+
+DIFF = """--- a/a.py
++++ b/a.py
+@@ -1 +1 @@
+-a = 1
++a = 10
+--- a/old.py
++++ /dev/null
+@@ -1 +0,0 @@
+-o = 1
+--- /dev/null
++++ b/pkg/new.py
+@@ -0,0 +1 @@
++n = 1
+"""
+
+
+def test_overlay_copies_only_touched_files(tmp_path: Path):
+    repo = _repo(tmp_path)
+    staging = StagingArea(repo_root=repo, staging_root=repo / ".agent" / "staging")
+    staging.reset()
+    staging.apply_unified_diff(DIFF)
+    staged = sorted(str(p.relative_to(staging.overlay_root)) for p in staging.overlay_root.rglob("*") if p.is_file())
+    assert staged == ["a.py", "pkg/new.py"]
+    assert staging.read_file("a.py") == b"a = 10\n"
+    assert staging.read_file("pkg/b.py") == b"b = 2\n"  # falls through to the repo
+    assert staging.read_file("pkg/new.py") == b"n = 1\n"
+    assert staging.path_for("old.py") is None and (repo / "old.py").exists()
+    assert (repo / "a.py").read_text() == "a = 1\n"
+
+    # A second diff stacks on the staged content, not the repo's.
+    staging.apply_unified_diff("--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-a = 10\n+a = 11\n")
+    assert staging.read_file("a.py") == b"a = 11\n"
+    with pytest.raises(RuntimeError):
+        staging.apply_unified_diff("--- a/old.py\n+++ b/old.py\n@@ -1 +1 @@\n-o = 1\n+o = 2\n")
+    staging.reset()
+    assert staging.staged_paths() == [] and staging.read_file("a.py") == b"a = 1\n"
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_overlay_applies_inside_a_git_repo(tmp_path: Path):
+    repo = _repo(tmp_path)
+    _commit(repo)
+    staging = StagingArea(repo_root=repo, staging_root=repo / ".agent" / "staging")
+    staging.reset()
+    staging.apply_unified_diff("--- a/pkg/b.py\n+++ b/pkg/b.py\n@@ -1 +1 @@\n-b = 2\n+b = 20\n")
+    assert staging.read_file("pkg/b.py") == b"b = 20\n"
+    assert (repo / "pkg" / "b.py").read_text() == "b = 2\n"
+    env = staging._overlay_env()
+    p = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=staging.overlay_root, env=env, capture_output=True)
+    assert p.returncode != 0  # git no longer sees the enclosing repo from the overlay
+
+
+def test_diff_paths_covers_renames():
+    diff = "diff --git a/x.py b/y.py\nsimilarity index 100%\nrename from x.py\nrename to y.py\n"
+    assert diff_paths(diff) == ["x.py", "y.py"]
+    assert diff_paths(DIFF) == ["a.py", "old.py", "pkg/new.py"]
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_worktree_mode_includes_uncommitted_edits(tmp_path: Path):
+    repo = _repo(tmp_path)
+    (repo / ".gitignore").write_text(".agent/\n")
+    _commit(repo)
+    (repo / "pkg" / "b.py").write_text("b = 3\n")
+    (repo / "untracked.py").write_text("u = 1\n")
+
+    staging = StagingArea(repo_root=repo, staging_root=repo / ".agent" / "staging", mode="worktree")
+    staging.reset()
+    staging.apply_unified_diff(DIFF)
+    wt = staging.worktree_root
+    assert (wt / "a.py").read_text() == "a = 10\n"
+    assert (wt / "pkg" / "b.py").read_text() == "b = 3\n"
+    assert (wt / "untracked.py").exists() and not (wt / "old.py").exists()
+    assert not (wt / ".agent").exists()
+
+    # A second diff stacks on the first instead of re-syncing the worktree.
+    staging.apply_unified_diff("--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-a = 10\n+a = 11\n")
+    assert (wt / "a.py").read_text() == "a = 11\n"
+    assert (wt / "pkg" / "new.py").exists()
+    assert staging.staged_paths() == ["a.py", "old.py", "pkg/new.py"]
+
+    # Reset keeps the checkout; the next diff starts from the repo again.
+    staging.reset()
+    staging.apply_unified_diff("--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-a = 1\n+a = 2\n")
+    assert staging.read_file("a.py") == b"a = 2\n"
+    assert staging.read_file("pkg/new.py") is None
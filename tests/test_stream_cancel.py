@@ -0,0 +1,40 @@
+from pathlib import Path
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("llama_cpp")
+
+from agent import llm_router
+from agent.llm_stats import StreamMeter
+from server.app import TraceContext, _stream_llm
+
+
+def test_disconnect_mid_stream_stops_generation_and_frees_model(monkeypatch):
+    model_lock = threading.Lock()
+    produced = []
+    released = threading.Event()
+
+    def chat_stream(role, messages, config, repo_root, config_path=None):
+        # Stands in for LlamaRuntime.chat_stream holding the pooled model.
+        with model_lock:
+            try:
+                for i in range(500):
+                    time.sleep(0.005)
+                    produced.append(i)
+                    yield f"t{i} "
+            finally:
+                released.set()
+
+    monkeypatch.setattr(llm_router, "chat_stream", chat_stream)
+    events = _stream_llm(
+        TraceContext(), "llm_stream", StreamMeter(),
+        lambda on_delta: llm_router.chat("coder", [], None, Path("."), on_delta=on_delta),
+    )
+    assert next(events) == ("delta", "t0 ")
+    events.close()  # what the SSE response does when the client goes away
+
+    assert released.wait(5)
+    assert model_lock.acquire(timeout=5)
+    assert len(produced) < 500
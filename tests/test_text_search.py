@@ -0,0 +1,72 @@
+import os
+from pathlib import Path
+
+from indexer.indexer import SymbolIndexer
+from indexer.text_search import glob_matches, literal_plan
+
+
+def test_literal_plan_extracts_required_substrings():
+    assert literal_plan("load_users") == [["load_users"]]
+    assert literal_plan("def (load|save)_user") == [["def ", "load", "_user"], ["def ", "save", "_user"]]
+    assert literal_plan("foo.*bar") == [["foo", "bar"]]
+    assert literal_plan("colou?r") == [["colo"]]
+    assert literal_plan(r"\w+") is None
+    assert literal_plan("ab|cd") is None
+
+
+def test_glob_matches_rg_semantics():
+    assert glob_matches("src/a.py", "*.py")
+    assert not glob_matches("src/a.py", "!*.py")
+    assert glob_matches("src/a.py", "src/*.py")
+    assert not glob_matches("lib/a.py", "src/*.py")
+
+
+def test_search_text_uses_index_and_tracks_edits(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("import os\n\ndef load_user(uid):\n    return uid\n")
+    (repo / "b.ts").write_text("export function saveUser() {}\nconst load_user = 1;\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=tmp_path / "index.sqlite")
+    idx.index_all()
+
+    hits = idx.search_text("load_user", fallback=False)
+    assert [(h["file"], h["line"], h["column"]) for h in hits] == [("a.py", 3, 5), ("b.ts", 2, 7)]
+    assert hits[0]["text"] == "def load_user(uid):"
+    assert [h["file"] for h in idx.search_text(r"(save|load)User", fallback=False)] == ["b.ts"]
+    assert [h["file"] for h in idx.search_text("LOAD_USER", ignore_case=True, glob="*.py", fallback=False)] == ["a.py"]
+    assert len(idx.search_text(r"\w+", max_results=3, fallback=False)) == 3
+
+    (repo / "a.py").write_text("def fetch_user(uid):\n    return uid\n")
+    st = (repo / "a.py").stat()
+    os.utime(repo / "a.py", ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+    (repo / "b.ts").unlink()
+    idx.index_incremental()
+    assert idx.search_text("load_user", fallback=False) == []
+    assert [h["line"] for h in idx.search_text("fetch_user", fallback=False)] == [1]
+
+
+def test_search_text_fallback_only_greps_unindexed_files(tmp_path: Path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("def load_user(uid):\n    return uid\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=tmp_path / "index.sqlite")
+    idx.index_all()
+    assert idx.last_stats["scanned"] == 1
+    calls = []
+    monkeypatch.setattr(idx, "rg_search", lambda pattern, **kw: calls.append(kw) or [])
+
+    assert [h["file"] for h in idx.search_text("load_user")] == ["a.py"]
+    assert calls == []
+
+    (repo / "README.md").write_text("load_user is documented here\n")
+    (repo / "notes.txt").write_text("nothing\n")
+    idx.index_paths(["README.md", "notes.txt"])
+    idx.search_text("load_user")
+    idx.search_text("load_user", glob="*.md")
+    assert [c["paths"] for c in calls] == [["README.md", "notes.txt"], ["README.md"]]
+
+    (repo / "README.md").unlink()
+    (repo / "notes.txt").unlink()
+    idx.index_incremental()
+    idx.search_text("load_user")
+    assert len(calls) == 2
@@ -0,0 +1,142 @@
+from pathlib import Path
+import re
+import zlib
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from indexer import vectors
+from indexer.indexer import SymbolIndexer
+from indexer.vectors import EmbeddingIndex, VectorStore, fuse, hybrid_search
+
+
+class _BagOfWords:
+    """Deterministic stand-in for an embedding model."""
+
+    def __init__(self, dim: int = 64) -> None:
+        self.dim = dim
+        self.calls = 0
+        self.texts = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        out = []
+        for text in texts:
+            vec = [0.0] * self.dim
+            for word in re.findall(r"[a-z]+", text.lower()):
+                vec[zlib.crc32(word.encode()) % self.dim] += 1.0
+            out.append(vec)
+        return out
+
+
+def _unit(rng, n, dim):
+    x = rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_store_persists_reuses_rows_and_grows(tmp_path: Path):
+    rng = np.random.default_rng(1)
+    data = _unit(rng, 1500, 16)
+    store = VectorStore(tmp_path / "v", 16)
+    store.upsert([((f"f{i}.py", 1, 10), f"d{i}", data[i]) for i in range(1500)])
+    assert len(store) == 1500
+    assert store.search(data[7], k=1)[0][0] == ("f7.py", 1, 10)
+    store.delete([(f"f{i}.py", 1, 10) for i in range(100)])
+    store.close()
+
+    store = VectorStore(tmp_path / "v", 16)
+    assert len(store) == 1400
+    assert store.search(data[7], k=1)[0][0] != ("f7.py", 1, 10)
+    assert store.search(data[900], k=1)[0][0] == ("f900.py", 1, 10)
+    size = (tmp_path / "v" / "vectors.f16").stat().st_size
+    store.upsert([(("new.py", 1, 5), "dnew", data[0])])
+    # The freed row is reused instead of growing the matrix.
+    assert (tmp_path / "v" / "vectors.f16").stat().st_size == size
+    assert store.search(data[0], k=1)[0][0] == ("new.py", 1, 5)
+    assert store.vector_for_digest("dnew") is not None
+
+
+def test_store_resets_on_dimension_change(tmp_path: Path):
+    store = VectorStore(tmp_path / "v", 8)
+    store.upsert([(("a.py", 1, 2), "d", [1.0] * 8)])
+    store.close()
+    assert len(VectorStore(tmp_path / "v", 4)) == 0
+
+
+def test_ivf_recall_against_exact_search(tmp_path: Path):
+    rng = np.random.default_rng(0)
+    centers = _unit(rng, 40, 32)
+    data = centers[rng.integers(0, 40, size=6000)] + 0.15 * rng.standard_normal((6000, 32)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    store = VectorStore(tmp_path / "v", 32)
+    store.upsert([((f"f{i}.py", 1, 1), f"d{i}", data[i]) for i in range(len(data))])
+    assert store.maybe_train()
+    assert not store.maybe_train()  # nothing new since training
+
+    queries = data[rng.choice(len(data), size=20, replace=False)] + 0.05 * rng.standard_normal((20, 32)).astype(np.float32)
+    found = 0
+    for q in queries:
+        q = q / np.linalg.norm(q)
+        exact = {f"f{i}.py" for i in np.argsort(-(data @ q))[:10]}
+        approx = {key[0] for key, _ in store.search(q, k=10, nprobe=16)}
+        found += len(exact & approx)
+    assert found / 200 >= 0.9
+
+    store.close()
+    store = VectorStore(tmp_path / "v", 32)
+    assert store._centroids is not None
+    store.upsert([(("late.py", 1, 1), "late", data[3])])
+    assert ("late.py", 1, 1) in [key for key, _ in store.search(data[3], k=5)]
+
+
+def test_sync_follows_indexer_changes(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "watch.py").write_text("class DebounceQueue:\n    def put(self, path):\n        self.pending[path] = 1\n")
+    (repo / "store.py").write_text("def save_snapshot(tree):\n    return write_tree(tree)\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite")
+    idx.index_all()
+    embed = _BagOfWords()
+    emb = EmbeddingIndex(repo / ".agent" / "vectors", embed, batch_size=1)
+    assert emb.sync(idx.chunk_rows()) == {"embedded": 2, "reused": 0, "removed": 0, "vectors": 2}
+    assert embed.calls == 2
+    assert emb.sync(idx.chunk_rows())["embedded"] == 0
+
+    (repo / "store.py").write_text("def restore_snapshot(tree):\n    tree = dict(tree)\n    return tree\n")
+    (repo / "copy.py").write_text((repo / "watch.py").read_text())
+    changed = idx.index_paths(["store.py", "copy.py"])
+    stats = emb.sync(idx.chunk_rows(changed), paths=changed)
+    assert stats["embedded"] == 2 and stats["removed"] == 1
+    assert len(emb.store) == 3
+
+    (repo / "copy.py").unlink()
+    changed = idx.index_paths(["copy.py"])
+    assert emb.sync(idx.chunk_rows(changed), paths=changed)["removed"] == 1
+
+    reopened = EmbeddingIndex(repo / ".agent" / "vectors", _BagOfWords())
+    assert reopened.open_existing() and len(reopened.store) == 2
+    assert reopened.search("restore snapshot", k=1)[0][0][0] == "store.py"
+
+
+def test_hybrid_search_adds_semantic_hits(tmp_path: Path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "queue.py").write_text("class DebounceQueue:\n    def put(self, path):\n        self.pending[path] = 1\n")
+    (repo / "retry.py").write_text("def backoff(attempt):\n    return min(30, 2 ** attempt)\n")
+    idx = SymbolIndexer(repo_root=repo, db_path=repo / ".agent" / "index.sqlite")
+    idx.index_all()
+    emb = EmbeddingIndex(repo / ".agent" / "vectors", _BagOfWords())
+    emb.sync(idx.chunk_rows())
+
+    assert [h["file"] for h in hybrid_search(idx, None, "debounce queue")] == ["queue.py"]
+    hits = hybrid_search(idx, emb, "debounce queue", limit=2)
+    assert [h["file"] for h in hits] == ["queue.py", "retry.py"]
+    assert "2 ** attempt" in hits[1]["text"]
+
+
+def test_fuse_prefers_keys_ranked_by_both():
+    a, b, c = ("a", 1, 1), ("b", 1, 1), ("c", 1, 1)
+    assert [k for k, _ in fuse([[a, b], [c, b]], limit=3)] == [b, a, c]
+    assert vectors.available()
@@ -0,0 +1,112 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from indexer.indexer import EXCLUDE_DIRS, SUPPORTED, SymbolIndexer
+from indexer.watcher import ChangeQueue, InotifyWatcher, PollingWatcher
+
+
+def _drain(q: ChangeQueue, timeout: float = 5.0):
+    paths, rescan = set(), False
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        batch = q.get_batch(timeout=0.2)
+        if batch is not None:
+            paths.update(batch.paths)
+            rescan = rescan or batch.rescan
+            if paths:
+                break
+    return paths, rescan
+
+
+def test_queue_coalesces_and_debounces():
+    q = ChangeQueue(debounce_s=0.05)
+    for _ in range(100):
+        q.put("a.py")
+    q.put_many(["b.py", "a.py"])
+    assert q.stats()["depth"] == 2
+    start = time.time()
+    batch = q.get_batch(timeout=2.0)
+    assert batch.paths == ["a.py", "b.py"]
+    assert time.time() - start >= 0.04
+    assert q.get_batch(timeout=0.05) is None
+    assert q.stats()["batches"] == 1
+
+
+def test_queue_close_unblocks_getter():
+    q = ChangeQueue()
+    q.close()
+    assert q.get_batch() is None
+
+
+def _watch(cls, repo: Path, **kwargs):
+    q = ChangeQueue(debounce_s=0.05)
+    return q, cls(repo, q, EXCLUDE_DIRS, SUPPORTED.keys(), **kwargs).start()
+
+
+def test_polling_watcher_reports_changes(tmp_path: Path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    (tmp_path / "node_modules").mkdir()
+    q, w = _watch(PollingWatcher, tmp_path, interval_s=0.05)
+    try:
+        time.sleep(0.1)
+        (tmp_path / "node_modules" / "dep.js").write_text("x\n")
+        (tmp_path / "b.py").write_text("y = 2\n")
+        (tmp_path / "a.py").unlink()
+        paths, _ = _drain(q)
+        assert paths == {"a.py", "b.py"}
+    finally:
+        w.stop()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_inotify_watcher_sees_new_dirs_and_ignores(tmp_path: Path):
+    (tmp_path / ".gitignore").write_text("gen/\n")
+    (tmp_path / "gen").mkdir()
+    q, w = _watch(InotifyWatcher, tmp_path)
+    try:
+        (tmp_path / "gen" / "out.py").write_text("x\n")
+        (tmp_path / "pkg").mkdir()
+        (tmp_path / "pkg" / "m.py").write_text("def f():\n    pass\n")
+        (tmp_path / "README.md").write_text("doc\n")
+        paths, rescan = _drain(q)
+        assert paths == {"pkg/m.py"}
+        assert not rescan
+    finally:
+        w.stop()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+def test_inotify_rewalk_does_not_duplicate_ignore_rules(tmp_path: Path):
+    (tmp_path / ".gitignore").write_text("gen/\n")
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / ".gitignore").write_text("*.tmp.py\n!keep.tmp.py\n")
+    q, w = _watch(InotifyWatcher, tmp_path)
+    try:
+        count = len(w.rules.rules)
+        for _ in range(3):
+            w._add_tree("pkg")
+        assert len(w.rules.rules) == count
+        assert w.rules.ignored("pkg/x.tmp.py", False) and not w.rules.ignored("pkg/keep.tmp.py", False)
+        # An edited .gitignore replaces its rules where they were, ahead of deeper ones.
+        (tmp_path / "pkg" / ".gitignore").write_text("*.tmp.py\n")
+        w._add_tree("pkg")
+        assert len(w.rules.rules) == count - 1
+        assert w.rules.ignored("pkg/keep.tmp.py", False)
+    finally:
+        w.stop()
+
+
+def test_index_paths_updates_only_given_files(tmp_path: Path):
+    (tmp_path / "a.py").write_text("def alpha():\n    pass\n")
+    (tmp_path / "b.py").write_text("def beta():\n    pass\n")
+    idx = SymbolIndexer(repo_root=tmp_path, db_path=tmp_path / ".agent" / "index.sqlite")
+    idx.index_all()
+    (tmp_path / "a.py").write_text("def alpha_two():\n    pass\n")
+    (tmp_path / "b.py").unlink()
+    assert idx.index_paths(["a.py", "b.py", "notes.txt"]) == ["a.py", "b.py"]
+    names = sorted(r["name"] for r in idx.search_symbols(""))
+    assert names == ["alpha_two"]
+    assert idx.index_paths(["a.py"]) == []
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from collections import Counter, OrderedDict
+from typing import Iterable, Mapping
 from pathlib import Path
+import hashlib
 import json
 import os
 import shutil
+import stat
 import time
 import uuid
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # optional; packs fall back to zlib
+    zstandard = None
+
+_FICLONE = 0x40049409  # Linux ioctl: share extents (btrfs, xfs, ...)
 
 
 DEFAULT_EXCLUDE_DIRS = {
@@ -26,6 +43,10 @@ DEFAULT_EXCLUDE_FILES = {
     ".DS_Store",
 }
 
+# (content, mode, mtime_ns) of a file as it was, or None if it did not exist.
+Image = tuple[bytes, int, int] | None
+_MISSING = object()
+
 
 @dataclass
 class SnapshotMeta:
@@ -33,6 +54,80 @@ class SnapshotMeta:
     created_at: float
     message: str
     file_count: int
+    parent: str = ""  # set for delta snapshots
+    bytes_written: int = 0  # new blob bytes stored, after compression
+    compression_ratio: float = 1.0
+    elapsed_ms: float = 0.0
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class _LooseWriter:
+    """Writes each new blob as its own file under objects/."""
+
+    def __init__(self, cache: "SnapshotCache") -> None:
+        self.cache = cache
+        self.entries: dict[str, list] = {}
+        self.raw_bytes = 0
+        self.bytes_written = 0
+
+    def add(self, digest: str, data: bytes) -> None:
+        path = self.cache._blob_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        self.entries[digest] = []
+        self.raw_bytes += len(data)
+        self.bytes_written += len(data)
+
+    def close(self) -> dict[str, list]:
+        return {}
+
+
+class _PackWriter:
+    """Streams a snapshot's new blobs, compressed one by one, into a single pack.
+
+    The .idx beside it maps hash -> [offset, length, size], so one blob can
+    be read back with a seek and the pack listed without decompressing it.
+    """
+
+    def __init__(self, path: Path, codec: str) -> None:
+        self.path = path
+        self.codec = codec
+        self.entries: dict[str, list] = {}
+        self.raw_bytes = 0
+        self.bytes_written = 0
+        self._tmp = path.with_name(path.name + ".tmp")
+        self._fh = None
+
+    def add(self, digest: str, data: bytes) -> None:
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self._tmp, "wb")
+        packed = _compress(data, self.codec)
+        self.entries[digest] = [self.bytes_written, len(packed), len(data)]
+        self._fh.write(packed)
+        self.raw_bytes += len(data)
+        self.bytes_written += len(packed)
+
+    def close(self) -> dict[str, list]:
+        if self._fh is None:
+            return {}
+        self._fh.close()
+        os.replace(self._tmp, self.path)
+        self.path.with_suffix(".idx").write_text(json.dumps({"codec": self.codec, "entries": self.entries}))
+        return self.entries
 
 
 class SnapshotCache:
@@ -42,13 +137,23 @@ class SnapshotCache:
         max_snapshots: int = 3,
         cache_dir: Path | None = None,
         max_file_bytes: int = 10_000_000,
+        max_delta_chain: int = 8,
+        storage: str = "blobs",
     ) -> None:
         self.repo_root = Path(repo_root)
         self.max_snapshots = max_snapshots
+        self.max_delta_chain = max_delta_chain
+        self._manifests: "OrderedDict[str, dict]" = OrderedDict()  # manifests never change once written
         self.max_file_bytes = max_file_bytes
         self.cache_dir = cache_dir or (self.repo_root / ".agent" / "snapshots")
         self.index_path = self.cache_dir / "index.json"
+        self.objects_dir = self.cache_dir / "objects"
+        self.packs_dir = self.objects_dir / "packs"
+        self.storage = storage  # blobs (one file per blob) | pack (one compressed pack per snapshot)
+        self.codec = "zstd" if zstandard is not None else "zlib"
+        self._packed: dict[str, tuple[str, int, int, str]] | None = None  # hash -> (pack, offset, length, codec)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._reflink = fcntl is not None and hasattr(os, "uname") and os.uname().sysname == "Linux"
         if not self.index_path.exists():
             self._write_index([])
 
@@ -59,60 +164,195 @@ class SnapshotCache:
             return []
 
     def _write_index(self, data: list[dict]) -> None:
-        self.index_path.write_text(json.dumps(data, indent=2))
+        # Replaced atomically: snapshots may be written while the index is being listed.
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, self.index_path)
 
-    def _iter_files(self) -> list[Path]:
-        files: list[Path] = []
-        for root, dirs, filenames in os.walk(self.repo_root):
-            root_path = Path(root)
-            rel_root = root_path.relative_to(self.repo_root)
+    def _iter_files(self) -> list[tuple[str, os.stat_result]]:
+        """(posix path relative to the repo, lstat) of every file a snapshot covers."""
+        files: list[tuple[str, os.stat_result]] = []
+        top = str(self.repo_root)
+        for root, dirs, filenames in os.walk(top):
+            rel_root = os.path.relpath(root, top)
+            rel_root = "" if rel_root == "." else rel_root.replace(os.sep, "/") + "/"
             # Prune excluded directories
-            pruned = []
-            for d in list(dirs):
-                if d in DEFAULT_EXCLUDE_DIRS:
-                    pruned.append(d)
-                    continue
-                if rel_root.parts and rel_root.parts[0] in DEFAULT_EXCLUDE_DIRS:
-                    pruned.append(d)
-                    continue
-            for d in pruned:
-                dirs.remove(d)
+            dirs[:] = [d for d in dirs if d not in DEFAULT_EXCLUDE_DIRS]
 
             for name in filenames:
                 if name in DEFAULT_EXCLUDE_FILES:
                     continue
-                p = root_path / name
                 try:
-                    if p.is_symlink() or not p.is_file():
-                        continue
-                    if p.stat().st_size > self.max_file_bytes:
-                        continue
+                    st = os.lstat(os.path.join(root, name))
+                except OSError:
+                    continue
+                if not stat.S_ISREG(st.st_mode) or st.st_size > self.max_file_bytes:
+                    continue
+                files.append((rel_root + name, st))
+        return files
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def _pack_index(self) -> dict[str, tuple[str, int, int, str]]:
+        if self._packed is None:
+            self._packed = {}
+            for idx in sorted(self.packs_dir.glob("*.idx")) if self.packs_dir.exists() else []:
+                try:
+                    data = json.loads(idx.read_text())
                 except Exception:
                     continue
-                files.append(p)
+                for digest, (offset, length, _size) in data.get("entries", {}).items():
+                    self._packed[digest] = (idx.stem, offset, length, data.get("codec", "zlib"))
+        return self._packed
+
+    def _has_blob(self, digest: str) -> bool:
+        return digest in self._pack_index() or self._blob_path(digest).exists()
+
+    def _store_blob(self, data: bytes, writer: _LooseWriter | _PackWriter) -> str:
+        digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+        if digest not in writer.entries and not self._has_blob(digest):
+            writer.add(digest, data)
+        return digest
+
+    def _read_blob(self, digest: str) -> bytes | None:
+        loc = self._pack_index().get(digest)
+        if loc is not None:
+            pack, offset, length, codec = loc
+            with open(self.packs_dir / f"{pack}.pack", "rb") as fh:
+                fh.seek(offset)
+                return _decompress(fh.read(length), codec)
+        try:
+            return self._blob_path(digest).read_bytes()
+        except OSError:
+            return None
+
+    def _materialize(self, digest: str, dst: Path) -> bool:
+        src = self._blob_path(digest)
+        if digest not in self._pack_index() and src.exists():
+            self._clone(src, dst)
+            return True
+        data = self._read_blob(digest)
+        if data is None:
+            return False
+        dst.write_bytes(data)
+        return True
+
+    def _read_manifest(self, snapshot_id: str) -> dict | None:
+        cached = self._manifests.get(snapshot_id)
+        if cached is not None:
+            self._manifests.move_to_end(snapshot_id)
+            return cached
+        path = self.cache_dir / snapshot_id / "manifest.json"
+        try:
+            data = json.loads(path.read_text())
+        except Exception:
+            return None
+        if not isinstance(data, dict):
+            return None
+        self._manifests[snapshot_id] = data
+        if len(self._manifests) > 16:
+            self._manifests.popitem(last=False)
+        return data
+
+    def _write_manifest(self, snapshot_id: str, manifest: dict) -> None:
+        snap_root = self.cache_dir / snapshot_id
+        snap_root.mkdir(parents=True, exist_ok=True)
+        (snap_root / "manifest.json").write_text(json.dumps(manifest))
+
+    def _chain(self, snapshot_id: str) -> list[dict] | None:
+        """Manifests from the full base up to `snapshot_id`; None if one is missing."""
+        chain: list[dict] = []
+        manifest = self._read_manifest(snapshot_id)
+        while manifest is not None and manifest.get("parent"):
+            chain.append(manifest)
+            manifest = self._read_manifest(manifest["parent"])
+        if manifest is None:
+            return None
+        chain.append(manifest)
+        return chain[::-1]
+
+    def _resolve(self, snapshot_id: str) -> dict[str, list] | None:
+        """Full path -> entry map of a snapshot: its base with each delta applied."""
+        chain = self._chain(snapshot_id)
+        if chain is None:
+            return None
+        files = dict(chain[0].get("files", {}))
+        for delta in chain[1:]:
+            for rel in delta.get("deleted", []):
+                files.pop(rel, None)
+            files.update(delta.get("files", {}))
         return files
 
-    def snapshot(self, message: str = "") -> SnapshotMeta:
+    def _lookup(self, snapshot_id: str, rels: list[str]) -> dict[str, list | None]:
+        """Entries for just `rels`, walking the delta chain only as far as needed."""
+        found: dict[str, list | None] = {}
+        pending = set(rels)
+        manifest = self._read_manifest(snapshot_id)
+        while manifest is not None and pending:
+            files, deleted = manifest.get("files", {}), set(manifest.get("deleted", []))
+            for rel in list(pending):
+                if rel in files or rel in deleted or not manifest.get("parent"):
+                    found[rel] = files.get(rel)
+                    pending.discard(rel)
+            manifest = self._read_manifest(manifest["parent"]) if manifest.get("parent") else None
+        for rel in pending:
+            found[rel] = None
+        return found
+
+    def _snapshot_rel(self, path: str) -> str:
+        rel = path.replace(os.sep, "/").lstrip("/")
+        parts = rel.split("/")
+        if not rel or ".." in parts or parts[-1] in DEFAULT_EXCLUDE_FILES:
+            return ""
+        if any(part in DEFAULT_EXCLUDE_DIRS for part in parts[:-1]):
+            return ""
+        return rel
+
+    def snapshot(
+        self,
+        message: str = "",
+        paths: Iterable[str] | None = None,
+        overlay: Mapping[str, Image] | None = None,
+    ) -> SnapshotMeta:
+        """Records the working tree.
+
+        With `paths` (e.g. the files an approved diff touched) the snapshot is
+        stored as a delta on top of the head snapshot: those paths plus any
+        the user changed outside the agent since (found by a stat walk). Every
+        `max_delta_chain` deltas a full snapshot is taken instead.
+
+        `overlay` images take precedence over the working tree: pre-images of
+        changes applied after the state being recorded. It is consulted after
+        each file is read, so a change registered there before it is applied
+        never leaks into this snapshot.
+        """
+        start = time.perf_counter()
         snap_id = f"snap_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-        snap_root = self.cache_dir / snap_id
-        snap_root.mkdir(parents=True, exist_ok=True)
-        files = self._iter_files()
-        manifest: list[str] = []
-        for p in files:
-            rel = p.relative_to(self.repo_root)
-            target = snap_root / rel
-            target.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(p, target)
-            manifest.append(str(rel))
-
-        (snap_root / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        writer = _PackWriter(self.packs_dir / f"{snap_id}.pack", self.codec) if self.storage == "pack" else _LooseWriter(self)
+        index = self._read_index()
+        head = self.get_head()
+        head_meta = next((item for item in index if item["snapshot_id"] == head), None)
+        parent = self._read_manifest(head) if paths is not None and head_meta is not None else None
+        if parent is not None and parent.get("depth", 0) < self.max_delta_chain:
+            manifest, file_count = self._delta(head, parent, paths, head_meta["file_count"], writer, overlay or {})
+        else:
+            manifest = {"version": 2, "depth": 0, "files": self._full(index, writer, overlay or {})}
+            file_count = len(manifest["files"])
+        # The pack must be complete before a manifest points into it.
+        for digest, (offset, length, _size) in writer.close().items():
+            self._pack_index()[digest] = (snap_id, offset, length, writer.codec)
+        self._write_manifest(snap_id, manifest)
         meta = SnapshotMeta(
             snapshot_id=snap_id,
             created_at=time.time(),
             message=message,
-            file_count=len(manifest),
+            file_count=file_count,
+            parent=manifest.get("parent", ""),
+            bytes_written=writer.bytes_written,
+            compression_ratio=round(writer.raw_bytes / writer.bytes_written, 2) if writer.bytes_written else 1.0,
+            elapsed_ms=round((time.perf_counter() - start) * 1000.0, 2),
         )
-        index = self._read_index()
         index.append(meta.__dict__)
         index = index[-self.max_snapshots :]
         self._write_index(index)
@@ -120,13 +360,125 @@ class SnapshotCache:
         self._write_head(snap_id)
         return meta
 
+    def _full(self, index: list[dict], writer: _LooseWriter | _PackWriter, overlay: Mapping[str, Image]) -> dict[str, list]:
+        # Files whose size and mtime match the previous snapshot keep its hash unread.
+        prev_files = (self._resolve(index[-1]["snapshot_id"]) or {}) if index else {}
+        files: dict[str, list] = {}
+        walked = set()
+        for rel, st in self._iter_files():
+            walked.add(rel)
+            mode = stat.S_IMODE(st.st_mode)
+            old = prev_files.get(rel)
+            if old is not None and old[2] == st.st_mtime_ns and old[3] == st.st_size:
+                files[rel] = [old[0], mode, st.st_mtime_ns, st.st_size]
+            else:
+                try:
+                    data = (self.repo_root / rel).read_bytes()
+                    # path -> [blob hash, mode, mtime_ns, size]
+                    files[rel] = [self._store_blob(data, writer), mode, st.st_mtime_ns, st.st_size]
+                except OSError:
+                    pass
+            image = overlay.get(rel, _MISSING)
+            if image is not _MISSING:
+                self._put_image(files, rel, image, writer)
+        for rel, image in list(overlay.items()):
+            if rel not in walked:
+                self._put_image(files, rel, image, writer)
+        return files
+
+    def _put_image(self, files: dict[str, list], rel: str, image: Image, writer: _LooseWriter | _PackWriter) -> None:
+        if image is None:
+            files.pop(rel, None)
+        else:
+            data, mode, mtime_ns = image
+            files[rel] = [self._store_blob(data, writer), mode, mtime_ns, len(data)]
+
+    def _delta(
+        self,
+        parent_id: str,
+        parent: dict,
+        paths: Iterable[str],
+        parent_count: int,
+        writer: _LooseWriter | _PackWriter,
+        overlay: Mapping[str, Image],
+    ) -> tuple[dict, int]:
+        rels = sorted({rel for rel in map(self._snapshot_rel, paths) if rel} | self._drifted(parent_id))
+        pre = self._lookup(parent_id, rels)
+        files: dict[str, list] = {}
+        deleted: list[str] = []
+        for rel in rels:
+            image: Image = None
+            try:
+                st = os.lstat(self.repo_root / rel)
+                if stat.S_ISREG(st.st_mode) and st.st_size <= self.max_file_bytes:
+                    image = ((self.repo_root / rel).read_bytes(), stat.S_IMODE(st.st_mode), st.st_mtime_ns)
+            except OSError:
+                pass
+            image = overlay.get(rel, image)
+            if image is None:
+                if pre[rel] is not None:
+                    deleted.append(rel)
+                continue
+            self._put_image(files, rel, image, writer)
+        manifest = {
+            "version": 2,
+            "parent": parent_id,
+            "depth": parent.get("depth", 0) + 1,
+            "files": files,
+            "deleted": deleted,
+            "pre": pre,  # the parent's entries for the touched paths (None: did not exist)
+        }
+        added = sum(1 for rel in files if pre[rel] is None)
+        return manifest, parent_count + added - len(deleted)
+
+    def _drifted(self, parent_id: str) -> set[str]:
+        # Edits made outside the agent would otherwise be missing from the delta,
+        # and restoring it would roll them back to the base.
+        prev = self._resolve(parent_id) or {}
+        drifted = set(prev)
+        for rel, st in self._iter_files():
+            old = prev.get(rel)
+            if old is None or old[2] != st.st_mtime_ns or old[3] != st.st_size:
+                drifted.add(rel)
+            else:
+                drifted.discard(rel)
+        return drifted
+
+    def _blob_refs(self, manifest: dict) -> list[str]:
+        refs = [entry[0] for entry in manifest.get("files", {}).values()]
+        refs += [entry[0] for entry in manifest.get("pre", {}).values() if entry]
+        return refs
+
     def _trim_old(self, index: list[dict]) -> None:
         keep = {item["snapshot_id"] for item in index}
-        for child in self.cache_dir.iterdir():
-            if not child.is_dir():
-                continue
-            if child.name not in keep:
-                shutil.rmtree(child, ignore_errors=True)
+        # Deltas need their parent chain down to a full base, listed or not.
+        live: set[str] = set()
+        for snap_id in keep:
+            while snap_id and snap_id not in live:
+                live.add(snap_id)
+                snap_id = (self._read_manifest(snap_id) or {}).get("parent", "")
+        stale = [c for c in self.cache_dir.iterdir() if c.is_dir() and c != self.objects_dir and c.name not in live]
+        if not stale:
+            return
+        # Blob refcounts over the live manifests; blobs only stale ones used go.
+        refs: Counter = Counter()
+        for snap_id in live:
+            refs.update(self._blob_refs(self._read_manifest(snap_id) or {}))
+        for child in stale:
+            for digest in self._blob_refs(self._read_manifest(child.name) or {}):
+                if refs[digest] == 0:
+                    self._blob_path(digest).unlink(missing_ok=True)
+            self._manifests.pop(child.name, None)
+            shutil.rmtree(child, ignore_errors=True)
+        # A pack goes once none of its blobs is referenced.
+        packs: dict[str, bool] = {}
+        for digest, (pack, _, _, _) in self._pack_index().items():
+            packs[pack] = packs.get(pack, False) or refs[digest] > 0
+        for pack, used in packs.items():
+            if not used:
+                (self.packs_dir / f"{pack}.pack").unlink(missing_ok=True)
+                (self.packs_dir / f"{pack}.idx").unlink(missing_ok=True)
+        self._packed = {d: loc for d, loc in self._pack_index().items() if packs[loc[0]]}
 
     def list_snapshots(self) -> list[dict]:
         return self._read_index()
@@ -137,25 +489,105 @@ class SnapshotCache:
         if not manifest_path.exists():
             raise FileNotFoundError(f"snapshot not found: {snapshot_id}")
         manifest = json.loads(manifest_path.read_text())
-        wanted = set(manifest)
+        if isinstance(manifest, list):
+            self._restore_copies(snap_root, manifest)
+            self._write_head(snapshot_id)
+            return
+        chain = self._chain(snapshot_id)
+        files = self._resolve(snapshot_id)
+        if chain is None or files is None:
+            raise FileNotFoundError(f"snapshot chain incomplete: {snapshot_id}")
+        known: set[str] | None = None
+        if len(chain) > 1:
+            # Only paths the chain recorded are reconciled; anything else is the user's.
+            known = set()
+            for manifest in chain:
+                known.update(manifest.get("files", {}), manifest.get("deleted", []), manifest.get("pre", {}))
 
+        current = dict(self._iter_files())
         # Remove files not present in snapshot
-        for p in self._iter_files():
-            rel = str(p.relative_to(self.repo_root))
-            if rel not in wanted:
+        for rel in current:
+            if rel not in files and (known is None or rel in known):
                 try:
-                    p.unlink()
+                    (self.repo_root / rel).unlink()
                 except Exception:
                     pass
 
-        # Restore snapshot files
+        # Rewrite only the files whose content differs
+        for rel, (digest, mode, mtime_ns, size) in files.items():
+            dst = self.repo_root / rel
+            st = current.get(rel)
+            if st is not None:
+                same = st.st_size == size and (st.st_mtime_ns == mtime_ns or self._file_digest(dst) == digest)
+                if same:
+                    if stat.S_IMODE(st.st_mode) != mode:
+                        os.chmod(dst, mode)
+                    continue
+            self._write_file(rel, digest, mode, mtime_ns)
+        self._write_head(snapshot_id)
+
+    def _write_file(self, rel: str, digest: str, mode: int, mtime_ns: int) -> bool:
+        dst = self.repo_root / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f".{dst.name}.{uuid.uuid4().hex[:8]}.restore")
+        if not self._materialize(digest, tmp):
+            tmp.unlink(missing_ok=True)
+            return False
+        os.chmod(tmp, mode)
+        os.utime(tmp, ns=(mtime_ns, mtime_ns))
+        os.replace(tmp, dst)
+        return True
+
+    def list_files(self, snapshot_id: str) -> list[dict]:
+        """Paths in a snapshot with their sizes, read from manifests alone."""
+        files = self._resolve(snapshot_id)
+        if files is None:
+            raise FileNotFoundError(f"snapshot not found: {snapshot_id}")
+        return [{"path": rel, "size": e[3], "mode": e[1], "hash": e[0]} for rel, e in sorted(files.items())]
+
+    def restore_file(self, snapshot_id: str, rel: str) -> bool:
+        """Restores one path as of a snapshot; False when the snapshot lacks it."""
+        rel = self._snapshot_rel(rel)
+        if not rel or self._read_manifest(snapshot_id) is None:
+            raise FileNotFoundError(f"snapshot not found: {snapshot_id}")
+        entry = self._lookup(snapshot_id, [rel])[rel]
+        if entry is None:
+            return False
+        return self._write_file(rel, entry[0], entry[1], entry[2])
+
+    def _restore_copies(self, snap_root: Path, manifest: list[str]) -> None:
+        # Snapshots written before the blob store: full copies beside the manifest.
+        wanted = set(manifest)
+        for rel, _ in self._iter_files():
+            if rel not in wanted:
+                try:
+                    (self.repo_root / rel).unlink()
+                except Exception:
+                    pass
         for rel in manifest:
             src = snap_root / rel
             dst = self.repo_root / rel
             dst.parent.mkdir(parents=True, exist_ok=True)
             if src.exists():
                 shutil.copy2(src, dst)
-        self._write_head(snapshot_id)
+
+    def _file_digest(self, path: Path) -> str:
+        try:
+            return hashlib.blake2b(path.read_bytes(), digest_size=20).hexdigest()
+        except OSError:
+            return ""
+
+    def _clone(self, src: Path, dst: Path) -> None:
+        # Reflink (copy-on-write) where the filesystem supports it. Hardlinks are
+        # never used: an in-place edit of the repo file would rewrite the blob.
+        if self._reflink:
+            try:
+                with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                self._reflink = False
+        shutil.copyfile(src, dst)
 
     def _write_head(self, snapshot_id: str) -> None:
         head_path = self.cache_dir / "head.json"
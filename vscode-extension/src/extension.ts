@@ -216,7 +216,7 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
       if (line.startsWith("event:")) {
         eventName = line.slice(6).trim();
       } else if (line.startsWith("data:")) {
-        data += line.slice(5).trimStart() + "\n";
+        data += line.slice(5).replace(/^ /, "") + "\n";
       }
     }
     data = data.replace(/\n$/, "");
@@ -239,7 +239,10 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
     if (eventName === "metrics") {
       try {
         const metrics = JSON.parse(data);
-        const line = `Metrics: in=${metrics.input_tokens} tok, out=${metrics.output_tokens} tok, chunks=${metrics.chunks_retrieved}`;
+        let line = `Metrics: in=${metrics.input_tokens} tok, out=${metrics.output_tokens} tok, chunks=${metrics.chunks_retrieved}`;
+        if (metrics.ttft_ms !== undefined) {
+          line += `, ttft=${Math.round(metrics.ttft_ms)}ms, ${metrics.tokens_per_s} tok/s`;
+        }
         this.pushProgress(line, "done");
       } catch {
         this.pushProgress(`Metrics: ${data}`, "done");
@@ -413,6 +416,8 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
       let diff = "";
       let summary = "";
       let risk = "";
+      let draft = "";
+      let error = "";
       const msgIndex = this.messages.length;
       this.currentStreamReader = stream.reader;
       this.messages.push({ role: "assistant", text: "Streaming proposal…\n", timestamp: Date.now(), streaming: true });
@@ -433,7 +438,7 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
             if (line.startsWith("event:")) {
               eventName = line.slice(6).trim();
             } else if (line.startsWith("data:")) {
-              data += line.slice(5).trimStart() + "\n";
+              data += line.slice(5).replace(/^ /, "") + "\n";
             }
           }
           data = data.replace(/\n$/, "");
@@ -441,9 +446,15 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
           if (eventName === "summary") summary += data;
           if (eventName === "risk") risk += data;
           if (eventName === "diff") diff += data;
+          if (eventName === "draft") draft += data;
+          if (eventName === "error") error += data;
           const current = this.messages[msgIndex];
           if (current && current.role === "assistant") {
-            current.text = `Summary:\n${summary || "(pending)"}\n\nRisk:\n${risk || "(pending)"}\n\nDiff:\n${diff.slice(0, 4000)}`;
+            if (!diff && draft) {
+              current.text = `Drafting…\n${draft.slice(-4000)}`;
+            } else {
+              current.text = `Summary:\n${summary || "(pending)"}\n\nRisk:\n${risk || "(pending)"}\n\nDiff:\n${diff.slice(0, 4000)}`;
+            }
           }
           this.refresh();
         }
@@ -453,6 +464,11 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
         current.streaming = false;
       }
       this.currentStreamReader = null;
+      if (error && !diff) {
+        this.messages.push({ role: "assistant", text: `Propose failed: ${error}`, timestamp: Date.now() });
+        this.refresh();
+        return;
+      }
       this.pending = { diff, summary, riskNotes: risk };
       this.messages.push({ role: "assistant", text: summary || "Proposal ready", timestamp: Date.now() });
       this.refresh();
@@ -505,6 +521,8 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
       let diff = "";
       let summary = "";
       let risk = "";
+      let draft = "";
+      let error = "";
       const msgIndex = this.messages.length;
       this.currentStreamReader = stream.reader;
       this.messages.push({ role: "assistant", text: "Streaming revision…\n", timestamp: Date.now(), streaming: true });
@@ -525,7 +543,7 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
             if (line.startsWith("event:")) {
               eventName = line.slice(6).trim();
             } else if (line.startsWith("data:")) {
-              data += line.slice(5).trimStart() + "\n";
+              data += line.slice(5).replace(/^ /, "") + "\n";
             }
           }
           data = data.replace(/\n$/, "");
@@ -533,9 +551,15 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
           if (eventName === "summary") summary += data;
           if (eventName === "risk") risk += data;
           if (eventName === "diff") diff += data;
+          if (eventName === "draft") draft += data;
+          if (eventName === "error") error += data;
           const current = this.messages[msgIndex];
           if (current && current.role === "assistant") {
-            current.text = `Summary:\n${summary || "(pending)"}\n\nRisk:\n${risk || "(pending)"}\n\nDiff:\n${diff.slice(0, 4000)}`;
+            if (!diff && draft) {
+              current.text = `Drafting…\n${draft.slice(-4000)}`;
+            } else {
+              current.text = `Summary:\n${summary || "(pending)"}\n\nRisk:\n${risk || "(pending)"}\n\nDiff:\n${diff.slice(0, 4000)}`;
+            }
           }
           this.refresh();
         }
@@ -545,6 +569,11 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
         current.streaming = false;
       }
       this.currentStreamReader = null;
+      if (error && !diff) {
+        this.messages.push({ role: "assistant", text: `Revise failed: ${error}`, timestamp: Date.now() });
+        this.refresh();
+        return;
+      }
       this.pending = { diff, summary, riskNotes: risk };
       this.messages.push({ role: "assistant", text: summary || "Revised pending patch", timestamp: Date.now() });
       this.refresh();
@@ -600,7 +629,7 @@ class AgentViewProvider implements vscode.WebviewViewProvider {
             if (line.startsWith("event:")) {
               eventName = line.slice(6).trim();
             } else if (line.startsWith("data:")) {
-              data += line.slice(5).trimStart() + "\n";
+              data += line.slice(5).replace(/^ /, "") + "\n";
             }
           }
           data = data.replace(/\n$/, "");